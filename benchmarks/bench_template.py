@@ -0,0 +1,67 @@
+"""
+How long `PycharmTemplate.finalize_files` takes with N frames above it.
+
+`hatch new` runs deep inside click and hatch, and the template used to pay for every one of those frames. Run with
+`python benchmarks/bench_template.py`, the per-call time should not move with the depth.
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+import click
+
+from hatch_pycharm import plugin
+
+DEPTHS = (10, 100, 500)
+CALLS = 2_000
+
+
+def at_depth(depth: int, fn):
+    if depth:
+        return at_depth(depth - 1, fn)
+    return fn()
+
+
+def walk_frames():
+    """What `read_location` used to do on every call"""
+    import inspect
+
+    frame = inspect.currentframe()
+    try:
+        return inspect.getouterframes(frame)[1].frame.f_locals.get("location")
+    finally:
+        del frame
+
+
+def measure_walk(depth: int) -> float:
+    seconds = timeit.timeit(lambda: at_depth(depth, walk_frames), number=CALLS // 20)
+    seconds -= timeit.timeit(lambda: at_depth(depth, lambda: None), number=CALLS // 20)
+    return seconds / (CALLS // 20)
+
+
+def measure(depth: int) -> float:
+    template = plugin.PycharmTemplate({}, Path.cwd(), None)
+    ctx = click.Context(click.Command("new"))
+    ctx.params = {"name": "bench", "location": None, "initialize": False}
+    config = {"project_name_normalized": "bench"}
+    with ctx:
+        seconds = timeit.timeit(lambda: at_depth(depth, lambda: template.finalize_files(config, [])), number=CALLS)
+        plugin._pending_projects.clear()
+    # Getting down there isn't the template's cost
+    seconds -= timeit.timeit(lambda: at_depth(depth, lambda: None), number=CALLS)
+    return seconds / CALLS
+
+
+def main() -> None:
+    # Nothing is opened, the close callback finds an empty queue
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), max(DEPTHS) * 2 + 100))
+    baseline = measure(0)
+    print(f"{'depth':>6} {'us/call':>10} {'vs depth 0':>10} {'frame walk us/call':>20}")
+    for depth in (0, *DEPTHS):
+        per_call = baseline if depth == 0 else measure(depth)
+        print(f"{depth:>6} {per_call * 1e6:>10.2f} {per_call / baseline:>10.2f} {measure_walk(depth) * 1e6:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
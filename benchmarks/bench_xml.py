@@ -0,0 +1,202 @@
+"""
+Times the SDK table, config vars and command building paths on synthetic data, and compares against a baseline.
+
+The tables are built from the `example_xml` samples, renamed and re-pathed so every entry belongs to its own project,
+at 10, 1k and 10k entries. Nothing here needs PyCharm or a network, the cache directory points at a temp dir for the
+whole run.
+
+    python benchmarks/bench_xml.py               # compare against benchmarks/baseline.json
+    python benchmarks/bench_xml.py --save        # record a new baseline
+    python benchmarks/bench_xml.py -k upsert --sizes 10 1000
+
+A benchmark regresses when it takes more than `--threshold` times its baseline, the exit status is then 1. Baselines
+are only comparable on the machine (and Python) that recorded them, the report says when they differ.
+"""
+
+import argparse
+import copy
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import NamedTuple
+from xml.etree.ElementTree import Element, fromstring, parse
+
+ROOT = Path(__file__).parent.parent
+BASELINE = Path(__file__).with_name("baseline.json")
+SIZES = (10, 1_000, 10_000)
+SAMPLES = ("macos", "win", "wsl")
+
+sys.path.insert(0, str(ROOT))
+from hatch_pycharm._pycharm import FileRef, jdk_table, make_format_files_command, make_open_file_command  # noqa: E402
+from hatch_pycharm._pycharm.config_vars import PythonConfigVars  # noqa: E402
+from hatch_pycharm._pycharm.jdk_index import ASSOCIATED_PROJECT_PATH, SDK_UUID, JdkIndex  # noqa: E402
+from hatch_pycharm._pycharm.macros import APPLICATION_HOME_DIR, USER_HOME, Macros  # noqa: E402
+
+
+class Benchmark(NamedTuple):
+    name: str
+    fn: Callable[[], object]
+    # Runs before every timed call without being timed, for benchmarks that change what they run on
+    setup: Callable[[], object] | None = None
+
+
+def measure(bench: Benchmark, min_time: float = 0.2, min_runs: int = 3, max_runs: int = 10_000) -> float:
+    """Best time of one call, over as many calls as fit in `min_time`"""
+    best = float("inf")
+    total = 0.0
+    runs = 0
+    while runs < min_runs or (total < min_time and runs < max_runs):
+        if bench.setup is not None:
+            bench.setup()
+        start = time.perf_counter()
+        bench.fn()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        runs += 1
+    return best
+
+
+def project(i: int) -> tuple[str, str]:
+    home = f"/synthetic/project-{i}"
+    return home, f"{home}/.venv/bin/python"
+
+
+def synthesize(samples: list[Element], i: int) -> Element:
+    jdk = copy.deepcopy(samples[i % len(samples)])
+    home, exe = project(i)
+    jdk.find("name").set("value", f"Python 3.11 (project-{i})")
+    jdk.find("homePath").set("value", exe)
+    additional = jdk.find("additional")
+    additional.attrib.pop("INTERPRETER_PATH", None)
+    additional.set(ASSOCIATED_PROJECT_PATH, home)
+    additional.set(SDK_UUID, str(uuid.uuid5(uuid.NAMESPACE_URL, home)))
+    return jdk
+
+
+def write_table(path: Path, size: int, samples: list[Element]) -> Path:
+    with path.open("wb") as f:
+        f.write(b'<application>\n  <component name="ProjectJdkTable">\n')
+        for i in range(size):
+            f.write(jdk_table.INDENT.encode() * 2 + jdk_table.serialize(synthesize(samples, i)) + b"\n")
+        f.write(b"  </component>\n</application>\n")
+    return path
+
+
+def table_benchmarks(work: Path, size: int, samples: list[Element]) -> Iterator[Benchmark]:
+    table = write_table(work / f"jdk.table.{size}.xml", size, samples)
+    home, exe = project(size // 2)
+    index = JdkIndex.load(table)
+    index.save()
+    payload = jdk_table.serialize(index.find(home, exe))
+
+    yield Benchmark(f"parse/etree[{size}]", lambda: parse(table))
+    yield Benchmark(f"parse/stream[{size}]", lambda: jdk_table.find_jdk(table, lambda jdk: False))
+    yield Benchmark(f"index/rebuild[{size}]", lambda: JdkIndex(table).rebuild())
+    yield Benchmark(f"lookup/project[{size}]", lambda: JdkIndex.load(table).find(home, exe))
+    yield Benchmark(f"upsert/replace[{size}]", lambda: JdkIndex.load(table).upsert(home, exe, lambda old: payload))
+
+    scratch = work / f"scratch.{size}.xml"
+    new_home, new_exe = project(size + 1)
+
+    def fresh_copy():
+        shutil.copyfile(table, scratch)
+        JdkIndex.load(scratch).save()
+
+    yield Benchmark(
+        f"upsert/insert[{size}]",
+        lambda: JdkIndex.load(scratch).upsert(new_home, new_exe, lambda old: payload),
+        setup=fresh_copy,
+    )
+
+
+def other_benchmarks(samples: list[Element]) -> Iterator[Benchmark]:
+    jdk = samples[0]
+    yield Benchmark("serialize/jdk", lambda: jdk_table.serialize(jdk))
+
+    dump = ROOT / "example_config" / "macos_sys_config.json"
+    data = dump.read_bytes()
+    yield Benchmark("config_vars/from_json", lambda: PythonConfigVars.from_json(data).VERSION)
+    yield Benchmark("config_vars/from_file", lambda: PythonConfigVars.from_file(dump).VERSION)
+    yield Benchmark("config_vars/as_dict", lambda: PythonConfigVars.from_json(data).as_dict())
+
+    # Every root of every sample, expanded and collapsed again by a fresh engine and by a warm one
+    urls = [root.get("url", "").removeprefix("file://") for sample in samples for root in sample.iter("root")]
+    urls = [url for url in urls if url]
+    values = {USER_HOME: "/home/dev", APPLICATION_HOME_DIR: "/opt/pycharm"}
+
+    def round_trip(engine: Macros):
+        for url in urls:
+            engine.collapse(engine.expand(url))
+
+    yield Benchmark(f"macros/cold[{len(urls)}]", lambda: round_trip(Macros(values)))
+    warm = Macros(values)
+    yield Benchmark(f"macros/warm[{len(urls)}]", lambda: round_trip(warm))
+
+    pycharm = Path("/opt/pycharm/bin/pycharm.sh")
+    files = [Path(f"src/package_{i // 100}/module_{i}.py") for i in range(10_000)]
+    refs = [FileRef(path, line=i, column=1) for i, path in enumerate(files[:100])]
+    yield Benchmark("command/format[10000]", lambda: make_format_files_command(pycharm, *files, masks=["*.py"]))
+    yield Benchmark("command/open[100]", lambda: make_open_file_command(pycharm, *refs))
+
+
+def machine() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine()}
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--save", action="store_true", help="record the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.5, help="slowdown vs the baseline that counts")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="table sizes to synthesize")
+    parser.add_argument("-k", dest="pattern", default="", help="only run benchmarks with this in their name")
+    args = parser.parse_args(argv)
+
+    samples = [fromstring((ROOT / "example_xml" / f"{name}_jdk.tools.xml").read_text()) for name in SAMPLES]
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {"machine": None, "results": {}}
+    if baseline["machine"] not in (None, machine()):
+        print(f"Baseline was recorded on {baseline['machine']}, comparisons are rough")
+
+    results: dict[str, float] = {}
+    regressions = []
+    with tempfile.TemporaryDirectory(prefix="hatch-pycharm-bench-") as tmp:
+        work = Path(tmp)
+        os.environ["HATCH_PYCHARM_CACHE_DIR"] = str(work / "cache")
+        benches = [bench for size in args.sizes for bench in table_benchmarks(work, size, samples)]
+        benches += other_benchmarks(samples)
+        print(f"{'benchmark':<28} {'ms':>10} {'baseline':>10} {'ratio':>7}")
+        for bench in benches:
+            if args.pattern not in bench.name:
+                continue
+            seconds = results[bench.name] = measure(bench)
+            before = baseline["results"].get(bench.name)
+            ratio = seconds / before if before else None
+            flag = ""
+            if ratio and ratio > args.threshold:
+                regressions.append(bench.name)
+                flag = "  REGRESSION"
+            before_ms = f"{before * 1e3:>10.3f}" if before else f"{'-':>10}"
+            ratio_text = f"{ratio:>7.2f}" if ratio else f"{'-':>7}"
+            print(f"{bench.name:<28} {seconds * 1e3:>10.3f} {before_ms} {ratio_text}{flag}")
+
+    if args.save:
+        # A run narrowed with -k or --sizes only updates what it measured
+        merged = {**baseline["results"], **results}
+        BASELINE.write_text(json.dumps({"machine": machine(), "results": merged}, indent=2) + "\n")
+        print(f"Saved {len(results)} results to {BASELINE}, {len(merged)} in total")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
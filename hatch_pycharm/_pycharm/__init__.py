@@ -2,11 +2,11 @@
 
 import logging
 from collections.abc import Iterable
-from functools import wraps
 from itertools import chain
 from pathlib import Path
 from typing import NamedTuple
 
+from hatch_pycharm._pycharm.tracing import traced_command
 from hatch_pycharm._pycharm.types import FMT
 
 log = logging.getLogger(__name__)
@@ -27,18 +27,7 @@ class FileRef(NamedTuple):
             yield str(self.column)
 
 
-def log_command(f):
-    @wraps(f)
-    def inner(*args, **kwargs):
-        log.debug("Function %s received the args `%s` and the kwargs `%s`", args, kwargs)
-        res = f(*args, **kwargs)
-        log.debug("Function %s created the command %s", f.__name__, res)
-        return res
-
-    return inner
-
-
-@log_command
+@traced_command
 def make_open_file_command(pycharm: Path, *files: FileRef | Path) -> Iterable[str]:
     # Making it a list of FileRef instead of FileRef or paths
     files: list[FileRef] = [p if isinstance(p, FileRef) else FileRef(p) for p in files]
@@ -47,7 +36,7 @@ def make_open_file_command(pycharm: Path, *files: FileRef | Path) -> Iterable[st
     return cmd
 
 
-@log_command
+@traced_command
 def make_compare_file_command(pycharm: Path, path1: Path, path2: Path, path3: Path = None) -> Iterable[str]:
     """
     Runs Pycharm, asking for a diff between two or three files.
@@ -59,7 +48,7 @@ def make_compare_file_command(pycharm: Path, path1: Path, path2: Path, path3: Pa
     return cmd
 
 
-@log_command
+@traced_command
 def make_merge_file_command(pycharm: Path, path1: Path, path2: Path, output: Path, base: Path = None) -> Iterable[str]:
     """
     Runs PyCharm, asking for a merge between two or three files.
@@ -78,7 +67,7 @@ def make_merge_file_command(pycharm: Path, path1: Path, path2: Path, output: Pat
     return cmd
 
 
-@log_command
+@traced_command
 def make_format_files_command(
     pycharm: Path,
     *files: Path,
@@ -121,7 +110,7 @@ def make_format_files_command(
     return cmd
 
 
-@log_command
+@traced_command
 def make_code_inspections_command(
     pycharm: Path,
     project: Path,
@@ -150,7 +139,7 @@ def make_code_inspections_command(
     return cmd
 
 
-@log_command
+@traced_command
 def make_install_plugins_command(pycharm: Path, *plugins: str) -> Iterable[str]:
     """
     Runs PyCharm, asking installation of plugins either by plugin-id or repository-url
@@ -0,0 +1,69 @@
+"""
+Work that doesn't have to finish before the user's command runs.
+
+Launching the IDE and registering an SDK take seconds, while hatch still has dependencies to install and a command to
+run. `run_in_background` hands the work to a thread and `at_command_end` collects it once the hatch command is done,
+the IDE itself is started detached so it never holds up the command at all.
+"""
+
+import atexit
+import logging
+import os
+import subprocess
+import sys
+import threading
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+
+def launch_detached(cmd: Iterable[Any]) -> subprocess.Popen:
+    """Starts `cmd` in its own session with nothing attached, so it outlives us and never waits on our pipes"""
+    kwargs: dict[str, Any] = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    cmd = [os.fspath(arg) for arg in cmd]
+    log.debug("Launching %s", cmd)
+    return subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        close_fds=True,
+        **kwargs,
+    )
+
+
+def run_in_background(fn: Callable, *args, name: str = None) -> Future:
+    """Runs `fn` on its own thread, the future holds what it returned or raised"""
+    future: Future = Future()
+
+    def worker():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    # Not a daemon, an interpreter exiting early still waits for a table write to finish
+    threading.Thread(target=worker, name=name or f"hatch-pycharm-{fn.__name__}").start()
+    return future
+
+
+def at_command_end(callback: Callable[[], Any]) -> None:
+    """Calls `callback` once the current click command finishes, or at exit when there is no click command"""
+    try:
+        from click import get_current_context
+
+        ctx = get_current_context(silent=True)
+    except ImportError:
+        ctx = None
+    if ctx is not None:
+        ctx.call_on_close(callback)
+    else:
+        atexit.register(callback)
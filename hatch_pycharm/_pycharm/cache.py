@@ -0,0 +1,105 @@
+"""Small helpers for the on-disk state we keep between hatch invocations"""
+
+import errno
+import json
+import logging
+import os
+import sys
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any
+
+from hatch_pycharm._pycharm.platform_paths import cache_dir
+
+log = logging.getLogger(__name__)
+
+# Bump this when the shape of anything we write changes, old files are then simply ignored
+CACHE_VERSION = 1
+
+
+def cache_file(name: str) -> Path:
+    return cache_dir() / name
+
+
+@contextmanager
+def atomic_write(path: Path, mode: str = "w", **kwargs) -> Iterator[IO]:
+    """
+    Write to a temp file next to `path` and rename it over the top once the block finishes without error, readers
+    either see the old file or the new one, never half of one.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """
+    Holds an advisory lock on `path` (created if needed) for the block. Every process and thread that opens the file
+    for itself is excluded, the lock goes away with the process if it dies holding it.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a+b") as f:
+        if sys.platform == "win32":
+            import msvcrt
+
+            # The lock covers the first byte from the current position, which append mode doesn't start at
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError as e:
+                    # LK_LOCK gives up with EDEADLOCK after ten tries a second apart, keep waiting like flock does.
+                    # Anything else isn't contention and waiting won't fix it
+                    if e.errno != errno.EDEADLOCK:
+                        raise
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def load_json(path: Path) -> Any:
+    """Returns the cached document, or None if it is missing, unreadable or from another cache version"""
+    try:
+        with path.open("rb") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("cache_version") != CACHE_VERSION:
+        return None
+    return data
+
+
+def dump_json(path: Path, data: dict) -> None:
+    try:
+        with atomic_write(path, encoding="utf-8") as f:
+            json.dump({**data, "cache_version": CACHE_VERSION}, f)
+    except OSError:
+        # A cache we can't write is a slow path, not a failure
+        log.debug("Unable to write cache file %s", path, exc_info=True)
+
+
+def mtime_ns(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
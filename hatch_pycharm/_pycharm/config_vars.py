@@ -0,0 +1,125 @@
+"""
+An interpreter's `sysconfig.get_config_vars()`, decoded one key at a time.
+
+A dump holds ~700 keys and we keep one per environment alive, while the plugin only ever reads a handful of them. So
+`PythonConfigVars` wraps the raw JSON (bytes, or an mmap of a cache file) without copying or parsing it, and finds and
+decodes a value the first time its key is read. Config vars are a flat object of strings and numbers, which is what
+makes finding a key with `find` safe: inside a JSON string every `"` is escaped, so `"KEY"` followed by `:` and preceded
+by `{` or `,` can only be a key.
+"""
+
+import json
+import mmap
+import re
+import sys
+from collections.abc import Iterator
+from pathlib import Path
+
+_WHITESPACE = b" \t\r\n"
+_scalar = re.compile(rb'\s*:\s*("(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null)', re.DOTALL)
+_key = re.compile(rb'[{,]\s*"((?:[^"\\]|\\.)*)"\s*:', re.DOTALL)
+_missing = object()
+
+
+class PythonConfigVars:
+    """An interpreter's `sysconfig.get_config_vars()`, one attribute per config var"""
+
+    __slots__ = ("_buffer", "_values")
+
+    def __init__(self, buffer: bytes | mmap.mmap = None, /, **config_vars):
+        self._buffer = buffer
+        # Interned, so the same few hundred key strings are shared by every instance
+        self._values = {sys.intern(k): v for k, v in config_vars.items()}
+
+    @classmethod
+    def from_json(cls, data: str | bytes | mmap.mmap) -> "PythonConfigVars":
+        """Wraps a JSON dump without parsing it, nothing is decoded until it is read"""
+        return cls(data.encode("utf-8") if isinstance(data, str) else data)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "PythonConfigVars":
+        with path.open("rb") as f:
+            # Windows won't let anyone replace a file while it is mapped, so read it there
+            if sys.platform == "win32" or not path.stat().st_size:
+                return cls.from_json(f.read())
+            return cls.from_json(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _is_key(self, pos: int) -> bool:
+        buf = self._buffer
+        pos -= 1
+        while pos >= 0 and buf[pos : pos + 1] in _WHITESPACE:
+            pos -= 1
+        return pos >= 0 and buf[pos : pos + 1] in (b"{", b",")
+
+    def _decode_everything(self) -> None:
+        # In the dump's order, with anything we already hold taking precedence
+        values = {sys.intern(k): v for k, v in json.loads(bytes(self._buffer)).items()}
+        values.update(self._values)
+        self._values = values
+        self._buffer = None
+
+    def _lookup(self, key: str):
+        buf = self._buffer
+        if buf is None:
+            return _missing
+        needle = json.dumps(key).encode("ascii")
+        pos = buf.find(needle)
+        while pos != -1:
+            if self._is_key(pos):
+                match = _scalar.match(buf, pos + len(needle))
+                if match is None:
+                    # Not a flat scalar after all, this buffer needs a real parse
+                    self._decode_everything()
+                    return self._values.get(key, _missing)
+                value = json.loads(match.group(1))
+                self._values[sys.intern(key)] = value
+                return value
+            pos = buf.find(needle, pos + 1)
+        return _missing
+
+    def __getattr__(self, key: str):
+        if key in PythonConfigVars.__slots__:
+            # Only reachable before __init__ ran, e.g. while copying
+            raise AttributeError(key)
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        value = self._lookup(key)
+        if value is _missing:
+            msg = f"{type(self).__name__!r} object has no attribute {key!r}"
+            raise AttributeError(msg)
+        return value
+
+    def get(self, key: str, default=None):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _missing) is not _missing
+
+    def keys(self) -> Iterator[str]:
+        if self._buffer is not None:
+            for match in _key.finditer(self._buffer):
+                yield json.loads(b'"' + match.group(1) + b'"')
+        else:
+            yield from self._values
+
+    def as_dict(self) -> dict:
+        # Everything is wanted, one full parse beats a search of the buffer per key
+        if self._buffer is not None:
+            self._decode_everything()
+        return dict(self._values)
+
+    def __eq__(self, other):
+        if not isinstance(other, PythonConfigVars):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        state = "lazy" if self._buffer is not None else f"{len(self._values)} vars"
+        return f"<{type(self).__name__} {state}>"
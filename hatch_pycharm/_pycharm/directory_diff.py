@@ -0,0 +1,193 @@
+"""
+Compares two directory trees and opens only the files that differ in the IDE.
+
+`make_compare_file_command` diffs one pair of files per launch. Here both trees are walked, files of different size
+are different without reading them, and the remaining pairs are hashed on a thread pool (large files through `mmap`,
+hashlib lets go of the GIL while it digests a big buffer). Identical files never reach the IDE. The differing files
+are linked into a pair of staging trees that mirror the originals, and a single `diff` of those two directories opens
+all of them in one session. Editing a file in that session edits the original, the staging trees only hold symlinks.
+Where symlinks can't be made (Windows without the privilege), each changed pair gets its own file diff instead, and
+a file on only one side is diffed against an empty placeholder.
+ref: https://www.jetbrains.com/help/pycharm/command-line-differences-viewer.html
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+from hatch_pycharm._pycharm import make_compare_file_command, settings
+from hatch_pycharm._pycharm.background import launch_detached
+from hatch_pycharm._pycharm.cache import cache_file, mtime_ns
+from hatch_pycharm._pycharm.tracing import traced
+
+log = logging.getLogger(__name__)
+
+SKIP_DIRS = frozenset((".git", ".hg", ".svn", "__pycache__"))
+# Past this a file is hashed from a mapping instead of through read() copies
+MMAP_THRESHOLD = 1 << 20
+CHUNK = 1 << 16
+# Staging trees of earlier comparisons kept around, the IDE may still have them open
+MAX_KEPT = 4
+
+
+class DirectoryDiff(NamedTuple):
+    # Tree-relative posix paths
+    changed: list[str]
+    left_only: list[str]
+    right_only: list[str]
+    identical: int
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.left_only or self.right_only)
+
+
+def tree_files(root: Path) -> dict[str, os.stat_result]:
+    """Every file under `root` by relative posix path, without VCS metadata and bytecode caches"""
+    found = {}
+    pending = [(root, "")]
+    while pending:
+        directory, prefix = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    rel = f"{prefix}{entry.name}"
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS:
+                            pending.append((Path(entry.path), f"{rel}/"))
+                    elif entry.is_file():
+                        found[rel] = entry.stat()
+        except OSError:
+            log.debug("Unable to list %s", directory, exc_info=True)
+    return found
+
+
+def file_digest(path: Path, size: int) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        else:
+            for chunk in iter(lambda: f.read(CHUNK), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+@traced()
+def diff_trees(left: Path, right: Path, workers: int = None) -> DirectoryDiff:
+    """Which files differ between `left` and `right`, only pairs of the same size are read"""
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as pool:
+        left_files, right_files = pool.map(tree_files, (left, right))
+        changed, candidates = [], []
+        identical = 0
+        for rel in left_files.keys() & right_files.keys():
+            a, b = left_files[rel], right_files[rel]
+            if a.st_size != b.st_size:
+                changed.append(rel)
+            elif os.path.samestat(a, b) or a.st_size == 0:
+                identical += 1
+            else:
+                candidates.append(rel)
+
+        def same(rel: str) -> bool:
+            size = left_files[rel].st_size
+            try:
+                return file_digest(left / rel, size) == file_digest(right / rel, size)
+            except (OSError, ValueError):
+                # Vanished or changed size under us, whatever it is now it's worth a look
+                return False
+
+        for rel, equal in zip(candidates, pool.map(same, candidates)):
+            if equal:
+                identical += 1
+            else:
+                changed.append(rel)
+    return DirectoryDiff(
+        sorted(changed),
+        sorted(left_files.keys() - right_files.keys()),
+        sorted(right_files.keys() - left_files.keys()),
+        identical,
+    )
+
+
+def _staging_dir(left: Path, right: Path) -> Path:
+    key = f"{os.path.abspath(left)}|{os.path.abspath(right)}"
+    return cache_file(f"diffs/{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}")
+
+
+def _prune(root: Path, keep: Path) -> None:
+    try:
+        others = [Path(entry.path) for entry in os.scandir(root) if entry.is_dir() and entry.path != str(keep)]
+    except OSError:
+        return
+    others.sort(key=lambda path: mtime_ns(path) or 0, reverse=True)
+    for path in others[MAX_KEPT - 1 :]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _placeholder() -> Path:
+    """An empty file to diff one-sided files against, next to the staging trees"""
+    path = cache_file("diffs/empty")
+    if not path.is_file():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    return path
+
+
+def stage(diff: DirectoryDiff, left: Path, right: Path) -> tuple[Path, Path]:
+    """Two trees of symlinks to the differing files, raises OSError when symlinks can't be made"""
+    staging = _staging_dir(left, right)
+    shutil.rmtree(staging, ignore_errors=True)
+    sides = []
+    for name, root, only in (("left", left, diff.left_only), ("right", right, diff.right_only)):
+        side = staging / name
+        side.mkdir(parents=True)
+        for rel in diff.changed + only:
+            link = side / rel
+            link.parent.mkdir(parents=True, exist_ok=True)
+            link.symlink_to((root / rel).absolute())
+        sides.append(side)
+    _prune(staging.parent, staging)
+    return sides[0], sides[1]
+
+
+@traced()
+def open_directory_diff(left: Path, right: Path, pycharm: Path = None, workers: int = None) -> DirectoryDiff:
+    """Opens what differs between `left` and `right` in as few diff sessions as it takes, usually one"""
+    diff = diff_trees(left, right, workers)
+    log.debug(
+        "%d changed, %d only in %s, %d only in %s, %d identical",
+        len(diff.changed),
+        len(diff.left_only),
+        left,
+        len(diff.right_only),
+        right,
+        diff.identical,
+    )
+    if not diff:
+        return diff
+    pycharm = pycharm or settings.pycharm_exe
+    if len(diff.changed) == 1 and not diff.left_only and not diff.right_only:
+        (rel,) = diff.changed
+        launch_detached(make_compare_file_command(pycharm, left / rel, right / rel))
+        return diff
+    try:
+        staged = stage(diff, left, right)
+    except OSError:
+        log.debug("Unable to stage %s against %s, opening file by file", left, right, exc_info=True)
+        for rel in diff.changed:
+            launch_detached(make_compare_file_command(pycharm, left / rel, right / rel))
+        # A file on one side only is diffed against nothing, like the directory diff shows it
+        empty = _placeholder()
+        for rel in diff.left_only:
+            launch_detached(make_compare_file_command(pycharm, left / rel, empty))
+        for rel in diff.right_only:
+            launch_detached(make_compare_file_command(pycharm, empty, right / rel))
+        return diff
+    launch_detached(make_compare_file_command(pycharm, *staged))
+    return diff
@@ -0,0 +1,159 @@
+"""
+Finds the PyCharm installs and settings directories on this machine, newest first.
+
+A cold scan lists every Toolbox channel and versioned settings directory and reads a `build.txt` per install, so the
+result is kept in an index on disk. Adding or removing an entry in a directory bumps that directory's mtime, so the
+index remembers the mtime of every directory it listed and only rescans when one of them changed.
+"""
+
+import logging
+import re
+from functools import cache
+from pathlib import Path
+from typing import NamedTuple
+
+from hatch_pycharm._pycharm.cache import cache_file, dump_json, load_json, mtime_ns
+from hatch_pycharm._pycharm.platform_paths import config_search_root, install_layout, install_search_patterns
+from hatch_pycharm._pycharm.tracing import traced
+from hatch_pycharm._pycharm.types import Build_EXE, BuildNumber
+
+log = logging.getLogger(__name__)
+
+INDEX_NAME = "discovery.json"
+_build_re = re.compile(r"^(?:[A-Z]+-)?(\d+)\.(\d+)(?:\.(\d+))?")
+_config_re = re.compile(r"^PyCharm(?:CE)?(\d{4})\.(\d+)$")
+
+
+class Discovered(NamedTuple):
+    installs: list[Build_EXE]
+    config_dirs: list[Build_EXE]
+
+
+def parse_build_number(text: str) -> BuildNumber | None:
+    """Parses `build.txt` contents like `PY-232.8660.197`, returns None for snapshots and garbage"""
+    match = _build_re.match(text.strip())
+    if not match:
+        return None
+    major, minor, patch = match.groups()
+    return int(major), int(minor), int(patch or 0)
+
+
+def launcher_build(exe: Path) -> BuildNumber | None:
+    """The build of the install `exe` launches, read from its `build.txt`"""
+    # bin/pycharm.sh and Contents/MacOS/pycharm are both two levels below the install home
+    home = exe.parent.parent
+    for build_file in (home / "build.txt", home / "Resources" / "build.txt"):
+        try:
+            return parse_build_number(build_file.read_text())
+        except OSError:
+            continue
+    return None
+
+
+def config_dir_build(name: str) -> BuildNumber | None:
+    """
+    Settings directories are named by marketing version, `PyCharm2023.2` belongs to the 232 branch. Mapping it onto
+    the branch keeps config dirs and installs comparable on the first element.
+    """
+    match = _config_re.match(name)
+    if not match:
+        return None
+    year, release = map(int, match.groups())
+    return (year - 2000) * 10 + release, 0, 0
+
+
+class _Scanner:
+    """Walks the search patterns, remembering the mtime of every directory it had to list"""
+
+    def __init__(self):
+        self.watched: dict[str, int | None] = {}
+
+    def listdir(self, parent: Path, pattern: str) -> list[Path]:
+        self.watched[str(parent)] = mtime_ns(parent)
+        try:
+            return sorted(p for p in parent.glob(pattern) if p.is_dir())
+        except OSError:
+            return []
+
+    def expand(self, parent: Path, globs: tuple[str, ...]) -> list[Path]:
+        level = [parent]
+        for pattern in globs:
+            level = [child for p in level for child in self.listdir(p, pattern)]
+        return level
+
+    def installs(self) -> list[Build_EXE]:
+        found: dict[Path, BuildNumber] = {}
+        for parent, globs in install_search_patterns():
+            for home in self.expand(parent, globs):
+                exe, build_file = install_layout(home)
+                if not exe.is_file():
+                    continue
+                try:
+                    build = parse_build_number(build_file.read_text())
+                except OSError:
+                    build = None
+                if build:
+                    found[exe] = build
+        return rank(found.items())
+
+    def config_dirs(self) -> list[Build_EXE]:
+        found = []
+        for path in self.listdir(config_search_root(), "PyCharm*"):
+            build = config_dir_build(path.name)
+            if build:
+                found.append((path, build))
+        return rank(found)
+
+
+def rank(found) -> list[Build_EXE]:
+    """Newest build first, ties broken by path so the order is stable between scans"""
+    return [(build, path) for path, build in sorted(found, key=lambda item: (item[1], str(item[0])), reverse=True)]
+
+
+@traced()
+def scan() -> tuple[Discovered, dict[str, int | None]]:
+    scanner = _Scanner()
+    discovered = Discovered(scanner.installs(), scanner.config_dirs())
+    return discovered, scanner.watched
+
+
+def _is_fresh(index: dict) -> bool:
+    return all(mtime_ns(Path(p)) == mtime for p, mtime in index["watched"].items())
+
+
+def _from_index(rows: list) -> list[Build_EXE]:
+    return [(tuple(build), Path(path)) for build, path in rows]
+
+
+def _to_index(found: list[Build_EXE]) -> list:
+    return [[list(build), str(path)] for build, path in found]
+
+
+@traced()
+def discover(refresh: bool = False) -> Discovered:
+    """
+    Returns the ranked installs and settings directories, from the index when none of the scanned directories
+    have changed since it was written.
+    """
+    index_path = cache_file(INDEX_NAME)
+    index = None if refresh else load_json(index_path)
+    if index is not None and _is_fresh(index):
+        log.debug("Using PyCharm discovery index %s", index_path)
+        return Discovered(_from_index(index["installs"]), _from_index(index["config_dirs"]))
+    log.debug("Scanning for PyCharm installs")
+    discovered, watched = scan()
+    dump_json(
+        index_path,
+        {
+            "watched": watched,
+            "installs": _to_index(discovered.installs),
+            "config_dirs": _to_index(discovered.config_dirs),
+        },
+    )
+    return discovered
+
+
+@cache
+def discovered() -> Discovered:
+    """`discover` memoized for the life of the process"""
+    return discover()
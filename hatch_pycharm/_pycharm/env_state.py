@@ -0,0 +1,61 @@
+"""
+What the IDE was last told about an environment.
+
+The fingerprint covers everything that ends up in the SDK entry: the interpreter's identity, its `sys.path`, the
+dependencies hatch installed and the PyCharm build and table being written to. For a project it also covers whether the
+SDK entry is still in the table and the project model's files are still there, the user can remove either from the IDE
+or the disk and the next run puts them back. When it matches what was recorded after the last registration the table
+is already right and the IDE has nothing new to see, so nothing is written.
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+from hatch_pycharm._pycharm import settings
+from hatch_pycharm._pycharm.cache import cache_file, dump_json, load_json
+from hatch_pycharm._pycharm.interpreter import identity, probe
+from hatch_pycharm._pycharm.jdk_index import JdkIndex
+from hatch_pycharm._pycharm.project_model import idea_dir, module_file
+
+log = logging.getLogger(__name__)
+
+
+def fingerprint(exe: Path, dependency_hash: str, project: Path = None) -> dict:
+    build = settings.build_number
+    table = settings.jdk_tools_xml
+    current = {
+        "interpreter": identity(exe),
+        "sys_path": probe(exe).sys_path,
+        "dependencies": dependency_hash,
+        "build": list(build) if build else None,
+        "table": str(table),
+    }
+    if project is not None:
+        # The table's index answers from its cache while the table is unchanged
+        current["registered"] = JdkIndex.load(table).lookup(project, exe) is not None
+        model = [module_file(project), idea_dir(project) / "modules.xml", idea_dir(project) / "misc.xml"]
+        current["model"] = [path.is_file() for path in model]
+    return current
+
+
+def _state_path(env_dir: Path) -> Path:
+    name = hashlib.blake2b(os.path.abspath(env_dir).encode(), digest_size=16).hexdigest()
+    return cache_file(f"environments/{name}.json")
+
+
+def is_current(env_dir: Path, current: dict) -> bool:
+    state = load_json(_state_path(env_dir))
+    return state is not None and state["fingerprint"] == current
+
+
+def record(env_dir: Path, current: dict) -> None:
+    dump_json(_state_path(env_dir), {"fingerprint": current})
+
+
+def forget(env_dir: Path) -> None:
+    try:
+        _state_path(env_dir).unlink()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,177 @@
+"""
+Formats a large tree with several headless formatter processes at once.
+
+`make_format_files_command` takes every path on one command line, which either runs out of argv space or leaves one
+JVM formatting tens of thousands of files on a single core. Here the paths are expanded up front (honouring `masks`
+and `recursive` the way the formatter would), packed into shards that fit the platform's argv limit, and run on a
+bounded `Runner`. Each pool slot gets its own config and system directories through a `PYCHARM_PROPERTIES` file, since two
+IDE processes refuse to share them, and the slot directories are reused by the shards that run in that slot.
+ref: https://www.jetbrains.com/help/pycharm/command-line-formatter.html
+ref: https://www.jetbrains.com/help/pycharm/tuning-the-ide.html#configure-platform-properties
+"""
+
+import asyncio
+import logging
+import os
+import re
+import sys
+import tempfile
+from collections.abc import Iterable, Iterator
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import NamedTuple
+
+from hatch_pycharm._pycharm import make_format_files_command
+from hatch_pycharm._pycharm.runner import Runner
+from hatch_pycharm._pycharm.tracing import traced
+
+log = logging.getLogger(__name__)
+
+# CreateProcess caps the whole command line at 32767 characters
+WINDOWS_COMMAND_LINE = 32_000
+# Room for whatever the launcher script adds on its way to the JVM
+HEADROOM = 16 * 1024
+_result_re = re.compile(r"^(?:Formatting|Checking) (?P<path>.+?)\.\.\.(?P<status>.*)$")
+
+
+def arg_max() -> int:
+    """How many bytes of argv we can hand a child, after the environment took its share"""
+    if sys.platform == "win32":
+        return WINDOWS_COMMAND_LINE
+    try:
+        limit = os.sysconf("SC_ARG_MAX")
+    except (ValueError, OSError):
+        limit = 128 * 1024
+    env = sum(len(k) + len(v) + 2 + 8 for k, v in os.environ.items())
+    return max(limit - env - HEADROOM, 4096)
+
+
+def arg_size(arg: str) -> int:
+    # The string, its terminator and the pointer to it
+    return len(os.fsencode(arg)) + 1 + 8
+
+
+def _matches(path: Path, masks: Iterable[str]) -> bool:
+    return not masks or any(fnmatch(path.name, mask) for mask in masks)
+
+
+def expand_paths(paths: Iterable[Path], masks: Iterable[str] = (), recursive: bool = False) -> Iterator[Path]:
+    """The files the formatter would visit for these arguments"""
+    masks = tuple(masks)
+    for path in paths:
+        if not path.is_dir():
+            yield path
+        elif recursive:
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    candidate = Path(root, name)
+                    if _matches(candidate, masks):
+                        yield candidate
+        else:
+            yield from sorted(p for p in path.iterdir() if p.is_file() and _matches(p, masks))
+
+
+def shard(files: list[Path], base_size: int, shards: int = 1, limit: int = None) -> list[list[Path]]:
+    """
+    Splits `files` into at least `shards` even runs (so a small tree still uses the whole pool), cutting a run early
+    wherever the next path would push its argv past `limit`.
+    """
+    limit = limit or arg_max()
+    if not files:
+        return []
+    per_shard = -(-len(files) // max(shards, 1))
+    result: list[list[Path]] = []
+    current: list[Path] = []
+    size = base_size
+    for path in files:
+        cost = arg_size(str(path))
+        if current and (len(current) >= per_shard or size + cost > limit):
+            result.append(current)
+            current, size = [], base_size
+        current.append(path)
+        size += cost
+    result.append(current)
+    return result
+
+
+class ShardResult(NamedTuple):
+    files: list[Path]
+    returncode: int
+    output: str
+
+
+class FormatReport(NamedTuple):
+    shards: list[ShardResult]
+
+    @property
+    def returncode(self) -> int:
+        """The first non-zero exit status of any shard"""
+        return next((s.returncode for s in self.shards if s.returncode), 0)
+
+    def statuses(self) -> dict[str, str]:
+        """Path to the formatter's verdict for it: `OK`, `Needs reformatting`, `Skipped, ...`"""
+        found = {}
+        for result in self.shards:
+            for line in result.output.splitlines():
+                match = _result_re.match(line.strip())
+                if match:
+                    found[match["path"]] = match["status"].strip()
+        return found
+
+    @property
+    def needs_reformatting(self) -> list[str]:
+        return [path for path, status in self.statuses().items() if status.lower().startswith("needs reformatting")]
+
+
+def _slot_environment(slot: Path) -> dict[str, str]:
+    properties = slot / "idea.properties"
+    if not properties.exists():
+        slot.mkdir(parents=True, exist_ok=True)
+        lines = [f"idea.{name}.path={(slot / name).as_posix()}" for name in ("config", "system", "log")]
+        properties.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return {**os.environ, "PYCHARM_PROPERTIES": str(properties)}
+
+
+@traced()
+def format_files(
+    pycharm: Path,
+    *files: Path,
+    masks: Iterable[str] = (),
+    recursive: bool = False,
+    settings: Path = None,
+    allow_defaults: bool = False,
+    charset: str = None,
+    dry: bool = False,
+    workers: int = None,
+    slots_dir: Path = None,
+) -> FormatReport:
+    """`make_format_files_command` for any number of files, sharded over `workers` formatter processes"""
+    masks = tuple(masks)
+    workers = workers or min(os.cpu_count() or 1, 4)
+    options = {"masks": masks, "settings": settings, "allow_defaults": allow_defaults, "charset": charset, "dry": dry}
+    base_size = sum(arg_size(str(arg)) for arg in make_format_files_command(pycharm, **options))
+    shards = shard(list(expand_paths(files, masks, recursive)), base_size, workers)
+    log.debug("Formatting in %d shards on %d workers", len(shards), workers)
+
+    with tempfile.TemporaryDirectory(prefix="hatch-pycharm-format-") as tmp:
+        root = slots_dir or Path(tmp)
+
+        async def main() -> list[ShardResult]:
+            runner = Runner(limit=workers)
+            free_slots: asyncio.Queue[Path] = asyncio.Queue()
+            for n in range(min(workers, len(shards))):
+                free_slots.put_nowait(root / f"slot-{n}")
+
+            async def run(paths: list[Path]) -> ShardResult:
+                slot = await free_slots.get()
+                try:
+                    cmd = make_format_files_command(pycharm, *paths, **options)
+                    result = await runner.run(cmd, env=_slot_environment(slot))
+                finally:
+                    free_slots.put_nowait(slot)
+                return ShardResult(paths, result.returncode, result.stdout + result.stderr)
+
+            return await asyncio.gather(*(run(paths) for paths in shards))
+
+        return FormatReport(list(asyncio.run(main())))
@@ -0,0 +1,83 @@
+"""
+The `<root>` entries every SDK gets from PyCharm's bundled helpers: `python-skeletons`, typeshed's `stdlib` and one per
+directory in typeshed's `stubs`.
+
+They only depend on the PyCharm build, so they are listed once per `BuildNumber`, rendered into the XML fragment that
+goes into each `<jdk>`, and cached on disk. Generating an SDK then pastes the fragment in instead of walking the helpers
+tree and building a couple of hundred elements.
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import NamedTuple
+
+from hatch_pycharm._pycharm.cache import cache_file, dump_json, load_json, mtime_ns
+from hatch_pycharm._pycharm.macros import collapse_macros
+from hatch_pycharm._pycharm.tracing import traced
+from hatch_pycharm._pycharm.types import BuildNumber
+
+log = logging.getLogger(__name__)
+
+# Depth of the entries inside a `<jdk>` as the table writes it: jdk > roots > classPath > root > root
+ROOT_INDENT = " " * 12
+
+
+class HelperManifest(NamedTuple):
+    urls: list[str]
+    fragment: str
+
+
+def escape_attrib(text: str) -> str:
+    """Escapes an attribute value exactly like ElementTree does, so rendered and built SDKs are byte identical"""
+    for char, entity in (
+        ("&", "&amp;"),
+        ("<", "&lt;"),
+        (">", "&gt;"),
+        ('"', "&quot;"),
+        ("\r", "&#13;"),
+        ("\n", "&#10;"),
+        ("\t", "&#09;"),
+    ):
+        if char in text:
+            text = text.replace(char, entity)
+    return text
+
+
+def render_roots(urls: list[str]) -> str:
+    return "".join(f'{ROOT_INDENT}<root url="{escape_attrib(url)}" type="simple" />\n' for url in urls)
+
+
+def list_helper_roots(helpers_dir: Path) -> list[Path]:
+    """The walk the manifest saves us from"""
+    try:
+        stubs = [p for p in (helpers_dir / "typeshed" / "stubs").iterdir() if p.is_dir()]
+    except OSError:
+        stubs = []
+    # The order PyCharm itself writes them in
+    stubs.sort(key=lambda p: (len(p.name), p.name.lower()))
+    return [helpers_dir / "python-skeletons", helpers_dir / "typeshed" / "stdlib", *stubs]
+
+
+def _manifest_path(build: BuildNumber | None, helpers_dir: Path) -> Path:
+    key = str(helpers_dir)
+    if build is None:
+        # Without a build number to go by, a changed stubs directory has to be what invalidates the manifest
+        key += f"|{mtime_ns(helpers_dir / 'typeshed' / 'stubs')}"
+    name = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    version = ".".join(map(str, build)) if build else "unknown"
+    return cache_file(f"helpers/{version}-{name}.json")
+
+
+@traced()
+def helper_manifest(build: BuildNumber | None, helpers_dir: Path) -> HelperManifest:
+    """The helper roots of a build, listed and rendered on first use and read from the cache after that"""
+    path = _manifest_path(build, helpers_dir)
+    data = load_json(path)
+    if data is not None:
+        return HelperManifest(data["urls"], data["fragment"])
+    log.debug("Listing helper roots in %s", helpers_dir)
+    urls = [f"file://{collapse_macros(root)}" for root in list_helper_roots(helpers_dir)]
+    manifest = HelperManifest(urls, render_roots(urls))
+    dump_json(path, manifest._asdict())
+    return manifest
@@ -0,0 +1,197 @@
+"""
+Reads what `inspect` writes, one finding at a time.
+
+Every inspection gets its own report in the output directory, and on a large project those run to hundreds of MB. Each
+`FMT` has a reader that yields `Finding`s as it goes, never holding more than one problem (or one read chunk) at a time:
+`iterparse` for xml, `raw_decode` over a sliding buffer for json and a line regex for plain text. `Summary` aggregates
+a stream as it passes, so gating a build on the results doesn't depend on the size of the report.
+ref: https://www.jetbrains.com/help/pycharm/command-line-code-inspector.html
+"""
+
+import codecs
+import json
+import logging
+import re
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import IO, NamedTuple
+from xml.etree.ElementTree import iterparse
+
+from hatch_pycharm._pycharm.types import FMT
+
+log = logging.getLogger(__name__)
+
+PROJECT_DIR = "$PROJECT_DIR$/"
+CHUNK = 1 << 20
+SUFFIXES: dict[FMT, str] = {"xml": ".xml", "json": ".json", "plain": ".txt"}
+# HighlightSeverity's order, anything we don't know ranks with WARNING
+SEVERITIES = {
+    "INFORMATION": 10,
+    "INFO": 10,
+    "TEXT ATTRIBUTES": 50,
+    "WEAK WARNING": 200,
+    "TYPO": 210,
+    "WARNING": 300,
+    "SERVER PROBLEM": 350,
+    "ERROR": 400,
+}
+# `path:line[:column]: [SEVERITY: ]description`
+_plain_re = re.compile(
+    r"^(?P<file>.+?):(?P<line>\d+)(?::\d+)?:\s+(?:(?P<severity>[A-Z][A-Z ]*[A-Z]):\s+)?(?P<description>.*)$"
+)
+_problems_key_re = re.compile(rb'"problems"\s*:\s*\[')
+
+
+class Finding(NamedTuple):
+    inspection: str
+    file: str
+    line: int
+    severity: str
+    description: str
+
+
+def severity_rank(severity: str) -> int:
+    return SEVERITIES.get(severity.upper().replace("_", " "), SEVERITIES["WARNING"])
+
+
+def project_relative(url: str) -> str:
+    url = url.removeprefix("file://")
+    return url.removeprefix(PROJECT_DIR)
+
+
+def read_xml(report: Path) -> Iterator[Finding]:
+    root = None
+    for event, element in iterparse(report, events=("start", "end")):
+        if root is None:
+            root = element
+        if event != "end" or element.tag != "problem":
+            continue
+        problem_class = element.find("problem_class")
+        attrib = problem_class.attrib if problem_class is not None else {}
+        yield Finding(
+            inspection=attrib.get("id") or report.stem,
+            file=project_relative(element.findtext("file", "")),
+            line=int(element.findtext("line") or 0),
+            severity=attrib.get("severity", ""),
+            description=element.findtext("description", ""),
+        )
+        # Clearing the problem alone would still leave an empty element per problem hanging off the root
+        root.clear()
+
+
+def _iter_array(f: IO[bytes], decoder: json.JSONDecoder) -> Iterator[dict]:
+    """Decodes the objects of the `problems` array one at a time, reading more only when one is cut off"""
+    buffer = f.read(CHUNK)
+    match = _problems_key_re.search(buffer)
+    while match is None:
+        more = f.read(CHUNK)
+        if not more:
+            return
+        # Keep enough of the tail that a key split across reads is still found
+        buffer = buffer[-32:] + more
+        match = _problems_key_re.search(buffer)
+    # Reads can end inside a multibyte character, the incremental decoder holds on to it until the next one
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    text, pos, eof = utf8.decode(buffer[match.end() :]), 0, False
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(text) and text[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(text, pos)
+        except ValueError:
+            if eof:
+                msg = f"Truncated inspection report {getattr(f, 'name', f)}"
+                raise ValueError(msg) from None
+            more = f.read(CHUNK)
+            eof = not more
+            text, pos = text[pos:] + utf8.decode(more, final=eof), 0
+            continue
+        yield obj
+        pos = end
+
+
+def read_json(report: Path) -> Iterator[Finding]:
+    decoder = json.JSONDecoder()
+    with report.open("rb") as f:
+        for problem in _iter_array(f, decoder):
+            problem_class = problem.get("problem_class") or {}
+            yield Finding(
+                inspection=problem_class.get("id") or report.stem,
+                file=project_relative(problem.get("file", "")),
+                line=int(problem.get("line") or 0),
+                severity=problem_class.get("severity", ""),
+                description=problem.get("description", ""),
+            )
+
+
+def read_plain(report: Path) -> Iterator[Finding]:
+    with report.open(encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = _plain_re.match(line.rstrip("\r\n"))
+            if match:
+                yield Finding(
+                    inspection=report.stem,
+                    file=project_relative(match["file"]),
+                    line=int(match["line"]),
+                    severity=match["severity"] or "",
+                    description=match["description"],
+                )
+
+
+READERS = {"xml": read_xml, "json": read_json, "plain": read_plain}
+
+
+def read_output(output: Path, format_: FMT = "xml") -> Iterator[Finding]:
+    """Every finding in an `inspect` output directory, report by report"""
+    reader = READERS[format_]
+    for report in sorted(output.glob(f"*{SUFFIXES[format_]}")):
+        if report.name.startswith("."):
+            # `.descriptions.xml` and friends list the inspections that ran, not what they found
+            continue
+        log.debug("Reading inspection report %s", report)
+        yield from reader(report)
+
+
+def at_least(findings: Iterable[Finding], severity: str) -> Iterator[Finding]:
+    threshold = severity_rank(severity)
+    return (f for f in findings if severity_rank(f.severity) >= threshold)
+
+
+class Summary:
+    """Counts a stream of findings, the findings themselves are not kept"""
+
+    def __init__(self):
+        self.total = 0
+        self.by_severity: Counter[str] = Counter()
+        self.by_inspection: Counter[str] = Counter()
+        self.by_file: Counter[str] = Counter()
+
+    @classmethod
+    def of(cls, findings: Iterable[Finding]) -> "Summary":
+        summary = cls()
+        for finding in findings:
+            summary.add(finding)
+        return summary
+
+    def add(self, finding: Finding) -> None:
+        self.total += 1
+        self.by_severity[finding.severity] += 1
+        self.by_inspection[finding.inspection] += 1
+        self.by_file[finding.file] += 1
+
+    def count(self, severity: str) -> int:
+        """How many findings are `severity` or worse"""
+        threshold = severity_rank(severity)
+        return sum(n for s, n in self.by_severity.items() if severity_rank(s) >= threshold)
+
+    def top_inspections(self, n: int = 10) -> list[tuple[str, int]]:
+        return self.by_inspection.most_common(n)
+
+    def top_files(self, n: int = 10) -> list[tuple[str, int]]:
+        return self.by_file.most_common(n)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(total={self.total}, by_severity={dict(self.by_severity)})"
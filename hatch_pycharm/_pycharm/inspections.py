@@ -0,0 +1,172 @@
+"""
+Runs headless code inspections on what changed since the last run, and nothing else.
+
+Source files are hashed (stat first, so only touched files are read) and compared with the previous run. The changed
+and deleted files are mapped to the fewest subdirectories that cover them, `inspect -d` runs on each, and the fresh
+findings replace the cached ones for every file under those directories. Everything else comes from the cache, which
+is keyed by the project, the inspection profile's content and the PyCharm build, since either of the last two changes
+what gets reported.
+
+An edit can change the findings of files that import the edited one, `refresh=True` runs the whole project again.
+ref: https://www.jetbrains.com/help/pycharm/command-line-code-inspector.html
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from collections.abc import Iterable, Iterator
+from pathlib import Path, PurePosixPath
+from typing import NamedTuple
+
+from hatch_pycharm._pycharm import make_code_inspections_command, settings
+from hatch_pycharm._pycharm.cache import cache_file, dump_json, load_json
+from hatch_pycharm._pycharm.inspection_output import Finding, read_output
+from hatch_pycharm._pycharm.runner import run_command
+from hatch_pycharm._pycharm.tracing import traced
+from hatch_pycharm._pycharm.types import BuildNumber
+
+log = logging.getLogger(__name__)
+
+# Each `inspect` starts a whole IDE, past this many scopes one run over their common parent is cheaper
+MAX_RUNS = 4
+
+
+class InspectionResult(NamedTuple):
+    findings: list[Finding]
+    # The project-relative directories that were inspected, `.` is the whole project
+    scopes: list[str]
+
+
+def _skip_dir(name: str) -> bool:
+    return name.startswith(".") or name == "__pycache__"
+
+
+def source_files(project: Path) -> Iterator[str]:
+    """Project-relative posix paths of everything inspect would look at, without VCS, IDE and venv directories"""
+    for root, dirs, files in os.walk(project):
+        dirs[:] = sorted(d for d in dirs if not _skip_dir(d))
+        rel = Path(root).relative_to(project).as_posix()
+        for name in sorted(files):
+            yield name if rel == "." else f"{rel}/{name}"
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@traced()
+def hash_sources(project: Path, previous: dict[str, list]) -> dict[str, list]:
+    """`[size, mtime_ns, digest]` per file, reusing the previous digest of every file whose stat didn't change"""
+    hashes = {}
+    for rel in source_files(project):
+        path = project / rel
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        old = previous.get(rel)
+        if old and old[:2] == [st.st_size, st.st_mtime_ns]:
+            hashes[rel] = old
+        else:
+            hashes[rel] = [st.st_size, st.st_mtime_ns, file_digest(path)]
+    return hashes
+
+
+def _collapse(dirs: Iterable[PurePosixPath]) -> list[PurePosixPath]:
+    """Drops every directory that already sits under another one"""
+    kept: list[PurePosixPath] = []
+    for d in sorted(set(dirs), key=lambda p: len(p.parts)):
+        if not any(d == k or k in d.parents for k in kept):
+            kept.append(d)
+    return sorted(kept)
+
+
+def _common(a: PurePosixPath, b: PurePosixPath) -> PurePosixPath:
+    parts = []
+    for x, y in zip(a.parts, b.parts):
+        if x != y:
+            break
+        parts.append(x)
+    return PurePosixPath(*parts) if parts else PurePosixPath(".")
+
+
+def covering_dirs(files: Iterable[str], max_runs: int = MAX_RUNS) -> list[str]:
+    """The smallest directories holding all of `files`, merged upwards until there are at most `max_runs` of them"""
+    dirs = _collapse(PurePosixPath(f).parent for f in files)
+    while len(dirs) > max_runs:
+        # Merge the pair that shares the deepest parent, it costs the least extra coverage
+        _, a, b = max((len(_common(a, b).parts), a, b) for i, a in enumerate(dirs) for b in dirs[i + 1 :])
+        dirs = _collapse([d for d in dirs if d not in (a, b)] + [_common(a, b)])
+    return [str(d) for d in dirs]
+
+
+def _cache_path(project: Path, profile: Path, build: BuildNumber | None) -> Path:
+    key = f"{os.path.abspath(project)}|{file_digest(profile)}|{build}"
+    return cache_file(f"inspections/{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}.json")
+
+
+def _surviving(project: Path, deleted: str) -> str:
+    """Stands in for a deleted file with one in its nearest directory that still exists, the whole tree may be gone"""
+    path = PurePosixPath(deleted)
+    parent = path.parent
+    while parent != PurePosixPath(".") and not (project / parent).is_dir():
+        parent = parent.parent
+    return str(parent / path.name)
+
+
+def _in_scope(rel: str, scope: str) -> bool:
+    return scope == "." or rel.startswith(f"{scope}/")
+
+
+@traced()
+def run_inspections(pycharm: Path, project: Path, profile: Path, scope: str) -> list[Finding]:
+    with tempfile.TemporaryDirectory(prefix="hatch-pycharm-inspect-") as output:
+        subdirectory = None if scope == "." else project / scope
+        cmd = make_code_inspections_command(pycharm, project, profile, Path(output), subdirectory=subdirectory)
+        run_command(cmd, check=True)
+        return list(read_output(Path(output)))
+
+
+def inspect_incremental(
+    project: Path,
+    profile: Path,
+    pycharm: Path = None,
+    build: BuildNumber = None,
+    refresh: bool = False,
+    max_runs: int = MAX_RUNS,
+) -> InspectionResult:
+    """All findings for `project`, re-inspecting only the directories with changes since the previous run"""
+    pycharm = pycharm or settings.pycharm_exe
+    build = build or settings.build_number
+    cache_path = _cache_path(project, profile, build)
+    cached = None if refresh else load_json(cache_path)
+    previous_hashes = cached["hashes"] if cached else {}
+    hashes = hash_sources(project, previous_hashes)
+
+    if cached is None:
+        scopes = ["."]
+        findings: dict[str, list] = {}
+    else:
+        changed = {rel for rel, h in hashes.items() if previous_hashes.get(rel, [None] * 3)[2] != h[2]}
+        changed |= {_surviving(project, rel) for rel in previous_hashes.keys() - hashes.keys()}
+        scopes = covering_dirs(changed, max_runs) if changed else []
+        # Only findings of deleted files go, project-level ones and those outside the hashed files stay until a run
+        # over their scope replaces them
+        deleted = previous_hashes.keys() - hashes.keys()
+        findings = {rel: found for rel, found in cached["findings"].items() if rel not in deleted}
+    log.debug("Inspecting %s", scopes or "nothing")
+
+    for scope in scopes:
+        for rel in [rel for rel in findings if _in_scope(rel, scope)]:
+            del findings[rel]
+        for finding in run_inspections(pycharm, project, profile, scope):
+            findings.setdefault(finding.file, []).append(list(finding))
+
+    dump_json(cache_path, {"hashes": hashes, "findings": findings})
+    result = [Finding(*f) for rel in sorted(findings) for f in findings[rel]]
+    return InspectionResult(result, scopes)
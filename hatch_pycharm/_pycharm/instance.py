@@ -0,0 +1,146 @@
+"""
+Talks to a PyCharm that is already running instead of forking the launcher.
+
+Every JetBrains IDE runs a built-in web server on localhost, starting at port 63342 and walking up when the port is
+taken. Its REST API can tell us which product is listening and open files in it, which costs a few milliseconds where
+the launcher costs seconds of JVM startup just to hand the arguments over to the running instance.
+ref: https://www.jetbrains.com/help/pycharm/settings-debugger.html#24aabc8d
+"""
+
+import json
+import logging
+import os
+from collections.abc import Iterable
+from http.client import HTTPConnection, HTTPException
+from pathlib import Path
+from urllib.parse import urlencode
+
+from hatch_pycharm._pycharm import FileRef
+from hatch_pycharm._pycharm.tracing import traced
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PORT = 63342
+# The IDE tries this many ports before giving up on the built-in server
+PORT_RANGE = 20
+HOST = "127.0.0.1"
+TIMEOUT = 0.5
+
+
+class RunningInstance:
+    """A PyCharm answering on `port`, requests share one keep-alive connection"""
+
+    def __init__(self, port: int, host: str = HOST, timeout: float = TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._conn: HTTPConnection | None = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.host}:{self.port})"
+
+    def _connection(self) -> HTTPConnection:
+        if self._conn is None:
+            self._conn = HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get(self, path: str) -> tuple[int, bytes]:
+        """GET on the shared connection, reconnecting once if the server dropped it between requests"""
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("GET", path, headers={"Connection": "keep-alive"})
+                response = conn.getresponse()
+                body = response.read()
+            except (OSError, HTTPException):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                self.close()
+            return response.status, body
+        # Unreachable, the second failed attempt re-raises
+        raise ConnectionError
+
+    def about(self) -> dict | None:
+        try:
+            status, body = self.get("/api/about")
+        except (OSError, HTTPException):
+            return None
+        if status != 200:  # noqa: PLR2004
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    def open(self, *files: FileRef | Path) -> list[FileRef]:
+        """
+        Opens every file in the IDE, returns the ones it didn't open: the first it refused and everything after it.
+        The built-in server takes one file per request, batching happens by pushing them all down the same connection.
+        """
+        refs = [ref if isinstance(ref, FileRef) else FileRef(ref) for ref in files]
+        for n, ref in enumerate(refs):
+            query = {"file": str(Path(ref.path).absolute())}
+            if ref.line:
+                query["line"] = ref.line
+            if ref.column:
+                query["column"] = ref.column
+            try:
+                status, _ = self.get(f"/api/file?{urlencode(query)}")
+            except (OSError, HTTPException):
+                log.debug("%r went away while opening %s", self, ref.path, exc_info=True)
+                return refs[n:]
+            if status != 200:  # noqa: PLR2004
+                log.debug("%r answered %s for %s", self, status, ref.path)
+                return refs[n:]
+        return []
+
+
+_instances: dict[tuple[str, int], RunningInstance] = {}
+
+
+def candidate_ports() -> Iterable[int]:
+    override = os.environ.get("HATCH_PYCHARM_PORT")
+    if override:
+        return [int(override)]
+    return range(DEFAULT_PORT, DEFAULT_PORT + PORT_RANGE)
+
+
+def find_instance(host: str = HOST) -> RunningInstance | None:
+    """Returns the first PyCharm answering on the built-in server ports, reusing connections we already have"""
+    for port in candidate_ports():
+        instance = _instances.get((host, port))
+        if instance is None:
+            instance = RunningInstance(port, host)
+        about = instance.about()
+        if about and str(about.get("productName", about.get("name", ""))).startswith("PyCharm"):
+            _instances[(host, port)] = instance
+            return instance
+        instance.close()
+        _instances.pop((host, port), None)
+    return None
+
+
+@traced()
+def open_in_running_instance(*files: FileRef | Path) -> list[FileRef]:
+    """
+    Opens what a running PyCharm can open, returns what is left for the launcher: everything when nothing is running,
+    and directories always, `/api/file` opens files and not projects
+    """
+    refs = [ref if isinstance(ref, FileRef) else FileRef(ref) for ref in files]
+    projects = [ref for ref in refs if Path(ref.path).is_dir()]
+    files = [ref for ref in refs if ref not in projects]
+    if not files:
+        return projects
+    instance = find_instance()
+    if instance is None:
+        return refs
+    log.debug("Opening %d files through %r", len(files), instance)
+    return projects + instance.open(*files)
@@ -0,0 +1,165 @@
+"""
+Everything we need to know about an interpreter, from one subprocess, cached on disk.
+
+The probe prints the version, `sys.path` and `sysconfig.get_config_vars()` as a single JSON document. Results are
+cached per interpreter and keyed by the executable's path, realpath, inode, size and mtime; on top of that the mtimes of
+the `sys.path` directories are checked, since installing into a venv (a new `.pth` file, an editable install) changes
+`sys.path` without touching the executable. A warm lookup is a handful of `stat` calls. The envs of a matrix are
+probed by their own integration workers, so their cold probes already run alongside each other.
+
+`find_on_path` lists the versioned interpreters on `PATH` without running any of them, cached the same way.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+from hatch_pycharm._pycharm.cache import atomic_write, cache_file, dump_json, load_json, mtime_ns
+from hatch_pycharm._pycharm.config_vars import PythonConfigVars
+from hatch_pycharm._pycharm.tracing import traced
+
+log = logging.getLogger(__name__)
+
+PATH_INDEX = "interpreters/path.json"
+_versioned_re = re.compile(r"^python(3\.\d+)(?:\.exe)?$", re.IGNORECASE)
+
+# Runs under whatever interpreter we are asked about, so keep it to what 3.7 understands
+# Two lines, the details and then the config vars, which are cached as-is so they can be mapped back in lazily
+PROBE = """\
+import json, sys, sysconfig
+json.dump(
+    {
+        "version": list(sys.version_info[:3]),
+        "sys_path": sys.path[1:],
+        "prefix": sys.prefix,
+        "base_prefix": getattr(sys, "base_prefix", sys.prefix),
+    },
+    sys.stdout,
+)
+sys.stdout.write("\\n")
+json.dump(sysconfig.get_config_vars(), sys.stdout, default=str)
+"""
+
+
+class InterpreterInfo(NamedTuple):
+    executable: str
+    version: tuple[int, int, int]
+    sys_path: list[str]
+    prefix: str
+    base_prefix: str
+    config_vars: PythonConfigVars
+
+
+def identity(exe: Path) -> list:
+    """What has to stay the same for a cached probe to still describe `exe`"""
+    st = os.stat(exe)
+    return [os.path.abspath(exe), os.path.realpath(exe), st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def _cache_paths(exe: Path) -> tuple[Path, Path]:
+    name = hashlib.blake2b(os.path.abspath(exe).encode(), digest_size=16).hexdigest()
+    return cache_file(f"interpreters/{name}.json"), cache_file(f"interpreters/{name}.vars.json")
+
+
+def _info(exe: Path, details: dict, config_vars: PythonConfigVars) -> InterpreterInfo:
+    return InterpreterInfo(
+        executable=os.path.abspath(exe),
+        version=tuple(details["version"]),
+        sys_path=details["sys_path"],
+        prefix=details["prefix"],
+        base_prefix=details["base_prefix"],
+        config_vars=config_vars,
+    )
+
+
+@traced()
+def run_probe(exe: Path) -> tuple[InterpreterInfo, bytes]:
+    """Returns the details and the raw config vars dump"""
+    log.debug("Probing interpreter %s", exe)
+    proc = subprocess.run([str(exe), "-c", PROBE], capture_output=True, check=True)
+    details, raw_vars = proc.stdout.split(b"\n", 1)
+    return _info(exe, json.loads(details), PythonConfigVars.from_json(raw_vars)), raw_vars
+
+
+def _load(exe: Path, key: list) -> InterpreterInfo | None:
+    details_path, vars_path = _cache_paths(exe)
+    data = load_json(details_path)
+    if data is None or data["identity"] != key:
+        return None
+    if any(mtime_ns(Path(p)) != mtime for p, mtime in data["watched"].items()):
+        return None
+    try:
+        config_vars = PythonConfigVars.from_file(vars_path)
+    except OSError:
+        return None
+    return _info(exe, data["details"], config_vars)
+
+
+def _store(exe: Path, key: list, info: InterpreterInfo, raw_vars: bytes) -> None:
+    details_path, vars_path = _cache_paths(exe)
+    watched = {p: mtime_ns(Path(p)) for p in info.sys_path}
+    details = {k: v for k, v in info._asdict().items() if k not in ("executable", "config_vars")}
+    try:
+        with atomic_write(vars_path, "wb") as f:
+            f.write(raw_vars)
+    except OSError:
+        log.debug("Unable to cache config vars for %s", exe, exc_info=True)
+        return
+    # Written last, the details are what marks the pair as complete
+    dump_json(details_path, {"identity": key, "watched": watched, "details": details})
+
+
+@traced()
+def probe(exe: Path, refresh: bool = False) -> InterpreterInfo:
+    """The interpreter's details, from the cache when neither it nor its `sys.path` changed since the last probe"""
+    key = identity(exe)
+    info = None if refresh else _load(exe, key)
+    if info is None:
+        info, raw_vars = run_probe(exe)
+        _store(exe, key, info, raw_vars)
+    return info
+
+
+def _path_dirs() -> list[str]:
+    return list(dict.fromkeys(p for p in os.environ.get("PATH", "").split(os.pathsep) if p))
+
+
+@traced()
+def scan_path(dirs: Iterable[str]) -> dict[str, str]:
+    """`python3.X` launchers on `PATH` by version, the first one on `PATH` wins like it would in a shell"""
+    found: dict[str, str] = {}
+    for directory in dirs:
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            continue
+        for name in names:
+            match = _versioned_re.match(name)
+            path = os.path.join(directory, name)
+            if match and match[1] not in found and os.access(path, os.X_OK):
+                found[match[1]] = path
+    return found
+
+
+def find_on_path(refresh: bool = False) -> dict[str, Path]:
+    """
+    The versioned interpreters on `PATH`, oldest first. The scan is cached against `PATH` itself and the mtimes of
+    its directories, installing or removing an interpreter changes the mtime of the directory it lands in.
+    """
+    dirs = _path_dirs()
+    watched = {d: mtime_ns(Path(d)) for d in dirs}
+    index_path = cache_file(PATH_INDEX)
+    index = None if refresh else load_json(index_path)
+    if index is None or index["watched"] != watched or index["platform"] != sys.platform:
+        log.debug("Scanning PATH for interpreters")
+        index = {"watched": watched, "platform": sys.platform, "found": scan_path(dirs)}
+        dump_json(index_path, index)
+    found = sorted(index["found"].items(), key=lambda item: tuple(map(int, item[0].split("."))))
+    return {version: Path(path) for version, path in found}
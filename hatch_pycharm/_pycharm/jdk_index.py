@@ -0,0 +1,275 @@
+"""
+A side index over `jdk.table.xml` so finding our SDK doesn't mean scanning the table.
+
+For every `<jdk>` the index records its byte span, a hash of those bytes, and the keys we look SDKs up by: the
+associated project path and interpreter path (both normalized with `path_key`) and the `SDK_UUID`. It is kept in our
+cache directory and trusted for as long as the table's mtime and size are what they were when it was written; our own
+edits update it in place, anyone else's edit makes the next load rebuild it with one streaming scan.
+"""
+
+import hashlib
+import logging
+import re
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+from xml.etree.ElementTree import Element, fromstring
+
+from hatch_pycharm._pycharm import jdk_table
+from hatch_pycharm._pycharm.cache import cache_file, dump_json, load_json
+from hatch_pycharm._pycharm.jdk_table import Builder, Span
+from hatch_pycharm._pycharm.macros import path_key
+from hatch_pycharm._pycharm.tracing import traced
+
+log = logging.getLogger(__name__)
+
+ASSOCIATED_PROJECT_PATH = "ASSOCIATED_PROJECT_PATH"
+SDK_UUID = "SDK_UUID"
+
+
+class JdkEntry(NamedTuple):
+    start: int
+    end: int
+    digest: str
+    project: str | None
+    home: str | None
+    uuid: str | None
+
+
+def digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def element_keys(jdk: Element) -> tuple[str | None, str | None, str | None]:
+    """The (project, interpreter, uuid) keys of one `<jdk>`"""
+    additional = jdk.find("additional")
+    home_path = jdk.find("homePath")
+    attrib = additional.attrib if additional is not None else {}
+    project = attrib.get(ASSOCIATED_PROJECT_PATH)
+    home = home_path.get("value") if home_path is not None else None
+    return (
+        path_key(project) if project else None,
+        path_key(home) if home else None,
+        attrib.get(SDK_UUID),
+    )
+
+
+_home_path_tag = re.compile(rb"<homePath\s[^>]*?/>")
+_additional_tag = re.compile(rb"<additional(?:\s[^>]*?)?(/?)>")
+
+
+def _keys(element: Element | bytes) -> tuple[str | None, str | None, str | None]:
+    return payload_keys(element) if isinstance(element, bytes) else element_keys(element)
+
+
+def payload_keys(payload: bytes) -> tuple[str | None, str | None, str | None]:
+    """`element_keys` for an already serialized `<jdk>`, parsing only the two tags the keys live in"""
+    home_path = _home_path_tag.search(payload)
+    additional = _additional_tag.search(payload)
+    snippet = b"<jdk>"
+    if home_path:
+        snippet += home_path.group(0)
+    if additional:
+        snippet += additional.group(0) + (b"" if additional.group(1) else b"</additional>")
+    return element_keys(fromstring(snippet + b"</jdk>"))
+
+
+def _stat(table: Path) -> list[int] | None:
+    try:
+        st = table.stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _read_span(f: BinaryIO, span: Span) -> bytes:
+    f.seek(span.start)
+    return f.read(span.end - span.start)
+
+
+class JdkIndex:
+    def __init__(self, table: Path):
+        self.table = table
+        self.path = cache_file(f"jdk-index-{digest(str(Path(table).absolute()).encode())}.json")
+        self.stat: list[int] | None = None
+        self.component_end: int | None = None
+        self._entries: list[JdkEntry] = []
+        self._by_pair: dict[tuple[str | None, str | None], JdkEntry] = {}
+        self._by_uuid: dict[str, JdkEntry] = {}
+
+    @property
+    def entries(self) -> list[JdkEntry]:
+        return self._entries
+
+    @entries.setter
+    def entries(self, entries: list[JdkEntry]) -> None:
+        self._entries = entries
+        # setdefault keeps the first of any duplicates, which is the one PyCharm itself would pick up
+        self._by_pair = {}
+        self._by_uuid = {}
+        for entry in entries:
+            self._by_pair.setdefault((entry.project, entry.home), entry)
+            if entry.uuid:
+                self._by_uuid.setdefault(entry.uuid, entry)
+
+    @classmethod
+    def load(cls, table: Path) -> "JdkIndex":
+        """The index for `table`, rebuilt first if the table changed since it was written"""
+        index = cls(table)
+        data = load_json(index.path)
+        current = _stat(table)
+        if data is not None and data["stat"] == current and current is not None:
+            index.stat = current
+            index.component_end = data["component_end"]
+            index.entries = [JdkEntry(*row) for row in data["entries"]]
+        else:
+            index.rebuild()
+        return index
+
+    @traced()
+    def rebuild(self) -> None:
+        log.debug("Indexing %s", self.table)
+        self.entries = []
+        self.component_end = None
+        self.stat = _stat(self.table)
+        if self.stat is None:
+            self.save()
+            return
+        entries = []
+        with self.table.open("rb") as f, self.table.open("rb") as peek, self.table.open("rb") as raw:
+
+            def visit(jdk: Element, span: Span) -> bool:
+                entries.append(JdkEntry(*span, digest(_read_span(raw, span)), *element_keys(jdk)))
+                return False
+
+            self.component_end = jdk_table.scan(f, peek, visit)
+        self.entries = entries
+        self.save()
+
+    @traced()
+    def save(self) -> None:
+        dump_json(
+            self.path,
+            {"stat": self.stat, "component_end": self.component_end, "entries": [list(e) for e in self.entries]},
+        )
+
+    def lookup(self, project: Path | str = None, exe: Path | str = None, uuid: str = None) -> JdkEntry | None:
+        """The entry for a project and interpreter pair, or for an SDK_UUID"""
+        if uuid is not None:
+            return self._by_uuid.get(uuid)
+        return self._by_pair.get((path_key(project), path_key(exe)))
+
+    def read(self, entry: JdkEntry) -> Element | None:
+        """The element behind `entry`, or None if the bytes there are no longer what we indexed"""
+        try:
+            with self.table.open("rb") as f:
+                data = _read_span(f, Span(entry.start, entry.end))
+        except OSError:
+            return None
+        if digest(data) != entry.digest:
+            return None
+        return fromstring(data)
+
+    def find(self, project: Path | str, exe: Path | str) -> Element | None:
+        entry = self.lookup(project, exe)
+        if entry is None:
+            return None
+        element = self.read(entry)
+        if element is None:
+            # Changed underneath us without moving mtime or size, don't trust any of it
+            self.rebuild()
+            entry = self.lookup(project, exe)
+            element = self.read(entry) if entry else None
+        return element
+
+    def upsert(self, project: Path | str, exe: Path | str, build: Builder) -> bool:
+        """
+        `jdk_table.upsert_jdk` driven by the index, the table is never scanned while the index is fresh. Returns True
+        when an existing entry was replaced.
+        """
+        return self.upsert_many([(project, exe, build)])[0]
+
+    @traced()
+    def upsert_many(self, upserts: Iterable[tuple[Path | str, Path | str, Builder]]) -> list[bool]:
+        """
+        `upsert` for a batch of SDKs with a single rewrite of the table. A later upsert for the same project and
+        interpreter wins over an earlier one. Returns, per upsert, whether an existing entry was replaced.
+        """
+        upserts = list(upserts)
+        if not upserts:
+            return []
+        if _stat(self.table) != self.stat:
+            self.rebuild()
+        keyed = [((path_key(project), path_key(exe)), build) for project, exe, build in upserts]
+        found = [self._by_pair.get(keys) for keys, _ in keyed]
+        if any(entry is not None and self.read(entry) is None for entry in found):
+            self.rebuild()
+            found = [self._by_pair.get(keys) for keys, _ in keyed]
+        if self.stat is None or (self.component_end is None and None in found):
+            # A missing table or one without a component to append to, let the streaming editor set it up
+            (keys, build), rest = keyed[0], upserts[1:]
+            replaced = jdk_table.upsert_jdk(self.table, lambda jdk: element_keys(jdk)[:2] == keys, build)
+            self.rebuild()
+            return [replaced, *self.upsert_many(rest)]
+        latest = dict(keyed)
+        edits: list[tuple[Span, bytes]] = []
+        # By the start of the entry they replace, which is unique and cheaper to hash than the entry
+        replaced: dict[int, JdkEntry] = {}
+        appended: list[tuple[int, bytes, Element | bytes]] = []
+        insertion = b""
+        indent = jdk_table.INDENT.encode()
+        with self.table.open("rb") as f:
+            for keys, build in latest.items():
+                entry = self._by_pair.get(keys)
+                if entry is not None:
+                    element = build(fromstring(_read_span(f, Span(entry.start, entry.end))))
+                    payload = jdk_table.serialize(element)
+                    edits.append((Span(entry.start, entry.end), payload))
+                    new_entry = JdkEntry(entry.start, entry.start + len(payload), digest(payload), *_keys(element))
+                    replaced[entry.start] = new_entry
+                else:
+                    element = build(None)
+                    payload = jdk_table.serialize(element)
+                    appended.append((len(insertion) + len(indent), payload, element))
+                    insertion += indent + payload + b"\n" + indent
+            if insertion:
+                edits.append((Span(self.component_end, self.component_end), insertion))
+            jdk_table.splice_many(self.table, f, edits)
+        added = []
+        for offset, payload, element in appended:
+            start = self.component_end + offset
+            added.append(JdkEntry(start, start + len(payload), digest(payload), *_keys(element)))
+        self._apply(replaced, added, edits)
+        return [entry is not None for entry in found]
+
+    def _apply(self, replaced: dict[int, JdkEntry], added: list[JdkEntry], edits: list[tuple[Span, bytes]]):
+        """Moves every offset behind our own edits, so the index stays valid without rescanning the table"""
+        edits = sorted(edits, key=lambda edit: edit[0].start)
+        ends = [span.end for span, _ in edits]
+        # shifts[i] is how far everything behind the first i edits moved
+        shifts = [0]
+        for span, replacement in edits:
+            shifts.append(shifts[-1] + len(replacement) - (span.end - span.start))
+
+        def shifted(entry: JdkEntry, before: int) -> JdkEntry:
+            """`entry` moved by all the edits that come before it, the first `before` of them"""
+            delta = shifts[before]
+            return entry._replace(start=entry.start + delta, end=entry.end + delta) if delta else entry
+
+        # Entries are in table order, so the edits in front of each one only ever grow. A replacement starts where
+        # the old bytes did, and is behind exactly the edits that end before that.
+        entries = []
+        before = 0
+        for entry in self.entries:
+            while before < len(ends) and ends[before] <= entry.start:
+                before += 1
+            entries.append(shifted(replaced.get(entry.start, entry), before))
+        # Appended entries are already counted from the old `</component>`, only the edits in front of it move them
+        before_end = bisect_left(ends, self.component_end) if added else 0
+        entries.extend(shifted(entry, before_end) for entry in added)
+        self.entries = entries
+        if self.component_end is not None:
+            self.component_end += shifts[bisect_right(ends, self.component_end)]
+        self.stat = _stat(self.table)
+        self.save()
@@ -0,0 +1,241 @@
+"""
+Element level edits of `jdk.table.xml` without loading or reserializing the whole table.
+
+The table holds one `<jdk>` per SDK and every SDK carries a couple of hundred `<root>` entries, so a real table runs to
+megabytes. Editing it is done in two streaming passes:
+
+1. expat reads the file in chunks, builds one `<jdk>` element at a time to offer it to the caller's `match`, and
+   records the byte span of the element that matched (or of the `</component>` to insert before).
+2. the original bytes are copied into a temp file around that span, the replacement is written into the gap, and the
+   temp file is renamed over the table.
+
+Untouched SDKs are copied byte-for-byte, and peak memory is one SDK element plus the copy buffer.
+"""
+
+import shutil
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+from xml.etree.ElementTree import Element, SubElement, TreeBuilder, fromstring, indent, parse, tostring
+from xml.parsers import expat
+
+from hatch_pycharm._pycharm.cache import atomic_write
+from hatch_pycharm._pycharm.tracing import traced
+
+COMPONENT = "ProjectJdkTable"
+CHUNK = 64 * 1024
+# application > component > jdk
+JDK_DEPTH = 3
+INDENT = "  "
+
+
+class Span(NamedTuple):
+    start: int
+    end: int
+
+
+Matcher = Callable[[Element], bool]
+# Builders may hand back an already serialized `<jdk>`, see `serialize`
+Builder = Callable[[Element | None], Element | bytes]
+# Called with every `<jdk>` and its byte span, returning True stops building elements for the rest of the scan
+Visitor = Callable[[Element, Span], bool]
+
+
+class _Scan:
+    """One pass over the table, handing each `<jdk>` to `visit` and remembering where the component's end tag is"""
+
+    def __init__(self, f: BinaryIO, peek: BinaryIO, visit: Visitor):
+        self.f = f
+        self.peek = peek
+        self.visit = visit
+        self.done = False
+        self.depth = 0
+        self.in_component = False
+        self.builder: TreeBuilder | None = None
+        self.jdk_start = 0
+        self.component_end: int | None = None
+        self.parser = expat.ParserCreate()
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self.start
+        self.parser.EndElementHandler = self.end
+        self.parser.CharacterDataHandler = self.data
+
+    def run(self) -> "_Scan":
+        while chunk := self.f.read(CHUNK):
+            self.parser.Parse(chunk, False)
+        self.parser.Parse(b"", True)
+        return self
+
+    def start(self, tag: str, attrib: dict[str, str]) -> None:
+        self.depth += 1
+        if self.depth == JDK_DEPTH - 1 and tag == "component" and attrib.get("name") == COMPONENT:
+            self.in_component = True
+        elif self.depth == JDK_DEPTH and self.in_component and tag == "jdk" and not self.done:
+            self.builder = TreeBuilder()
+            self.jdk_start = self.parser.CurrentByteIndex
+        if self.builder is not None:
+            self.builder.start(tag, attrib)
+
+    def data(self, text: str) -> None:
+        if self.builder is not None:
+            self.builder.data(text)
+
+    def end(self, tag: str) -> None:
+        if self.builder is not None:
+            self.builder.end(tag)
+            if self.depth == JDK_DEPTH:
+                element = self.builder.close()
+                self.builder = None
+                self.done = self.visit(element, Span(self.jdk_start, self._tag_end(self.parser.CurrentByteIndex)))
+        elif self.depth == JDK_DEPTH - 1 and self.in_component:
+            self.in_component = False
+            self.component_end = self.parser.CurrentByteIndex
+        self.depth -= 1
+
+    def _tag_end(self, offset: int) -> int:
+        """expat points at the `<` of the end tag (or of a self-closing tag), the element ends after the next `>`"""
+        self.peek.seek(offset)
+        while chunk := self.peek.read(256):
+            found = chunk.find(b">")
+            if found != -1:
+                return offset + found + 1
+            offset += len(chunk)
+        msg = "Unterminated <jdk> element"
+        raise ValueError(msg)
+
+
+@traced()
+def scan(f: BinaryIO, peek: BinaryIO, visit: Visitor) -> int | None:
+    """
+    Streams the table in `f` (with `peek` a second handle on the same file), returns the offset of the component's
+    end tag, or None if there is no `</component>` to insert before.
+    """
+    f.seek(0)
+    component_end = _Scan(f, peek, visit).run().component_end
+    if component_end is None:
+        return None
+    peek.seek(component_end)
+    return component_end if peek.read(2) == b"</" else None
+
+
+class _First:
+    """A visitor that keeps the first `<jdk>` accepted by `match`"""
+
+    def __init__(self, match: Matcher):
+        self.match = match
+        self.element: Element | None = None
+        self.span: Span | None = None
+
+    def __call__(self, element: Element, span: Span) -> bool:
+        if self.match(element):
+            self.element, self.span = element, span
+            return True
+        return False
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, start: int, end: int | None = None) -> None:
+    src.seek(start)
+    if end is None:
+        shutil.copyfileobj(src, dst, CHUNK)
+        return
+    remaining = end - start
+    while remaining:
+        chunk = src.read(min(CHUNK, remaining))
+        if not chunk:
+            break
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+
+def splice(table: Path, f: BinaryIO, span: Span, replacement: bytes) -> None:
+    """Atomically rewrites `table` (open as `f`) with the bytes in `span` swapped for `replacement`"""
+    splice_many(table, f, [(span, replacement)])
+
+
+@traced()
+def splice_many(table: Path, f: BinaryIO, edits: Iterable[tuple[Span, bytes]]) -> None:
+    """`splice` for any number of spans that don't overlap, still a single rewrite of the table"""
+    with atomic_write(table, "wb") as out:
+        position = 0
+        for span, replacement in sorted(edits, key=lambda edit: edit[0].start):
+            _copy_range(f, out, position, span.start)
+            out.write(replacement)
+            position = span.end
+        _copy_range(f, out, position)
+
+
+def insertion(element: Element | bytes) -> bytes:
+    """The bytes to put in front of `</component>` to append `element`"""
+    return INDENT.encode() + serialize(element) + b"\n" + INDENT.encode()
+
+
+def serialize(element: Element | bytes) -> bytes:
+    """
+    A `<jdk>` indented the way PyCharm writes it at its depth in the table, without leading whitespace. Bytes are
+    taken to be serialized already and passed through.
+    """
+    if isinstance(element, bytes):
+        return element
+    indent(element, space=INDENT, level=JDK_DEPTH - 1)
+    element.tail = None
+    return tostring(element, encoding="utf-8")
+
+
+def _new_table(element: Element | bytes) -> bytes:
+    return (
+        f'<application>\n{INDENT}<component name="{COMPONENT}">\n{INDENT * 2}'.encode()
+        + serialize(element)
+        + f"\n{INDENT}</component>\n</application>".encode()
+    )
+
+
+def find_jdk(table: Path, match: Matcher) -> Element | None:
+    """Returns the first `<jdk>` accepted by `match`, streaming the table"""
+    try:
+        with table.open("rb") as f, table.open("rb") as peek:
+            first = _First(match)
+            scan(f, peek, first)
+            return first.element
+    except FileNotFoundError:
+        return None
+
+
+@traced()
+def upsert_jdk(table: Path, match: Matcher, build: Builder) -> bool:
+    """
+    Replaces the first `<jdk>` accepted by `match` with `build(old_element)`, or appends `build(None)` to the table.
+    Returns True if an element was replaced. The write is atomic, readers see the old or the new table.
+    """
+    try:
+        f = table.open("rb")
+    except FileNotFoundError:
+        with atomic_write(table, "wb") as out:
+            out.write(_new_table(build(None)))
+        return False
+    with f, table.open("rb") as peek:
+        first = _First(match)
+        component_end = scan(f, peek, first)
+        if first.span is not None:
+            splice(table, f, first.span, serialize(build(first.element)))
+            return True
+        if component_end is None:
+            # No component yet, or an empty self-closing one. Rare enough that rebuilding the table is fine.
+            return _rebuild(table, f, build)
+        # Insert just before the component's end tag, which sits behind "\n  " in a PyCharm written table
+        splice(table, f, Span(component_end, component_end), insertion(build(None)))
+    return False
+
+
+def _rebuild(table: Path, f: BinaryIO, build: Builder) -> bool:
+    f.seek(0)
+    tree = parse(f)
+    root = tree.getroot()
+    component = root.find(f"component[@name='{COMPONENT}']")
+    if component is None:
+        component = SubElement(root, "component", name=COMPONENT)
+    element = build(None)
+    component.append(fromstring(element) if isinstance(element, bytes) else element)
+    indent(root, space=INDENT)
+    with atomic_write(table, "wb") as out:
+        out.write(tostring(root, encoding="utf-8"))
+    return False
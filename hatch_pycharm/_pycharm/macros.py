@@ -0,0 +1,114 @@
+"""
+The path macros PyCharm writes into its XML instead of absolute paths.
+
+A table holds a few hundred roots per SDK, so expanding and collapsing is string work only: one precompiled pattern
+per direction, and every answer is remembered by the `Macros` for the current macro values, which the reader
+(`path_key`) and the writer (`collapse_macros`) share. Nothing here touches the filesystem.
+"""
+
+import os
+import re
+from functools import lru_cache
+from pathlib import Path, PurePath
+
+from hatch_pycharm._pycharm import settings
+
+USER_HOME = "$USER_HOME$"
+APPLICATION_HOME_DIR = "$APPLICATION_HOME_DIR$"
+PROJECT_DIR = "$PROJECT_DIR$"
+# The directory of a module's .iml, a module kept in .idea has the project directory for it
+MODULE_DIR = "$MODULE_DIR$"
+
+# Paths on Windows compare without regard to case, like PureWindowsPath.relative_to did
+_FLAGS = re.IGNORECASE if os.name == "nt" else 0
+
+
+class Macros:
+    """Expands and collapses paths for one set of macro values, remembering every answer"""
+
+    def __init__(self, values: dict[str, Path | str]):
+        self.values = {macro: PurePath(base).as_posix().rstrip("/") for macro, base in values.items()}
+        # Longest base first, so a project under the home directory collapses to $PROJECT_DIR$
+        by_length = sorted(self.values.items(), key=lambda item: len(item[1]), reverse=True)
+        self._macro_of = {base.casefold() if _FLAGS else base: macro for macro, base in by_length}
+        self._collapser = re.compile("^(?:{})(?=/|$)".format("|".join(re.escape(b) for _, b in by_length)), _FLAGS)
+        self._expander = re.compile("|".join(map(re.escape, self.values)))
+        self._expanded: dict[str, str] = {}
+        self._collapsed: dict[str, str] = {}
+        self._keys: dict[str, str] = {}
+
+    def expand(self, jb_path: str) -> str:
+        try:
+            return self._expanded[jb_path]
+        except KeyError:
+            pass
+        expanded = self._expanded[jb_path] = self._expander.sub(lambda m: self.values[m.group()], jb_path)
+        return expanded
+
+    def collapse(self, path: Path | str) -> str:
+        text = str(path)
+        try:
+            return self._collapsed[text]
+        except KeyError:
+            pass
+        posix = PurePath(text).as_posix()
+        match = self._collapser.match(posix)
+        if match:
+            base = match.group()
+            collapsed = self._macro_of[base.casefold() if _FLAGS else base] + posix[len(base) :]
+        else:
+            collapsed = posix
+        self._collapsed[text] = collapsed
+        return collapsed
+
+    def key(self, path: Path | str) -> str:
+        text = str(path)
+        try:
+            return self._keys[text]
+        except KeyError:
+            pass
+        expanded = self.expand(text)
+        key = os.path.normcase(os.path.abspath(expanded))
+        # A relative path depends on the working directory, which can change between calls
+        if os.path.isabs(expanded):
+            self._keys[text] = key
+        return key
+
+
+@lru_cache(maxsize=16)
+def _macros(user_home: str, application_home: str | None, project_dir: str | None) -> Macros:
+    values = {USER_HOME: user_home}
+    if application_home is not None:
+        values[APPLICATION_HOME_DIR] = application_home
+    if project_dir is not None:
+        values[PROJECT_DIR] = project_dir
+    return Macros(values)
+
+
+def macros(project_dir: Path | str = None) -> Macros:
+    """
+    The engine for the current home directory and PyCharm install, plus `$PROJECT_DIR$` for project files. Without a
+    PyCharm install `$APPLICATION_HOME_DIR$` is left as it is.
+    """
+    try:
+        application_home = str(settings.pycharm_home)
+    except FileNotFoundError:
+        application_home = None
+    return _macros(str(Path.home()), application_home, None if project_dir is None else str(project_dir))
+
+
+def collapse_macros(path: Path | str, project_dir: Path | str = None) -> str:
+    """Writes `path` the way PyCharm stores it, relative to the longest of the macro directories it is in"""
+    return macros(project_dir).collapse(path)
+
+
+def expand_macros(jb_path: str, project_dir: Path | str = None) -> Path:
+    return Path(macros(project_dir).expand(jb_path))
+
+
+def path_key(path: Path | str) -> str:
+    """
+    A comparable form of a path from the XML or from hatch. abspath rather than resolve, a venv's python is a symlink
+    to the base interpreter and must not compare equal to it.
+    """
+    return macros().key(path)
@@ -0,0 +1,205 @@
+"""
+Resolves every conflicted file of a git worktree in one PyCharm, one merge window after the other.
+
+Used as `git mergetool`, `make_merge_file_command` runs once per file and each of those runs pays for starting an IDE.
+Here the conflicted paths and their index stages come from one `git ls-files -u`, the base/ours/theirs blobs of all of
+them from one `git cat-file --batch`, and are written out as temp files in that single pass. PyCharm is started once
+(unless it is already running) and the merges go to it one after the other. The IDE has no way to take a merge other
+than its launcher, so each file still runs `pycharm merge`, but that launcher only hands the merge to the running
+instance and waits for its window to close instead of starting an IDE of its own. After each merge the file is staged
+when it was resolved, so git knows what is left even if the session is cut short.
+
+git runs a `mergetool.<tool>.cmd` once per file, which is the very cost this avoids, so this is run instead of `git
+mergetool`, as the `hatch-pycharm-mergetool` script or through an alias:
+
+    git config --global alias.pycharm-merge '!hatch-pycharm-mergetool'
+
+It exits with 1 while anything is left unmerged.
+ref: https://www.jetbrains.com/help/pycharm/command-line-merge-tool.html
+ref: https://git-scm.com/docs/git-ls-files#_output
+"""
+
+import argparse
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterable
+from pathlib import Path, PurePosixPath
+from typing import Literal, NamedTuple
+
+from hatch_pycharm._pycharm import make_merge_file_command, make_open_file_command, settings
+from hatch_pycharm._pycharm.background import launch_detached
+from hatch_pycharm._pycharm.instance import find_instance
+from hatch_pycharm._pycharm.runner import run_command
+from hatch_pycharm._pycharm.tracing import traced
+
+log = logging.getLogger(__name__)
+
+BASE, OURS, THEIRS = 1, 2, 3
+ROLES = {BASE: "BASE", OURS: "LOCAL", THEIRS: "REMOTE"}
+# Symlinks and submodules, nothing a text merge can resolve
+UNMERGEABLE_MODES = ("120000", "160000")
+# How long a freshly started IDE gets before its built-in server has to answer
+STARTUP_TIMEOUT = 120.0
+POLL_INTERVAL = 0.5
+_marker_re = re.compile(rb"^(?:<{7}|>{7})(?: |$)", re.MULTILINE)
+
+Status = Literal["resolved", "unresolved", "skipped"]
+
+
+class Stage(NamedTuple):
+    mode: str
+    sha: str
+
+
+class Conflict(NamedTuple):
+    # Worktree-relative posix path
+    path: str
+    stages: dict[int, Stage]
+
+    @property
+    def mergeable(self) -> bool:
+        # Deleted on one side or not a regular file, that takes a decision rather than a merge
+        return (
+            OURS in self.stages
+            and THEIRS in self.stages
+            and not any(stage.mode in UNMERGEABLE_MODES for stage in self.stages.values())
+        )
+
+
+class MergeResult(NamedTuple):
+    path: str
+    status: Status
+
+
+def _git(repo: Path, *args: str, stdin: bytes = None) -> bytes:
+    return subprocess.run(["git", "-C", str(repo), *args], input=stdin, stdout=subprocess.PIPE, check=True).stdout
+
+
+def conflicts(repo: Path) -> list[Conflict]:
+    """Every unmerged path of the index with the stages it has, lines look like `<mode> <sha> <stage>\\t<path>`"""
+    found: dict[str, dict[int, Stage]] = {}
+    for record in _git(repo, "ls-files", "-u", "-z").split(b"\0"):
+        if not record:
+            continue
+        info, _, path = record.partition(b"\t")
+        mode, sha, stage = info.decode().split()
+        found.setdefault(os.fsdecode(path), {})[int(stage)] = Stage(mode, sha)
+    return [Conflict(path, stages) for path, stages in sorted(found.items())]
+
+
+def read_blobs(repo: Path, shas: Iterable[str]) -> dict[str, bytes]:
+    """The content of every blob in `shas`, through a single `git cat-file --batch`"""
+    shas = list(dict.fromkeys(shas))
+    if not shas:
+        return {}
+    output = _git(repo, "cat-file", "--batch", stdin="".join(f"{sha}\n" for sha in shas).encode())
+    blobs = {}
+    offset = 0
+    for sha in shas:
+        end = output.index(b"\n", offset)
+        header = output[offset:end].split()
+        if header[-1] == b"missing":
+            msg = f"The object {sha} is missing from {repo}"
+            raise ValueError(msg)
+        size = int(header[2])
+        blobs[sha] = output[end + 1 : end + 1 + size]
+        # Every object is followed by a newline of its own
+        offset = end + 1 + size + 1
+    return blobs
+
+
+def materialize(repo: Path, found: list[Conflict], directory: Path) -> dict[str, dict[int, Path]]:
+    """
+    Writes every stage of every mergeable conflict under `directory`, named like `git mergetool` names them so the
+    IDE highlights them by their extension. A conflict without a base (added on both sides) gets an empty one.
+    """
+    blobs = read_blobs(repo, (stage.sha for conflict in found for stage in conflict.stages.values()))
+    files = {}
+    for n, conflict in enumerate(found):
+        name = PurePosixPath(conflict.path)
+        target = directory / str(n)
+        target.mkdir(parents=True)
+        files[conflict.path] = {}
+        for number, role in ROLES.items():
+            path = target / f"{name.stem}_{role}{name.suffix}"
+            stage = conflict.stages.get(number)
+            path.write_bytes(blobs[stage.sha] if stage else b"")
+            files[conflict.path][number] = path
+    return files
+
+
+def has_conflict_markers(path: Path) -> bool:
+    try:
+        return _marker_re.search(path.read_bytes()) is not None
+    except OSError:
+        return True
+
+
+def ensure_running(pycharm: Path, repo: Path, timeout: float = STARTUP_TIMEOUT) -> bool:
+    """Starts the IDE on `repo` unless one is running and waits for it to answer, returns whether it started it"""
+    if find_instance() is not None:
+        return False
+    launch_detached(make_open_file_command(pycharm, repo))
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if find_instance() is not None:
+            return True
+        time.sleep(POLL_INTERVAL)
+    log.warning("PyCharm didn't answer within %ss, the merges may each start their own", timeout)
+    return True
+
+
+@traced()
+def merge(pycharm: Path, repo: Path, conflict: Conflict, stages: dict[int, Path]) -> Status:
+    """One merge window, blocking until it is closed, and the file staged when nothing is left to resolve"""
+    output = repo / conflict.path
+    cmd = make_merge_file_command(pycharm, stages[OURS], stages[THEIRS], output, stages[BASE])
+    if run_command(cmd).returncode or has_conflict_markers(output):
+        return "unresolved"
+    _git(repo, "add", "--", conflict.path)
+    return "resolved"
+
+
+@traced()
+def resolve_conflicts(repo: Path, pycharm: Path = None) -> list[MergeResult]:
+    """Merges every conflicted file in `repo` in one IDE, in path order, returns how each of them went"""
+    found = conflicts(repo)
+    if not found:
+        return []
+    pycharm = pycharm or settings.pycharm_exe
+    mergeable = [conflict for conflict in found if conflict.mergeable]
+    results = {conflict.path: MergeResult(conflict.path, "skipped") for conflict in found if not conflict.mergeable}
+    with tempfile.TemporaryDirectory(prefix="hatch-pycharm-merge-") as tmp:
+        files = materialize(repo, mergeable, Path(tmp))
+        if mergeable:
+            ensure_running(pycharm, repo)
+        for conflict in mergeable:
+            status = merge(pycharm, repo, conflict, files[conflict.path])
+            log.info("%s: %s", conflict.path, status)
+            results[conflict.path] = MergeResult(conflict.path, status)
+    return [results[conflict.path] for conflict in found]
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Resolve every conflicted file of a git worktree in one PyCharm")
+    parser.add_argument(
+        "repo", nargs="?", type=Path, default=Path(), help="anywhere in the worktree, the default is here"
+    )
+    parser.add_argument("--pycharm", type=Path, help="the launcher to use instead of the discovered one")
+    args = parser.parse_args(argv)
+
+    # ls-files only lists what is below the directory it runs in
+    repo = Path(_git(args.repo, "rev-parse", "--show-toplevel").decode().strip())
+    results = resolve_conflicts(repo, args.pycharm)
+    for result in results:
+        print(f"{result.status:<10} {result.path}")
+    return 1 if any(result.status != "resolved" for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Where PyCharm lives on each platform, and where we keep our own state"""
+
+import os
+import sys
+from pathlib import Path
+
+
+def platform_exe_name() -> str:
+    """The name of the launcher PyCharm ships for this platform"""
+    if sys.platform == "win32":
+        return "pycharm64.exe"
+    if sys.platform == "darwin":
+        return "pycharm"
+    return "pycharm.sh"
+
+
+def install_layout(home: Path) -> tuple[Path, Path]:
+    """
+    Returns the launcher and the `build.txt` for a candidate install directory.
+    macOS bundles keep everything under `Contents`, everyone else is flat.
+    """
+    if home.suffix == ".app":
+        contents = home / "Contents"
+        return contents / "MacOS" / platform_exe_name(), contents / "Resources" / "build.txt"
+    return home / "bin" / platform_exe_name(), home / "build.txt"
+
+
+def _toolbox_patterns(apps: Path) -> list[tuple[Path, tuple[str, ...]]]:
+    # Older Toolbox releases nest channels and builds, newer ones keep one directory per product
+    return [
+        (apps, ("PyCharm-[PC]", "ch-*", "*")),
+        (apps, ("pycharm-*",)),
+    ]
+
+
+def install_search_patterns() -> list[tuple[Path, tuple[str, ...]]]:
+    """
+    Returns `(parent, globs)` pairs, each glob matches one directory level below the parent and the final level is a
+    candidate install home.
+    """
+    home = Path.home()
+    if sys.platform == "win32":
+        local = Path(os.environ.get("LOCALAPPDATA", home / "AppData" / "Local"))
+        program_files = Path(os.environ.get("PROGRAMFILES", "C:/Program Files"))
+        return [
+            *_toolbox_patterns(local / "JetBrains" / "Toolbox" / "apps"),
+            (local / "Programs", ("PyCharm*",)),
+            (program_files / "JetBrains", ("PyCharm*",)),
+        ]
+    if sys.platform == "darwin":
+        toolbox = home / "Library" / "Application Support" / "JetBrains" / "Toolbox" / "apps"
+        return [
+            (toolbox, ("PyCharm-[PC]", "ch-*", "*", "PyCharm*.app")),
+            (home / "Applications", ("PyCharm*.app",)),
+            (Path("/Applications"), ("PyCharm*.app",)),
+        ]
+    return [
+        *_toolbox_patterns(home / ".local" / "share" / "JetBrains" / "Toolbox" / "apps"),
+        (home / ".local" / "share" / "JetBrains", ("pycharm-*",)),
+        (Path("/opt"), ("pycharm*",)),
+        (Path("/snap"), ("pycharm-*", "current")),
+    ]
+
+
+def config_search_root() -> Path:
+    """
+    The directory holding one `PyCharm20xx.y` settings directory per major version
+    ref: https://www.jetbrains.com/help/pycharm/directories-used-by-the-ide-to-store-settings-caches-plugins-and-logs.html
+    """
+    home = Path.home()
+    if sys.platform == "win32":
+        return Path(os.environ.get("APPDATA", home / "AppData" / "Roaming")) / "JetBrains"
+    if sys.platform == "darwin":
+        return home / "Library" / "Application Support" / "JetBrains"
+    return Path(os.environ.get("XDG_CONFIG_HOME", home / ".config")) / "JetBrains"
+
+
+def system_search_root() -> Path:
+    """The directory holding one `PyCharm20xx.y` caches directory per major version, `python_stubs` lives in there"""
+    home = Path.home()
+    if sys.platform == "win32":
+        return Path(os.environ.get("LOCALAPPDATA", home / "AppData" / "Local")) / "JetBrains"
+    if sys.platform == "darwin":
+        return home / "Library" / "Caches" / "JetBrains"
+    return Path(os.environ.get("XDG_CACHE_HOME", home / ".cache")) / "JetBrains"
+
+
+def plugin_install_dir(config_dir: Path) -> Path:
+    """Where the IDE installs plugins for the settings in `config_dir`, Linux keeps them with the other user data"""
+    if sys.platform in ("win32", "darwin"):
+        return config_dir / "plugins"
+    return Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local" / "share")) / "JetBrains" / config_dir.name
+
+
+def cache_dir() -> Path:
+    """Where hatch-pycharm keeps its own caches, `HATCH_PYCHARM_CACHE_DIR` wins if it is set"""
+    override = os.environ.get("HATCH_PYCHARM_CACHE_DIR")
+    if override:
+        return Path(override)
+    home = Path.home()
+    if sys.platform == "win32":
+        return Path(os.environ.get("LOCALAPPDATA", home / "AppData" / "Local")) / "hatch-pycharm" / "Cache"
+    if sys.platform == "darwin":
+        return home / "Library" / "Caches" / "hatch-pycharm"
+    return Path(os.environ.get("XDG_CACHE_HOME", home / ".cache")) / "hatch-pycharm"
@@ -0,0 +1,293 @@
+"""
+Installs the IDE plugins an environment declares, and only the ones that are missing.
+
+`installPlugins` starts a whole IDE and downloads everything it is given, every time. So before launching anything the
+plugins directory is indexed (the index is cached against the mtimes of the directory and its entries) and only what
+isn't installed at the declared version goes into a single `installPlugins` call.
+
+Plugin archives added to the local store are kept by the SHA-256 of their content. Declared plugins that the store has
+are installed from a generated `updatePlugins.xml` custom repository pointing at those files, which makes the install
+reproducible and lets it run against a local stand-in for the marketplace. A pinned plugin the store doesn't have is
+offered through the same repository at the marketplace's download URL for that version, a bare id would install the
+latest one. A plugin that still isn't installed as declared after the run is reported once and then left alone for
+the build of the launcher that ran it, rather than starting an IDE on every run for an install that can't happen,
+until an archive for it is added to the store.
+ref: https://www.jetbrains.com/help/pycharm/install-plugins-from-the-command-line.html
+ref: https://plugins.jetbrains.com/docs/intellij/custom-plugin-repository.html
+"""
+
+import hashlib
+import io
+import logging
+import shutil
+import zipfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urlencode
+from xml.etree.ElementTree import Element, ParseError, SubElement, fromstring, tostring
+
+from hatch_pycharm._pycharm import make_install_plugins_command, settings
+from hatch_pycharm._pycharm.cache import atomic_write, cache_file, dump_json, load_json, mtime_ns
+from hatch_pycharm._pycharm.discovery import launcher_build
+from hatch_pycharm._pycharm.runner import run_command
+from hatch_pycharm._pycharm.tracing import traced
+from hatch_pycharm._pycharm.types import BuildNumber
+
+log = logging.getLogger(__name__)
+
+DESCRIPTOR = "META-INF/plugin.xml"
+MARKETPLACE_DOWNLOAD = "https://plugins.jetbrains.com/plugin/download"
+UNMET = "plugins/unmet.json"
+
+
+class PluginSpec(NamedTuple):
+    id: str
+    version: str | None = None
+
+    @classmethod
+    def parse(cls, text: str) -> "PluginSpec":
+        """`id` or `id@version`"""
+        plugin_id, _, version = text.strip().partition("@")
+        if not plugin_id:
+            msg = f"Invalid plugin specification {text!r}, expected `id` or `id@version`"
+            raise ValueError(msg)
+        return cls(plugin_id, version or None)
+
+    def __str__(self):
+        return f"{self.id}@{self.version}" if self.version else self.id
+
+
+class PluginDescriptor(NamedTuple):
+    id: str
+    version: str | None
+    path: str
+
+
+def parse_descriptor(data: bytes, path: str) -> PluginDescriptor | None:
+    try:
+        root = fromstring(data)
+    except ParseError:
+        return None
+    # Plugins without an <id> are known by their <name>
+    plugin_id = root.findtext("id") or root.findtext("name")
+    if not plugin_id:
+        return None
+    return PluginDescriptor(plugin_id.strip(), (root.findtext("version") or "").strip() or None, path)
+
+
+def _jar_descriptor(jar: zipfile.ZipFile, path: str) -> PluginDescriptor | None:
+    try:
+        return parse_descriptor(jar.read(DESCRIPTOR), path)
+    except KeyError:
+        return None
+
+
+def read_descriptor(path: Path) -> PluginDescriptor | None:
+    """The descriptor of an installed plugin, a directory with `lib/*.jar` or a bare jar"""
+    jars = sorted((path / "lib").glob("*.jar")) if path.is_dir() else [path]
+    for jar_path in jars:
+        try:
+            with zipfile.ZipFile(jar_path) as jar:
+                found = _jar_descriptor(jar, str(path))
+        except (OSError, zipfile.BadZipFile):
+            continue
+        if found:
+            return found
+    return None
+
+
+def read_archive_descriptor(archive: Path) -> PluginDescriptor | None:
+    """The descriptor inside a plugin distribution, a jar or a zip holding `<name>/lib/*.jar`"""
+    with zipfile.ZipFile(archive) as outer:
+        found = _jar_descriptor(outer, str(archive))
+        if found:
+            return found
+        for name in sorted(n for n in outer.namelist() if n.endswith(".jar") and "/lib/" in f"/{n}"):
+            with zipfile.ZipFile(io.BytesIO(outer.read(name))) as jar:
+                found = _jar_descriptor(jar, str(archive))
+            if found:
+                return found
+    return None
+
+
+def _index_path(plugins_dir: Path) -> Path:
+    name = hashlib.blake2b(str(plugins_dir.absolute()).encode(), digest_size=16).hexdigest()
+    return cache_file(f"plugins/installed-{name}.json")
+
+
+@traced()
+def installed_plugins(plugins_dir: Path = None, refresh: bool = False) -> dict[str, PluginDescriptor]:
+    """Installed plugins by id, read from the cached index while nothing in the plugins directory changed"""
+    plugins_dir = plugins_dir or settings.plugins_dir
+    try:
+        entries = sorted(plugins_dir.iterdir())
+    except OSError:
+        return {}
+    watched = {str(plugins_dir): mtime_ns(plugins_dir), **{str(p): mtime_ns(p) for p in entries}}
+    index_path = _index_path(plugins_dir)
+    index = None if refresh else load_json(index_path)
+    if index is not None and index["watched"] == watched:
+        return {row[0]: PluginDescriptor(*row) for row in index["plugins"]}
+    log.debug("Indexing plugins in %s", plugins_dir)
+    found: dict[str, PluginDescriptor] = {}
+    for entry in entries:
+        descriptor = read_descriptor(entry)
+        if descriptor:
+            found.setdefault(descriptor.id, descriptor)
+    dump_json(index_path, {"watched": watched, "plugins": [list(d) for d in found.values()]})
+    return found
+
+
+def missing_plugins(declared: Iterable[PluginSpec], installed: dict[str, PluginDescriptor]) -> list[PluginSpec]:
+    """What isn't installed, or is installed at another version than the one pinned"""
+    wanted = []
+    for spec in dict.fromkeys(declared):
+        have = installed.get(spec.id)
+        if have is None or (spec.version and have.version != spec.version):
+            wanted.append(spec)
+    return wanted
+
+
+def sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArchiveStore:
+    """Plugin archives by content hash, with an index from `id@version` to the hash"""
+
+    def __init__(self, root: Path = None):
+        self.root = root or cache_file("plugins/archives")
+        self.index_path = self.root / "index.json"
+
+    def _index(self) -> dict[str, dict]:
+        data = load_json(self.index_path)
+        return data["archives"] if data else {}
+
+    def add(self, archive: Path) -> PluginDescriptor:
+        """Copies `archive` into the store, returns the descriptor with the stored path"""
+        descriptor = read_archive_descriptor(archive)
+        if descriptor is None:
+            msg = f"No {DESCRIPTOR} found in {archive}"
+            raise ValueError(msg)
+        sha = sha256(archive)
+        stored = self.root / sha[:2] / f"{sha}{archive.suffix}"
+        if not stored.exists():
+            with atomic_write(stored, "wb") as out, archive.open("rb") as src:
+                shutil.copyfileobj(src, out)
+        index = self._index()
+        index[str(PluginSpec(descriptor.id, descriptor.version))] = {"sha256": sha, "file": str(stored)}
+        dump_json(self.index_path, {"archives": index})
+        return descriptor._replace(path=str(stored))
+
+    def find(self, spec: PluginSpec) -> PluginDescriptor | None:
+        """The stored archive for `spec`, the one stored last when `spec` doesn't pin a version"""
+        index = self._index()
+        if spec.version:
+            keys = [str(spec)] if str(spec) in index else []
+        else:
+            keys = [key for key in index if PluginSpec.parse(key).id == spec.id]
+        for key in reversed(keys):
+            row = index[key]
+            stored = Path(row["file"])
+            # Reading it again is nothing next to starting an IDE, and a changed archive is never installed
+            if stored.is_file() and sha256(stored) == row["sha256"]:
+                return PluginDescriptor(spec.id, PluginSpec.parse(key).version, str(stored))
+        return None
+
+
+def write_repository(plugins: Iterable[PluginDescriptor], path: Path) -> Path:
+    """An `updatePlugins.xml` offering `plugins` from their local files"""
+    root = Element("plugins")
+    for plugin in plugins:
+        url = plugin.path if "://" in plugin.path else Path(plugin.path).absolute().as_uri()
+        SubElement(root, "plugin", {"id": plugin.id, "url": url, "version": plugin.version or ""})
+    with atomic_write(path, "wb") as f:
+        f.write(tostring(root, xml_declaration=True, encoding="UTF-8"))
+    return path
+
+
+def marketplace_download(spec: PluginSpec) -> PluginDescriptor:
+    """Where the marketplace serves `spec` at exactly its pinned version"""
+    query = urlencode({"pluginId": spec.id, "version": spec.version})
+    return PluginDescriptor(spec.id, spec.version, f"{MARKETPLACE_DOWNLOAD}?{query}")
+
+
+def install_plan(specs: Iterable[PluginSpec], store: ArchiveStore) -> tuple[list[str], list[PluginDescriptor]]:
+    """
+    The `installPlugins` arguments for `specs`, and the repository entries they need. Pinned plugins always get one,
+    from the store or else the marketplace's versioned download, the others only when the store has them.
+    """
+    args, entries = [], []
+    for spec in specs:
+        stored = store.find(spec)
+        if stored is not None:
+            entries.append(stored)
+        elif spec.version:
+            entries.append(marketplace_download(spec))
+        args.append(spec.id)
+    return args, entries
+
+
+def unmet_pins(build: BuildNumber | None) -> dict[str, str]:
+    """Specs an install already failed to meet on `build`, with the source they were offered from"""
+    data = load_json(cache_file(UNMET))
+    return data["specs"] if data and data["build"] == str(build) else {}
+
+
+def _record_unmet(build: BuildNumber | None, failed: dict[str, str]) -> None:
+    dump_json(cache_file(UNMET), {"build": str(build), "specs": {**unmet_pins(build), **failed}})
+
+
+@traced()
+def ensure_plugins(
+    declared: Iterable[str | PluginSpec],
+    pycharm: Path = None,
+    plugins_dir: Path = None,
+    store: ArchiveStore = None,
+) -> list[PluginSpec]:
+    """
+    Installs whichever of `declared` are missing with one `installPlugins` run, returns what is now installed as
+    declared. Specs the run couldn't meet are left out, warned about and not attempted again on the build of
+    `pycharm`, unless they can be offered from somewhere else, like a newly stored archive.
+    """
+    specs = [s if isinstance(s, PluginSpec) else PluginSpec.parse(s) for s in declared]
+    if not specs:
+        return []
+    plugins_dir = plugins_dir or settings.plugins_dir
+    missing = missing_plugins(specs, installed_plugins(plugins_dir))
+    if not missing:
+        log.debug("All %d declared plugins are installed", len(specs))
+        return []
+    pycharm = pycharm or settings.pycharm_exe
+    build = launcher_build(pycharm)
+    store = store or ArchiveStore()
+    args, entries = install_plan(missing, store)
+    # A failure is remembered with where the plugin was offered from, so storing an archive for it tries again
+    sources = {entry.id: entry.path for entry in entries}
+    unmet = unmet_pins(build)
+    wanted = [spec for spec in missing if unmet.get(str(spec)) != sources.get(spec.id, "")]
+    if not wanted:
+        log.debug("The %d missing plugins already failed to install on this build", len(missing))
+        return []
+    ids = {spec.id for spec in wanted}
+    args, entries = [arg for arg in args if arg in ids], [entry for entry in entries if entry.id in ids]
+    if entries:
+        # A repository per plugin set, so concurrent installs of different sets don't trample each other
+        name = hashlib.blake2b(repr(sorted(entries)).encode(), digest_size=8).hexdigest()
+        args.append(write_repository(entries, store.root / "repositories" / f"{name}.xml").as_uri())
+    cmd = make_install_plugins_command(pycharm, *args)
+    log.info("Installing PyCharm plugins: %s", ", ".join(map(str, wanted)))
+    run_command(cmd, check=True)
+    failed = missing_plugins(wanted, installed_plugins(plugins_dir, refresh=True))
+    if failed:
+        log.warning(
+            "Unable to install %s, not trying again until PyCharm is updated or the store has it",
+            ", ".join(map(str, failed)),
+        )
+        _record_unmet(build, {str(spec): sources.get(spec.id, "") for spec in failed})
+    return [spec for spec in wanted if spec not in failed]
@@ -0,0 +1,184 @@
+"""
+The parts of a project's `.idea` model the env integration keeps up to date.
+
+Without a module definition PyCharm treats everything under the project as content and indexes it, hatch envs inside
+the project, build outputs and tool caches included. So the module's `.iml` gets the env directory and the usual
+output and cache directories excluded and the source roots marked, and `misc.xml` gets the env's SDK as the project
+SDK. Edits are merges: entries are only ever added, what the user excluded, marked or set up otherwise stays, and a
+file is only rewritten when its content changes, so the IDE doesn't reload a model for nothing.
+ref: https://www.jetbrains.com/help/pycharm/configuring-project-structure.html
+"""
+
+import hashlib
+import logging
+import os
+from collections.abc import Iterable
+from pathlib import Path
+from xml.etree.ElementTree import Element, ParseError, SubElement, TreeBuilder, XMLParser, indent, tostring
+
+from hatch_pycharm._pycharm.cache import atomic_write, cache_file, file_lock
+from hatch_pycharm._pycharm.macros import MODULE_DIR, PROJECT_DIR, Macros
+from hatch_pycharm._pycharm.tracing import traced
+
+log = logging.getLogger(__name__)
+
+SDK_TYPE = "Python SDK"
+# Excluded whether or not they exist yet, they show up as soon as something is built or tested
+EXCLUDED = (".hatch", ".nox", ".tox", ".mypy_cache", ".pytest_cache", ".ruff_cache", "build", "dist", "htmlcov")
+SOURCE_ROOTS = ("src",)
+TEST_ROOTS = ("tests", "test")
+INDENT = "  "
+
+
+def idea_dir(project: Path) -> Path:
+    return project / ".idea"
+
+
+def _read(path: Path) -> Element | None:
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    # Comments are the user's too
+    parser = XMLParser(target=TreeBuilder(insert_comments=True))
+    try:
+        parser.feed(data)
+        return parser.close()
+    except ParseError:
+        msg = f"Unable to parse {path}, fix or remove it so the project model can be updated"
+        raise ValueError(msg) from None
+
+
+def _write(path: Path, root: Element) -> bool:
+    """Writes `root` the way PyCharm formats its files, returns False when that is what the file holds already"""
+    indent(root, space=INDENT)
+    data = b'<?xml version="1.0" encoding="UTF-8"?>\n' + tostring(root, encoding="unicode").encode("utf-8") + b"\n"
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    with atomic_write(path, "wb") as f:
+        f.write(data)
+    return True
+
+
+def _component(root: Element, name: str, **attrib: str) -> Element:
+    component = root.find(f"component[@name='{name}']")
+    if component is None:
+        component = SubElement(root, "component", name=name, **attrib)
+    return component
+
+
+def module_file(project: Path) -> Path:
+    """The project's module, the first one `modules.xml` lists or `.idea/<project name>.iml` for a new project"""
+    modules = _read(idea_dir(project) / "modules.xml")
+    if modules is not None:
+        for module in modules.iterfind("component[@name='ProjectModuleManager']/modules/module"):
+            filepath = module.get("filepath")
+            if filepath:
+                return Path(Macros({PROJECT_DIR: project}).expand(filepath))
+    return idea_dir(project) / f"{project.name}.iml"
+
+
+def update_modules(project: Path, iml: Path) -> bool:
+    path = idea_dir(project) / "modules.xml"
+    root = _read(path)
+    if root is None:
+        root = Element("project", version="4")
+    manager = _component(root, "ProjectModuleManager")
+    modules = manager.find("modules")
+    if modules is None:
+        modules = SubElement(manager, "modules")
+    collapsed = Macros({PROJECT_DIR: project}).collapse(iml)
+    if any(module.get("filepath") == collapsed for module in modules):
+        return False
+    SubElement(modules, "module", fileurl=f"file://{collapsed}", filepath=collapsed)
+    return _write(path, root)
+
+
+def update_module(
+    iml: Path, project: Path, sources: Iterable[str], tests: Iterable[str], excluded: Iterable[Path | str]
+) -> bool:
+    """
+    Merges source, test and excluded folders into the module's content root. A folder the module already lists in
+    any role keeps the role it has, and folders outside the project are left out.
+    """
+    # A module kept in .idea resolves $MODULE_DIR$ to the project directory
+    macros = Macros({MODULE_DIR: project if iml.parent == idea_dir(project) else iml.parent})
+    root = _read(iml)
+    if root is None:
+        root = Element("module", type="PYTHON_MODULE", version="4")
+    manager = _component(root, "NewModuleRootManager")
+    content_url = f"file://{MODULE_DIR}"
+    content = manager.find(f"content[@url='{content_url}']")
+    if content is None:
+        content = Element("content", url=content_url)
+        manager.insert(0, content)
+    listed = {folder.get("url") for folder in content}
+
+    def add(tag: str, path: Path | str, **attrib: str) -> None:
+        url = f"file://{macros.collapse(project / path)}"
+        if not url.startswith(content_url) or url == content_url or url in listed:
+            return
+        SubElement(content, tag, url=url, **attrib)
+        listed.add(url)
+
+    for source in sources:
+        add("sourceFolder", source, isTestSource="false")
+    for test in tests:
+        add("sourceFolder", test, isTestSource="true")
+    for path in excluded:
+        add("excludeFolder", path)
+    if manager.find("orderEntry[@type='jdk']") is None and manager.find("orderEntry[@type='inheritedJdk']") is None:
+        SubElement(manager, "orderEntry", type="inheritedJdk")
+    if manager.find("orderEntry[@type='sourceFolder']") is None:
+        SubElement(manager, "orderEntry", type="sourceFolder", forTests="false")
+    return _write(iml, root)
+
+
+def update_misc(project: Path, sdk_name: str) -> bool:
+    """Makes `sdk_name` the project SDK"""
+    path = idea_dir(project) / "misc.xml"
+    root = _read(path)
+    if root is None:
+        root = Element("project", version="4")
+    manager = _component(root, "ProjectRootManager", version="2")
+    manager.set("project-jdk-name", sdk_name)
+    manager.set("project-jdk-type", SDK_TYPE)
+    return _write(path, root)
+
+
+def _lock_path(project: Path) -> Path:
+    name = hashlib.blake2b(os.path.abspath(project).encode(), digest_size=16).hexdigest()
+    return cache_file(f"projects/{name}.lock")
+
+
+@traced()
+def write_project_model(
+    project: Path,
+    sdk_name: str,
+    env_dir: Path = None,
+    sources: Iterable[str] = None,
+    tests: Iterable[str] = None,
+) -> bool:
+    """
+    Brings the project model up to date for an env, returns whether any file changed. Source and test roots default
+    to the conventional directories that exist. Every env of a matrix writes the same files, so it's done holding
+    the project's lock.
+    """
+    if sources is None:
+        sources = [name for name in SOURCE_ROOTS if (project / name).is_dir()]
+    if tests is None:
+        tests = [name for name in TEST_ROOTS if (project / name).is_dir()]
+    excluded: list[Path | str] = list(EXCLUDED)
+    if env_dir is not None:
+        excluded.append(Path(env_dir).absolute())
+    with file_lock(_lock_path(project)):
+        iml = module_file(project)
+        changed = update_module(iml, project, sources, tests, excluded)
+        changed |= update_modules(project, iml)
+        changed |= update_misc(project, sdk_name)
+    if changed:
+        log.debug("Updated the project model of %s", project)
+    return changed
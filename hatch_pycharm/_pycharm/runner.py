@@ -0,0 +1,150 @@
+"""
+Runs what the `make_*_command` builders return on asyncio, for callers that drive many IDE processes at once.
+
+A service formatting, inspecting and opening across many projects would otherwise hold a thread per child process
+just to wait on it. `Runner` starts children with `asyncio.create_subprocess_exec`, caps how many run at once with a
+semaphore, streams their output line by line to an optional callback while collecting it, and kills a child whose
+command timed out or whose task was cancelled, so nothing outlives the caller's interest in it. Errors are the ones
+`subprocess.run` raises, `TimeoutExpired` and, with `check=True`, `CalledProcessError`.
+
+`run_command` and `run_commands` are the same for synchronous callers, each runs its own event loop. Everything that
+waits on an IDE process goes through them. Opening the IDE doesn't, `launch_detached` starts it in its own session
+because the launcher of an IDE that isn't running yet *is* the IDE, and a loop kills the children it still owns when
+it closes.
+ref: https://docs.python.org/3/library/asyncio-subprocess.html
+"""
+
+import asyncio
+import logging
+import os
+import subprocess
+from collections.abc import Callable, Iterable, Mapping
+from pathlib import Path
+from typing import Any, Literal, NamedTuple
+
+from hatch_pycharm._pycharm.tracing import traced
+
+log = logging.getLogger(__name__)
+
+# A launcher can print a long classpath on one line, asyncio's default would give up at 64KiB
+LINE_LIMIT = 1 << 20
+# How long a killed child gets to be reaped before we stop waiting on it
+KILL_GRACE = 5.0
+
+Stream = Literal["stdout", "stderr"]
+OutputCallback = Callable[[Stream, str], Any]
+
+
+class CommandResult(NamedTuple):
+    args: list[str]
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+async def _pump(stream: asyncio.StreamReader, name: Stream, lines: list[str], on_output: OutputCallback | None):
+    while line := await stream.readline():
+        text = line.decode(errors="replace")
+        lines.append(text)
+        if on_output is not None:
+            on_output(name, text.rstrip("\r\n"))
+
+
+async def _kill(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is not None:
+        return
+    try:
+        proc.kill()
+    except ProcessLookupError:
+        return
+    try:
+        await asyncio.wait_for(proc.wait(), KILL_GRACE)
+    except asyncio.TimeoutError:
+        log.warning("Process %s didn't exit after being killed", proc.pid)
+
+
+class Runner:
+    """Runs commands with at most `limit` of them alive at once, `timeout` applies to each one unless overridden"""
+
+    def __init__(self, limit: int = None, timeout: float = None):
+        self.limit = limit or min(os.cpu_count() or 1, 4)
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(self.limit)
+
+    async def run(
+        self,
+        cmd: Iterable[Any],
+        *,
+        timeout: float = None,
+        on_output: OutputCallback = None,
+        check: bool = False,
+        cwd: Path = None,
+        env: Mapping[str, str] = None,
+    ) -> CommandResult:
+        """
+        Runs `cmd` once a slot is free, returns once it exited. `on_output` gets every line as it is printed, with
+        the name of the stream it came from. Cancelling the task kills the child.
+        """
+        args = [os.fspath(arg) for arg in cmd]
+        timeout = self.timeout if timeout is None else timeout
+        async with self._semaphore:
+            log.debug("Running %s", args)
+            proc = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=cwd,
+                env=env,
+                limit=LINE_LIMIT,
+            )
+            stdout: list[str] = []
+            stderr: list[str] = []
+
+            async def communicate() -> int:
+                await asyncio.gather(
+                    _pump(proc.stdout, "stdout", stdout, on_output),
+                    _pump(proc.stderr, "stderr", stderr, on_output),
+                )
+                return await proc.wait()
+
+            try:
+                returncode = await asyncio.wait_for(communicate(), timeout)
+            except asyncio.TimeoutError:
+                await _kill(proc)
+                raise subprocess.TimeoutExpired(args, timeout, "".join(stdout), "".join(stderr)) from None
+            except BaseException:
+                # Cancelled, or the callback raised, either way nobody is waiting on the child anymore
+                await _kill(proc)
+                raise
+        result = CommandResult(args, returncode, "".join(stdout), "".join(stderr))
+        if check and returncode:
+            raise subprocess.CalledProcessError(returncode, args, result.stdout, result.stderr)
+        return result
+
+    async def run_all(self, cmds: Iterable[Iterable[Any]], **kwargs) -> list[CommandResult]:
+        """Runs every command, as many at once as the limit allows, results in the order of `cmds`"""
+        return await asyncio.gather(*(self.run(cmd, **kwargs) for cmd in cmds))
+
+
+@traced()
+def run_command(cmd: Iterable[Any], *, timeout: float = None, **kwargs) -> CommandResult:
+    """`Runner.run` for synchronous callers, which must not be running an event loop on this thread"""
+
+    async def main() -> CommandResult:
+        # Made on the loop that runs it, like in run_commands, so its semaphore belongs to that loop
+        return await Runner(limit=1, timeout=timeout).run(cmd, **kwargs)
+
+    return asyncio.run(main())
+
+
+@traced()
+def run_commands(
+    cmds: Iterable[Iterable[Any]], *, limit: int = None, timeout: float = None, **kwargs
+) -> list[CommandResult]:
+    """`Runner.run_all` for synchronous callers, which must not be running an event loop on this thread"""
+
+    async def main() -> list[CommandResult]:
+        return await Runner(limit, timeout).run_all(cmds, **kwargs)
+
+    return asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+The PyCharm install and settings directory this plugin talks to.
+
+Everything here is resolved on first attribute access (PEP 562), so importing this module never touches the
+filesystem. `HATCH_PYCHARM_EXE` and `HATCH_PYCHARM_CONFIG_DIR` override discovery.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+from hatch_pycharm._pycharm.discovery import discovered, launcher_build
+from hatch_pycharm._pycharm.platform_paths import plugin_install_dir, system_search_root
+from hatch_pycharm._pycharm.types import BuildNumber
+
+# Bare global lookups skip the module __getattr__, so resolvers go through the module object
+_self = sys.modules[__name__]
+
+
+def _pycharm_exe() -> Path:
+    override = os.environ.get("HATCH_PYCHARM_EXE")
+    if override:
+        return Path(override)
+    installs = discovered().installs
+    if not installs:
+        msg = "Unable to find a PyCharm install, set HATCH_PYCHARM_EXE to the launcher"
+        raise FileNotFoundError(msg)
+    return installs[0][1]
+
+
+def _build() -> BuildNumber | None:
+    exe = _self.pycharm_exe
+    for build, path in discovered().installs:
+        if path == exe:
+            return build
+    # An overridden launcher that discovery never saw, read its build.txt directly
+    return launcher_build(exe)
+
+
+def _config_dir() -> Path:
+    override = os.environ.get("HATCH_PYCHARM_CONFIG_DIR")
+    if override:
+        return Path(override)
+    config_dirs = discovered().config_dirs
+    if not config_dirs:
+        msg = "Unable to find a PyCharm settings directory, set HATCH_PYCHARM_CONFIG_DIR to it"
+        raise FileNotFoundError(msg)
+    # Prefer the settings that belong to the install we launch, PyCharm2023.2 is branch 232
+    current = _self.build_number
+    for build, path in config_dirs:
+        if current and build[0] == current[0]:
+            return path
+    return config_dirs[0][1]
+
+
+def _helpers_dir() -> Path:
+    # Community builds ship the Python plugin as python-ce
+    for plugin in ("python", "python-ce"):
+        helpers = _self.pycharm_home / "plugins" / plugin / "helpers"
+        if helpers.is_dir():
+            return helpers
+    return _self.pycharm_home / "plugins" / "python" / "helpers"
+
+
+_resolvers = {
+    "pycharm_exe": _pycharm_exe,
+    # bin/pycharm.sh and Contents/MacOS/pycharm are both two levels below $APPLICATION_HOME_DIR$
+    "pycharm_home": lambda: _self.pycharm_exe.parent.parent,
+    "build_number": _build,
+    "config_dir": _config_dir,
+    "options_dir": lambda: _self.config_dir / "options",
+    "jdk_tools_xml": lambda: _self.options_dir / "jdk.table.xml",
+    "system_dir": lambda: system_search_root() / _self.config_dir.name,
+    "helpers_dir": _helpers_dir,
+    "plugins_dir": lambda: plugin_install_dir(_self.config_dir),
+}
+
+pycharm_exe: Path
+pycharm_home: Path
+build_number: BuildNumber | None
+config_dir: Path
+options_dir: Path
+jdk_tools_xml: Path
+system_dir: Path
+helpers_dir: Path
+plugins_dir: Path
+
+
+def __getattr__(name: str):
+    try:
+        resolver = _resolvers[name]
+    except KeyError:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg) from None
+    value = resolver()
+    globals()[name] = value
+    return value
+
+
+def reset() -> None:
+    """Forget everything resolved so far, the next access resolves it again"""
+    discovered.cache_clear()
+    for name in _resolvers:
+        globals().pop(name, None)
@@ -0,0 +1,113 @@
+"""
+Seeds a new SDK's `python_stubs` directory from an equivalent interpreter's.
+
+PyCharm builds skeletons for every binary module an interpreter can import by introspecting them one process at a
+time, which takes minutes, and it does so again for every new env on the same base interpreter. Each SDK we register
+is recorded with a key of its base install, full version and ABI config vars. When a new SDK's stubs directory is
+still missing, the stubs of a recorded SDK with the same key are cloned into place first, so PyCharm only has to
+fill in what differs.
+
+Files are reflinked where the filesystem can (copy-on-write, Linux only from the standard library) and copied where
+it can't. They are not hardlinked, envs on the same base interpreter can still have different versions of a package
+installed, and a skeleton regenerated for one env must not show up in the other through a shared inode.
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from hatch_pycharm._pycharm.cache import cache_file, dump_json, load_json, mtime_ns
+from hatch_pycharm._pycharm.interpreter import InterpreterInfo
+from hatch_pycharm._pycharm.tracing import traced
+
+log = logging.getLogger(__name__)
+
+INDEX = "stubs/index.json"
+# What decides which binary modules exist and what they look like, next to the base install and version
+ABI_FIELDS = ("SOABI", "EXT_SUFFIX", "MULTIARCH", "ABIFLAGS", "Py_DEBUG", "Py_GIL_DISABLED")
+# linux/fs.h, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def abi_key(info: InterpreterInfo) -> list:
+    return [
+        os.path.normcase(os.path.abspath(info.base_prefix)),
+        list(info.version),
+        *(info.config_vars.get(field) for field in ABI_FIELDS),
+    ]
+
+
+def _recorded() -> dict[str, list]:
+    data = load_json(cache_file(INDEX))
+    return data["dirs"] if data else {}
+
+
+def record(stubs_dir: Path, info: InterpreterInfo) -> None:
+    """Remembers which interpreter `stubs_dir` belongs to, for the envs that come after it"""
+    dirs = _recorded()
+    key = abi_key(info)
+    if dirs.get(str(stubs_dir)) != key:
+        dump_json(cache_file(INDEX), {"dirs": {**dirs, str(stubs_dir): key}})
+
+
+def _is_empty(path: Path) -> bool:
+    try:
+        with os.scandir(path) as entries:
+            return next(entries, None) is None
+    except OSError:
+        return True
+
+
+def find_equivalent(stubs_dir: Path, info: InterpreterInfo) -> Path | None:
+    """The most recently updated stubs directory of an equivalent interpreter, other than `stubs_dir`"""
+    key = abi_key(info)
+    candidates = [Path(path) for path, other in _recorded().items() if other == key and path != str(stubs_dir)]
+    candidates = [path for path in candidates if not _is_empty(path)]
+    return max(candidates, key=lambda path: mtime_ns(path) or 0, default=None)
+
+
+def clone_file(src: str, dst: str) -> None:
+    """`shutil.copy2`, sharing the data blocks with `src` when the filesystem supports reflinks"""
+    if sys.platform == "linux":
+        import fcntl
+
+        try:
+            with open(src, "rb") as s, open(dst, "wb") as d:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+
+
+@traced()
+def seed(stubs_dir: Path, info: InterpreterInfo) -> Path | None:
+    """
+    Fills a missing or empty `stubs_dir` from an equivalent interpreter's, returns where it was seeded from. The copy
+    is built next to `stubs_dir` and renamed into place, PyCharm never sees half of it.
+    """
+    if not _is_empty(stubs_dir):
+        return None
+    source = find_equivalent(stubs_dir, info)
+    if source is None:
+        return None
+    log.debug("Seeding %s from %s", stubs_dir, source)
+    staging = None
+    try:
+        stubs_dir.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{stubs_dir.name}.", dir=stubs_dir.parent))
+        shutil.copytree(source, staging, copy_function=clone_file, dirs_exist_ok=True)
+        if stubs_dir.exists():
+            # Only an empty one, anything PyCharm started generating meanwhile stays
+            stubs_dir.rmdir()
+        staging.rename(stubs_dir)
+    except OSError:
+        log.debug("Unable to seed %s from %s", stubs_dir, source, exc_info=True)
+        if staging is not None:
+            shutil.rmtree(staging, ignore_errors=True)
+        return None
+    return source
@@ -0,0 +1,183 @@
+"""
+Spans around the parts of `hatch env create` and friends that cost time, exported as a Chrome trace.
+
+Set `HATCH_PYCHARM_TRACE` to a file path (`{pid}` is replaced by the process id) and every span is written there when
+the process exits, ready for `chrome://tracing` or https://ui.perfetto.dev. Without it `span` hands out one shared
+no-op object and the decorators cost a single global lookup per call.
+ref: https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+from collections.abc import Callable, Iterable
+from functools import wraps
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Any
+
+from hatch_pycharm._pycharm.cache import atomic_write
+
+log = logging.getLogger(__name__)
+
+ENV_VAR = "HATCH_PYCHARM_TRACE"
+
+_epoch = perf_counter_ns()
+# None while tracing is off, the hot paths only ever check this
+_events: list[dict] | None = None
+_output: Path | None = None
+_write_at_exit = False
+_named_threads: set[int] = set()
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        _record(self.name, self.start, end, self.args)
+        return False
+
+    def set(self, **args):
+        """Adds to the span's args, for what is only known once the work is done"""
+        self.args.update(args)
+
+
+def _record(name: str, start: int, end: int, args: dict) -> None:
+    events = _events
+    if events is None:
+        return
+    tid = threading.get_ident()
+    if tid not in _named_threads:
+        _named_threads.add(tid)
+        thread_name = {"name": threading.current_thread().name}
+        events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": thread_name})
+    events.append(
+        {
+            "name": name,
+            "cat": "hatch-pycharm",
+            "ph": "X",
+            "ts": (start - _epoch) / 1000,
+            "dur": (end - start) / 1000,
+            "pid": os.getpid(),
+            "tid": tid,
+            "args": args,
+        }
+    )
+
+
+def is_enabled() -> bool:
+    return _events is not None
+
+
+def span(name: str, **args) -> Span | _NoSpan:
+    """`with span("name", key=value):` records how long the block took"""
+    if _events is None:
+        return _NO_SPAN
+    return Span(name, args)
+
+
+def traced(name: str = None) -> Callable:
+    """Decorator form of `span`, named after the function unless told otherwise"""
+
+    def decorator(f: Callable) -> Callable:
+        span_name = name or f.__qualname__
+
+        @wraps(f)
+        def inner(*args, **kwargs):
+            if _events is None:
+                return f(*args, **kwargs)
+            with Span(span_name, {}):
+                return f(*args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+def argv_size(cmd: Iterable[Any]) -> int:
+    """Bytes the command takes up in argv, terminators included"""
+    return sum(len(os.fsencode(str(arg))) + 1 for arg in cmd)
+
+
+def traced_command(f: Callable) -> Callable:
+    """For the command builders, records how many arguments they built and how much argv space they take"""
+
+    @wraps(f)
+    def inner(*args, **kwargs):
+        if _events is None and not log.isEnabledFor(logging.DEBUG):
+            return f(*args, **kwargs)
+        with span(f.__name__) as s:
+            cmd = f(*args, **kwargs)
+            s.set(argc=len(cmd), argv_bytes=argv_size(cmd))
+        log.debug("Function %s created the command %s", f.__name__, cmd)
+        return cmd
+
+    return inner
+
+
+def export() -> dict:
+    return {"traceEvents": list(_events or ()), "displayTimeUnit": "ms"}
+
+
+def write(path: Path = None) -> None:
+    path = path or _output
+    if path is None or _events is None:
+        return
+    try:
+        with atomic_write(path, encoding="utf-8") as f:
+            json.dump(export(), f)
+    except OSError:
+        log.warning("Unable to write the trace to %s", path, exc_info=True)
+
+
+def enable(output: Path = None) -> None:
+    """Starts recording, and writes everything to `output` at exit when given one"""
+    global _events, _output, _write_at_exit
+    if _events is None:
+        _events = []
+    if output is not None:
+        _output = output
+        if not _write_at_exit:
+            _write_at_exit = True
+            atexit.register(write)
+
+
+def disable() -> None:
+    global _events, _output
+    _events = None
+    _output = None
+    _named_threads.clear()
+
+
+if os.environ.get(ENV_VAR):
+    enable(Path(os.environ[ENV_VAR].replace("{pid}", str(os.getpid()))))
@@ -0,0 +1,142 @@
+"""
+SDK table writes from any number of processes, coalesced into as few rewrites of `jdk.table.xml` as possible.
+
+A matrix of envs created in parallel (one hatch per terminal, or one hatch creating several envs) would otherwise
+have every writer read, modify and rename the table on its own, and the last rename wins. Instead every upsert is
+spooled as a ticket next to our cache of the table, and whoever holds the table's lock applies every ticket spooled
+so far with one `JdkIndex.upsert_many`. Writers that queued up behind the lock usually find their ticket already
+applied when they get it, so N registrations cost one or two rewrites and none of them are lost.
+
+Tickets carry the finished `<jdk>` rather than a builder, they are applied by whichever process gets there first. The
+one thing taken from the SDK being replaced is its `SDK_UUID`, which the ticket's receipt reports back.
+"""
+
+import json
+import logging
+import uuid
+from collections.abc import Iterable
+from pathlib import Path
+from time import time_ns
+from typing import NamedTuple
+from xml.etree.ElementTree import Element
+
+from hatch_pycharm._pycharm.cache import atomic_write, cache_file, file_lock
+from hatch_pycharm._pycharm.helpers import escape_attrib
+from hatch_pycharm._pycharm.jdk_index import SDK_UUID, JdkIndex, digest
+from hatch_pycharm._pycharm.tracing import traced
+
+log = logging.getLogger(__name__)
+
+
+def _known_uuid(old: Element | None) -> str | None:
+    additional = old.find("additional") if old is not None else None
+    return additional.get(SDK_UUID) if additional is not None else None
+
+
+class Upsert(NamedTuple):
+    project: str
+    exe: str
+    # The serialized `<jdk>`, carrying `SDK_UUID="{uuid}"`
+    payload: str
+    uuid: str
+
+    def build(self, old: Element | None) -> bytes:
+        """The payload, with the `SDK_UUID` PyCharm already knows the SDK by when replacing one"""
+        known = _known_uuid(old)
+        payload = self.payload
+        if known and known != self.uuid:
+            ours = f'{SDK_UUID}="{escape_attrib(self.uuid)}"'
+            payload = payload.replace(ours, f'{SDK_UUID}="{escape_attrib(known)}"', 1)
+        return payload.encode("utf-8")
+
+    def receipt(self, old: Element | None, replaced: bool) -> "Receipt":
+        return Receipt(replaced, _known_uuid(old) or self.uuid)
+
+
+class Receipt(NamedTuple):
+    replaced: bool
+    uuid: str
+
+
+def spool_dir(table: Path) -> Path:
+    return cache_file(f"transactions/{digest(str(Path(table).absolute()).encode())}")
+
+
+def _lock_path(table: Path) -> Path:
+    return spool_dir(table) / ".lock"
+
+
+def _spool(table: Path, upserts: list[Upsert]) -> list[Path]:
+    tickets = []
+    for upsert in upserts:
+        # Named so they sort in the order they were spooled, a later upsert for the same SDK has to win
+        ticket = spool_dir(table) / f"{time_ns():016x}-{uuid.uuid4().hex}.json"
+        with atomic_write(ticket, encoding="utf-8") as f:
+            json.dump(upsert._asdict(), f)
+        tickets.append(ticket)
+    return tickets
+
+
+@traced()
+def apply_spooled(table: Path) -> int:
+    """Applies every spooled ticket with a single table rewrite, call it holding the table's lock"""
+    tickets = sorted(spool_dir(table).glob("*.json"))
+    upserts: list[tuple[Path, Upsert]] = []
+    for ticket in tickets:
+        try:
+            upserts.append((ticket, Upsert(**json.loads(ticket.read_text(encoding="utf-8")))))
+        except (OSError, ValueError, TypeError):
+            log.warning("Dropping unreadable SDK table ticket %s", ticket)
+            ticket.unlink(missing_ok=True)
+    if not upserts:
+        return 0
+    olds: dict[Path, Element | None] = {}
+
+    def builder(ticket: Path, upsert: Upsert):
+        def build(old: Element | None) -> bytes:
+            olds[ticket] = old
+            return upsert.build(old)
+
+        return build
+
+    replaced = JdkIndex.load(table).upsert_many((u.project, u.exe, builder(ticket, u)) for ticket, u in upserts)
+    for (ticket, upsert), was_replaced in zip(upserts, replaced):
+        # A ticket superseded by a later one for the same SDK never saw the old element, it reports its own UUID
+        receipt = upsert.receipt(olds.get(ticket), was_replaced)
+        with atomic_write(ticket.with_suffix(".done"), encoding="utf-8") as f:
+            json.dump(receipt._asdict(), f)
+        ticket.unlink()
+    log.debug("Applied %d SDK table upserts to %s", len(upserts), table)
+    return len(upserts)
+
+
+def _collect(ticket: Path) -> Receipt | None:
+    done = ticket.with_suffix(".done")
+    try:
+        data = json.loads(done.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    done.unlink()
+    return Receipt(**data)
+
+
+@traced()
+def submit(table: Path, upserts: Iterable[Upsert]) -> list[Receipt]:
+    """
+    Writes `upserts` into `table` as one transaction, together with whatever other writers queued meanwhile. Returns
+    a receipt per upsert once it is in the table.
+    """
+    upserts = list(upserts)
+    tickets = _spool(table, upserts)
+    try:
+        with file_lock(_lock_path(table)):
+            receipts = [_collect(ticket) for ticket in tickets]
+            if None in receipts:
+                apply_spooled(table)
+                receipts = [receipt or _collect(ticket) for receipt, ticket in zip(receipts, tickets)]
+    except BaseException:
+        # Never leave our own work behind for another writer to apply after we failed
+        for ticket in tickets:
+            ticket.unlink(missing_ok=True)
+        raise
+    return receipts
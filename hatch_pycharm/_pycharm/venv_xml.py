@@ -0,0 +1,170 @@
+"""Describes a hatch environment as the `<jdk>` element PyCharm keeps for every Python SDK in `jdk.table.xml`"""
+
+import logging
+import os
+import uuid
+from collections.abc import Iterable
+from functools import cached_property
+from pathlib import Path
+from xml.etree.ElementTree import Element, SubElement
+
+from hatch_pycharm._pycharm import settings, stubs
+from hatch_pycharm._pycharm.config_vars import PythonConfigVars
+from hatch_pycharm._pycharm.helpers import HelperManifest, escape_attrib, helper_manifest, render_roots
+from hatch_pycharm._pycharm.interpreter import InterpreterInfo, probe
+from hatch_pycharm._pycharm.jdk_index import ASSOCIATED_PROJECT_PATH, SDK_UUID, JdkIndex
+from hatch_pycharm._pycharm.macros import collapse_macros, path_key
+from hatch_pycharm._pycharm.tracing import traced
+from hatch_pycharm._pycharm.transaction import Upsert, submit
+from hatch_pycharm._pycharm.types import BuildNumber
+
+log = logging.getLogger(__name__)
+
+SDK_TYPE = "Python SDK"
+# What jdk_table.serialize writes for _build_jdk_element, with {roots} pre-rendered
+_JDK_TEMPLATE = f"""\
+<jdk version="2">
+      <name value="{{name}}" />
+      <type value="{SDK_TYPE}" />
+      <version value="{{version}}" />
+      <homePath value="{{home}}" />
+      <roots>
+        <classPath>
+          <root type="composite">
+{{roots}}          </root>
+        </classPath>
+        <sourcePath>
+          <root type="composite" />
+        </sourcePath>
+      </roots>
+      <additional {ASSOCIATED_PROJECT_PATH}="{{project}}" {SDK_UUID}="{{uuid}}">
+        <setting name="FLAVOR_ID" value="VirtualEnvSdkFlavor" />
+        <setting name="FLAVOR_DATA" value="{{{{}}}}" />
+      </additional>
+    </jdk>"""
+
+
+def java_string_hash(value: str) -> int:
+    """`String.hashCode()`, PyCharm names each interpreter's `python_stubs` directory with it"""
+    h = 0
+    # Java strings hash UTF-16 code units, not code points
+    data = value.encode("utf-16-be")
+    for i in range(0, len(data), 2):
+        h = (31 * h + int.from_bytes(data[i : i + 2], "big")) & 0xFFFFFFFF
+    return h - (1 << 32) if h >= 1 << 31 else h
+
+
+class PyCharmVenv:
+    """A Python SDK for PyCharm, built from a hatch environment's interpreter"""
+
+    def __init__(self, name: str, exe_loc: Path, associated_project_path: Path, sdk_uuid: str = None):
+        self.name = name
+        self.exe_loc = exe_loc
+        self.associated_project_path = associated_project_path
+        # Stable per project and interpreter, so re-registering an env doesn't churn the IDE's references to it
+        self.sdk_uuid = sdk_uuid or str(uuid.uuid5(uuid.NAMESPACE_URL, f"{associated_project_path}|{exe_loc}"))
+
+    @cached_property
+    def info(self) -> InterpreterInfo:
+        return probe(self.exe_loc)
+
+    @property
+    def exe_version(self) -> BuildNumber:
+        return self.info.version
+
+    @property
+    def sys_path(self) -> list[Path]:
+        return [Path(p) for p in self.info.sys_path if p and os.path.isdir(p)]
+
+    @property
+    def config_vars(self) -> PythonConfigVars:
+        return self.info.config_vars
+
+    @property
+    def stubs_dir(self) -> Path:
+        """The skeletons PyCharm generates for binary modules, keyed by the interpreter path"""
+        return settings.system_dir / "python_stubs" / str(java_string_hash(Path(self.exe_loc).as_posix()))
+
+    @property
+    def helpers(self) -> HelperManifest:
+        return helper_manifest(settings.build_number, settings.helpers_dir)
+
+    def class_path_urls(self) -> list[str]:
+        own = [*self.sys_path, self.stubs_dir]
+        return [*(f"file://{collapse_macros(root)}" for root in own), *self.helpers.urls]
+
+    def matches(self, jdk: Element) -> bool:
+        """Is this `<jdk>` the SDK for our project and interpreter"""
+        additional = jdk.find("additional")
+        home_path = jdk.find("homePath")
+        if additional is None or home_path is None:
+            return False
+        project_path = additional.get(ASSOCIATED_PROJECT_PATH)
+        if not project_path or path_key(project_path) != path_key(self.associated_project_path):
+            return False
+        return path_key(home_path.get("value", "")) == path_key(self.exe_loc)
+
+    def _build_jdk_element(self) -> Element:
+        jdk = Element("jdk", version="2")
+        SubElement(jdk, "name", value=self.name)
+        SubElement(jdk, "type", value=SDK_TYPE)
+        SubElement(jdk, "version", value="Python {}.{}.{}".format(*self.exe_version))
+        SubElement(jdk, "homePath", value=str(self.exe_loc))
+        roots = SubElement(jdk, "roots")
+        composite = SubElement(SubElement(roots, "classPath"), "root", type="composite")
+        for url in self.class_path_urls():
+            SubElement(composite, "root", url=url, type="simple")
+        SubElement(SubElement(roots, "sourcePath"), "root", type="composite")
+        additional = SubElement(
+            jdk,
+            "additional",
+            {ASSOCIATED_PROJECT_PATH: collapse_macros(self.associated_project_path), SDK_UUID: self.sdk_uuid},
+        )
+        SubElement(additional, "setting", name="FLAVOR_ID", value="VirtualEnvSdkFlavor")
+        SubElement(additional, "setting", name="FLAVOR_DATA", value="{}")
+        return jdk
+
+    def render_jdk(self) -> bytes:
+        """
+        The same bytes `jdk_table.serialize(self._build_jdk_element())` produces, filled into a template with the
+        helper roots pasted in pre-rendered.
+        """
+        own = [f"file://{collapse_macros(root)}" for root in (*self.sys_path, self.stubs_dir)]
+        return _JDK_TEMPLATE.format(
+            name=escape_attrib(self.name),
+            version="Python {}.{}.{}".format(*self.exe_version),
+            home=escape_attrib(str(self.exe_loc)),
+            roots=render_roots(own) + self.helpers.fragment,
+            project=escape_attrib(collapse_macros(self.associated_project_path)),
+            uuid=escape_attrib(self.sdk_uuid),
+        ).encode("utf-8")
+
+    def build_jdk_xml(self) -> str:
+        return self.render_jdk().decode("utf-8")
+
+    def find_in(self, table: Path = None) -> Element | None:
+        return JdkIndex.load(table or settings.jdk_tools_xml).find(self.associated_project_path, self.exe_loc)
+
+    def upsert(self) -> Upsert:
+        return Upsert(str(self.associated_project_path), str(self.exe_loc), self.build_jdk_xml(), self.sdk_uuid)
+
+    def register(self, table: Path = None) -> bool:
+        """Adds or replaces our SDK in the table, returns True when an existing entry was replaced"""
+        return register_all([self], table)[0]
+
+
+@traced()
+def register_all(venvs: Iterable[PyCharmVenv], table: Path = None) -> list[bool]:
+    """
+    Registers every SDK in `venvs` with a single locked rewrite of the table, a whole matrix at once. Replaced SDKs
+    keep the UUID PyCharm already knows them by.
+    """
+    venvs = list(venvs)
+    for venv in venvs:
+        # Before PyCharm sees the SDK, so it starts out with the skeletons an equivalent interpreter already has
+        stubs.seed(venv.stubs_dir, venv.info)
+        stubs.record(venv.stubs_dir, venv.info)
+    receipts = submit(table or settings.jdk_tools_xml, [venv.upsert() for venv in venvs])
+    for venv, receipt in zip(venvs, receipts):
+        venv.sdk_uuid = receipt.uuid
+    return [receipt.replaced for receipt in receipts]
@@ -1,58 +1,215 @@
+from collections.abc import Iterator
 from pathlib import Path
 
 from hatch.env.collectors.plugin.interface import EnvironmentCollectorInterface
 from hatch.env.virtual import VirtualEnvironment
 from hatch.template.plugin.interface import TemplateInterface
-from functools import partial
-import subprocess
-from ._pycharm import make_open_file_command
+from functools import cached_property
+import sys
+from concurrent.futures import Future
+from typing import NamedTuple
+from ._pycharm import env_state, make_open_file_command, settings
+from ._pycharm.background import at_command_end, launch_detached, run_in_background
+from ._pycharm.instance import open_in_running_instance
+from ._pycharm.interpreter import find_on_path, probe
+from ._pycharm.plugins import ensure_plugins
+from ._pycharm.project_model import write_project_model
+from ._pycharm.tracing import traced
+from ._pycharm.venv_xml import PyCharmVenv
 
 
-def open_pycharm(location: Path):
-    cmd: list[str] = list(make_open_file_command(location))
-    subprocess.run(cmd, check=True)
+@traced()
+def open_pycharm(*locations: Path):
+    # A running IDE opens files in milliseconds, the launcher is only worth its startup cost for what it didn't open
+    remaining = open_in_running_instance(*locations)
+    if remaining:
+        launch_detached(make_open_file_command(settings.pycharm_exe, *remaining))
+
+
+_OPEN_PENDING = "hatch_pycharm.open_pending"
+_pending_projects: list[Path] = []
+
+
+def open_pending_projects():
+    projects = list(dict.fromkeys(_pending_projects))
+    _pending_projects.clear()
+    if projects:
+        open_pycharm(*projects)
+
+
+class Integration(NamedTuple):
+    """What a background integration needs from hatch, read before it is queued"""
+
+    project: Path
+    project_name: str
+    python_exe: Path
+    env_path: Path
+    dependency_hash: str
+    plugins: list[str]
+    source_roots: list[str] | None
+
+
+def sdk_name(exe: Path, project_name: str) -> str:
+    version = probe(exe).version
+    return f"Python {version[0]}.{version[1]} ({project_name})"
+
+
+@traced()
+def integrate(plan: Integration) -> bool:
+    """
+    Installs missing plugins, registers the interpreter as an SDK, points the project model at it and opens the
+    project, off hatch's critical path. Skipped when nothing changed since the last time, returns whether there was
+    anything to do.
+    """
+    # Checked every time against the plugins directory index, plugins can be removed from the IDE itself
+    installed = ensure_plugins(plan.plugins)
+    current = env_state.fingerprint(plan.python_exe, plan.dependency_hash, plan.project)
+    if env_state.is_current(plan.env_path, current) and not installed:
+        return False
+    name = sdk_name(plan.python_exe, plan.project_name)
+    PyCharmVenv(name, plan.python_exe, plan.project).register()
+    write_project_model(plan.project, name, plan.env_path, plan.source_roots)
+    open_pycharm(plan.project)
+    # Taken again, registering and writing the model is what changes its IDE side
+    env_state.record(plan.env_path, env_state.fingerprint(plan.python_exe, plan.dependency_hash, plan.project))
+    return True
 
 
 class PycharmEnvironment(VirtualEnvironment):
     PLUGIN_NAME = "pycharm"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._integrations: list[Future] = []
+
+    @property
+    def python_exe(self) -> Path:
+        return self.virtual_env.executables_directory / ("python.exe" if sys.platform == "win32" else "python")
+
+    @property
+    def pycharm_plugins(self) -> list[str]:
+        """The `pycharm-plugins` option, plugin ids with an optional `@version`"""
+        return self.config.get("pycharm-plugins", [])
+
+    @property
+    def pycharm_source_roots(self) -> list[str] | None:
+        """Source roots to mark in the project model, relative to the project, by default `src` if it exists"""
+        return self.config.get("pycharm-source-roots")
+
+    @traced()
     def create(self):
         super().create()
-        self.platform.check_command(make_open_file_command(self.root))
-        self.app.display_success("We opened the self.root directory as a project hopefully")
+        # Dependencies are installed after this returns, the IDE side runs alongside them
+        self.schedule_integration()
+
+    @traced()
+    def sync_dependencies(self):
+        super().sync_dependencies()
+        self.schedule_integration()
+
+    def remove(self):
+        super().remove()
+        env_state.forget(self.virtual_env_path)
+
+    def schedule_integration(self):
+        """Queues `integrate` behind whatever this command already queued, reported once the command is done"""
+        previous = self._integrations[-1] if self._integrations else None
+        # Read on this thread, hatch's metadata and config aren't ours to share
+        plan = Integration(
+            project=self.root,
+            project_name=self.metadata.name,
+            python_exe=self.python_exe,
+            env_path=self.virtual_env_path,
+            dependency_hash=self.dependency_hash(),
+            plugins=list(self.pycharm_plugins),
+            source_roots=self.pycharm_source_roots,
+        )
+
+        def work() -> bool:
+            if previous is not None:
+                previous.exception()
+            return integrate(plan)
+
+        if not self._integrations:
+            at_command_end(self.report)
+        self._integrations.append(run_in_background(work, name=f"hatch-pycharm-{self.name}"))
+
+    def report(self):
+        changed = False
+        for task in self._integrations:
+            try:
+                changed |= task.result()
+            except Exception as e:
+                # One bad integration says nothing about the others queued by this command
+                self.app.display_warning(f"Unable to set up {self.root} in PyCharm: {e}")
+        if changed:
+            self.app.display_success(f"Opened {self.root} in PyCharm")
 
 
 class PycharmTemplate(TemplateInterface):
     """This isn't a good idea, but it is an idea. We are not templating with this, we are throwing a callback on the
-    end of the Click context with `click.get_current_context(),
+    end of the Click context with `click.get_current_context()`. The project location comes from the `new` command's
+    own parameters on that context, no stack frames involved.
     ref:https://click.palletsprojects.com/en/8.1.x/advanced/#managing-resources"""
 
     PLUGIN_NAME = "pycharm"
 
     @staticmethod
-    def read_location() -> str:
+    def read_location(params: dict, config: dict) -> Path:
         """
-        Returns the location of the calling function, by inspecting my parent frame's local variables
+        Where `hatch new` writes the project, worked out from its arguments and the template config the same way
+        `new` itself does
         """
-        import inspect
-
-        frame = inspect.currentframe()
-        try:
-            context = inspect.getouterframes(frame)[1].frame.f_locals
-            return context.get("location")
-        finally:
-            del frame
+        if params.get("location"):
+            return Path(params["location"]).resolve()
+        if params.get("initialize"):
+            return Path.cwd()
+        return Path(config["project_name_normalized"]).resolve()
 
+    @traced()
     def finalize_files(self, config, files):
-        """We aren't finalizing anything, we are just registering a call on close hook"""
+        """We aren't finalizing anything, we are just queueing the project to be opened once the command closes"""
         from click import get_current_context
 
-        # Get the execution context from Click
         ctx = get_current_context()
-        location = self.read_location()
-        # Tell Click to call us when this context is done (When the new command is closed out)
-        ctx.call_on_close(partial(open_pycharm, location))
+        _pending_projects.append(self.read_location(ctx.params, config))
+        # One callback per command, on the outermost context, opens everything scaffolded in it with one IDE call
+        root = ctx.find_root()
+        if not root.meta.get(_OPEN_PENDING):
+            root.meta[_OPEN_PENDING] = True
+            root.call_on_close(open_pending_projects)
 
 
 class PycharmCollector(EnvironmentCollectorInterface):
+    """
+    Adds a `pycharm` environment with a matrix entry per Python version on `PATH`, as long as there is a PyCharm to
+    open it in. Everything under `[tool.hatch.env.collectors.pycharm]` other than `name` is copied into the
+    environment's config.
+
+    Hatch builds every environment's config for each command, so both inputs come from caches that are fingerprinted
+    by directory mtimes, a warm collection is a few `stat` calls and two small reads.
+    """
+
     PLUGIN_NAME = "pycharm"
+
+    @cached_property
+    def pythons(self) -> dict[str, Path]:
+        return find_on_path()
+
+    @cached_property
+    def has_pycharm(self) -> bool:
+        try:
+            return settings.pycharm_exe.exists()
+        except FileNotFoundError:
+            return False
+
+    def environments(self) -> Iterator[tuple[str, dict]]:
+        if not self.has_pycharm or not self.pythons:
+            return
+        config = dict(self.config)
+        name = config.pop("name", "pycharm")
+        yield name, {"type": "pycharm", **config, "matrix": [{"python": list(self.pythons)}]}
+
+    @traced()
+    def get_initial_config(self) -> dict[str, dict]:
+        return dict(self.environments())
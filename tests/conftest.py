@@ -10,6 +10,7 @@ from xml.etree.ElementTree import fromstring, Element
 import pytest
 
 from hatch_pycharm._pycharm import settings
+from hatch_pycharm._pycharm.macros import path_key
 from hatch_pycharm._pycharm.venv_xml import PyCharmVenv, PythonConfigVars
 
 ROOT = Path(__file__).parent.parent
@@ -81,6 +82,37 @@ def current_project_venv(current_project_misc_file) -> "PyCharmVenv":
     yield PyCharmVenv("Python 3.11 (hatch-pycharm)", Path(sys.executable), ROOT)
 
 
+@pytest.fixture
+def fake_pycharm(tmp_path, monkeypatch) -> Path:
+    """A PyCharm install and settings directory with just enough in them for SDK generation"""
+    home = tmp_path / "pycharm"
+    for stub in ("six", "requests"):
+        (home / "plugins" / "python" / "helpers" / "typeshed" / "stubs" / stub).mkdir(parents=True)
+    (home / "bin").mkdir()
+    (home / "bin" / "pycharm.sh").write_text("")
+    (home / "build.txt").write_text("PY-232.8660.197")
+    monkeypatch.setenv("HATCH_PYCHARM_EXE", str(home / "bin" / "pycharm.sh"))
+    monkeypatch.setenv("HATCH_PYCHARM_CONFIG_DIR", str(tmp_path / "config" / "PyCharm2023.2"))
+    monkeypatch.setenv("HATCH_PYCHARM_CACHE_DIR", str(tmp_path / "cache"))
+    settings.reset()
+    yield home
+    settings.reset()
+
+
+@pytest.fixture
+def jdk_table_file(tmp_path) -> Path:
+    """A jdk.table.xml holding the SDKs from example_xml"""
+    jdks = [(ROOT / "example_xml" / f"{name}_jdk.tools.xml").read_text().strip() for name in ("macos", "win", "wsl")]
+    table = tmp_path / "jdk.table.xml"
+    table.write_text(
+        '<application>\n  <component name="ProjectJdkTable">\n    {}\n  </component>\n</application>'.format(
+            "\n    ".join(jdks)
+        ),
+        encoding="utf-8",
+    )
+    return table
+
+
 @pytest.fixture
 def config_vars() -> "PythonConfigVars":
     import sysconfig
@@ -337,11 +369,7 @@ def current_tools_jdk_file() -> Element:
 
 
 def jetbrains_path_render(jb_path: str) -> Path:
-    user_home = str(Path.home())
-    app_home = str(settings.config_dir)
-    jb_path = jb_path.replace("$APPLICATION_HOME_DIR$", app_home)
-    jb_path = jb_path.replace("$USER_HOME$", user_home)
-    return Path(jb_path).resolve()
+    return Path(path_key(jb_path))
 
 
 @pytest.fixture()
@@ -354,7 +382,9 @@ def current_jdk_element(current_tools_jdk_file, current_project_venv) -> Element
         hp = jdk_elem.find("./homePath")
         home_path = hp.attrib.get("value")
         home_path = jetbrains_path_render(home_path)
-        if project_path == current_project_venv.associated_project_path and home_path == current_project_venv.exe_loc:
+        if project_path == Path(path_key(current_project_venv.associated_project_path)) and home_path == Path(
+            path_key(current_project_venv.exe_loc)
+        ):
             yield jdk_elem
             # Don't keep trying to find stuff after we have returned something
             break
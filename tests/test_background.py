@@ -0,0 +1,27 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from hatch_pycharm._pycharm.background import launch_detached, run_in_background
+
+
+def test_launch_does_not_wait(tmp_path):
+    marker = tmp_path / "done"
+    start = time.monotonic()
+    proc = launch_detached([sys.executable, "-c", f"import time; time.sleep(1); open({str(marker)!r}, 'w')"])
+    assert time.monotonic() - start < 1
+    assert not marker.exists()
+    assert proc.wait(timeout=30) == 0
+    assert marker.exists()
+
+
+def test_background_errors_surface_on_result():
+    def fail():
+        raise subprocess.CalledProcessError(1, "pycharm")
+
+    task = run_in_background(fail)
+    with pytest.raises(subprocess.CalledProcessError):
+        task.result(timeout=30)
+    assert run_in_background(sum, [1, 2]).result(timeout=30) == 3
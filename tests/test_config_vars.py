@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from hatch_pycharm._pycharm.config_vars import PythonConfigVars
+
+from .conftest import ROOT
+
+DUMPS = sorted((ROOT / "example_config").glob("*.json"))
+
+
+@pytest.mark.parametrize("dump", DUMPS, ids=lambda p: p.stem)
+def test_matches_a_full_parse(dump):
+    expected = json.loads(dump.read_bytes())
+    config_vars = PythonConfigVars.from_file(dump)
+    assert list(config_vars.keys()) == list(expected)
+    for key, value in expected.items():
+        assert getattr(config_vars, key) == value
+
+
+def test_only_decodes_what_is_read():
+    config_vars = PythonConfigVars.from_json((ROOT / "example_config" / "macos_sys_config.json").read_bytes())
+    assert config_vars.VERSION == "3.10"
+    assert config_vars.prefix
+    assert set(config_vars._values) == {"VERSION", "prefix"}
+
+
+def test_missing_keys():
+    config_vars = PythonConfigVars.from_json(b'{"VERSION": "3.11"}')
+    assert "VERSION" in config_vars
+    assert "SOABI" not in config_vars
+    assert config_vars.get("SOABI", "nope") == "nope"
+    with pytest.raises(AttributeError):
+        config_vars.SOABI  # noqa: B018
+
+
+def test_keys_inside_values_are_not_keys():
+    data = json.dumps({"CFLAGS": 'a, "VERSION": "wrong"', "VERSION": "3.11", "EMPTY": "", "N": -1, "X": None})
+    config_vars = PythonConfigVars.from_json(data)
+    assert config_vars.VERSION == "3.11"
+    assert list(config_vars.keys()) == ["CFLAGS", "VERSION", "EMPTY", "N", "X"]
+    assert config_vars.as_dict() == json.loads(data)
+
+
+def test_nested_values_fall_back_to_a_full_parse():
+    config_vars = PythonConfigVars.from_json(b'{"LIST": [1, 2], "VERSION": "3.11"}')
+    assert config_vars.LIST == [1, 2]
+    assert config_vars.VERSION == "3.11"
+
+
+def test_kwargs_and_buffer_instances_compare_equal():
+    data = {"VERSION": "3.11", "prefix": "/usr"}
+    assert PythonConfigVars(**data) == PythonConfigVars.from_json(json.dumps(data))
@@ -0,0 +1,109 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from hatch_pycharm._pycharm import directory_diff
+from hatch_pycharm._pycharm.directory_diff import DirectoryDiff, diff_trees, open_directory_diff
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("HATCH_PYCHARM_CACHE_DIR", str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def launches(monkeypatch) -> list[list[str]]:
+    launched = []
+    monkeypatch.setattr(directory_diff, "launch_detached", lambda cmd: launched.append([str(arg) for arg in cmd]))
+    return launched
+
+
+def make_tree(root: Path, files: dict[str, bytes]) -> Path:
+    for rel, data in files.items():
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel).write_bytes(data)
+    return root
+
+
+@pytest.fixture
+def trees(tmp_path) -> tuple[Path, Path]:
+    common = {"same.py": b"x = 1\n", "pkg/same.py": b"y = 2\n", "empty.py": b"", ".git/HEAD": b"ref: main\n"}
+    left = make_tree(
+        tmp_path / "left",
+        {**common, "pkg/edited.py": b"a = 1\n", "resized.py": b"short", "gone.py": b"", "big.bin": b"a" * (2 << 20)},
+    )
+    right = make_tree(
+        tmp_path / "right",
+        {**common, "pkg/edited.py": b"a = 2\n", "resized.py": b"longer", "new.py": b"", "big.bin": b"a" * (2 << 20)},
+    )
+    return left, right
+
+
+def test_diff_trees(trees, monkeypatch):
+    left, right = trees
+    hashed = []
+    file_digest = directory_diff.file_digest
+
+    def recording(path, size):
+        hashed.append(path)
+        return file_digest(path, size)
+
+    monkeypatch.setattr(directory_diff, "file_digest", recording)
+
+    expected = DirectoryDiff(["pkg/edited.py", "resized.py"], ["gone.py"], ["new.py"], 4)
+    assert diff_trees(left, right, workers=4) == expected
+    # Files of different sizes and empty ones are never read, VCS metadata isn't even looked at
+    assert sorted(path.name for path in hashed) == sorted(["big.bin", "edited.py", "same.py", "same.py"] * 2)
+
+
+def test_large_files_hash_like_small_ones(tmp_path, monkeypatch):
+    path = tmp_path / "file"
+    path.write_bytes(os.urandom(4096))
+    small = directory_diff.file_digest(path, 4096)
+    monkeypatch.setattr(directory_diff, "MMAP_THRESHOLD", 1)
+    assert directory_diff.file_digest(path, 4096) == small
+
+
+def test_identical_trees_launch_nothing(tmp_path, launches):
+    left = make_tree(tmp_path / "left", {"a.py": b"a", "b/c.py": b"c"})
+    right = make_tree(tmp_path / "right", {"a.py": b"a", "b/c.py": b"c"})
+    assert not open_directory_diff(left, right, Path("pycharm"))
+    assert launches == []
+
+
+def test_one_changed_pair_is_a_file_diff(tmp_path, launches):
+    left = make_tree(tmp_path / "left", {"a.py": b"a", "b.py": b"b"})
+    right = make_tree(tmp_path / "right", {"a.py": b"a", "b.py": b"B"})
+    open_directory_diff(left, right, Path("pycharm"))
+    assert launches == [["pycharm", "diff", str(left / "b.py"), str(right / "b.py")]]
+
+
+def test_differing_files_open_in_one_session(trees, launches):
+    left, right = trees
+    open_directory_diff(left, right, Path("pycharm"))
+    ((_, command, staged_left, staged_right),) = launches
+    assert command == "diff"
+    staged_left, staged_right = Path(staged_left), Path(staged_right)
+    assert sorted(directory_diff.tree_files(staged_left)) == ["gone.py", "pkg/edited.py", "resized.py"]
+    assert sorted(directory_diff.tree_files(staged_right)) == ["new.py", "pkg/edited.py", "resized.py"]
+    # Edits in the session land in the original
+    assert (staged_right / "pkg" / "edited.py").resolve() == (right / "pkg" / "edited.py").resolve()
+
+
+def test_without_symlinks_each_pair_opens_alone(trees, launches, monkeypatch):
+    left, right = trees
+
+    def no_symlinks(*args):
+        raise OSError("A required privilege is not held by the client")
+
+    monkeypatch.setattr(Path, "symlink_to", no_symlinks)
+    open_directory_diff(left, right, Path("pycharm"))
+    empty = str(directory_diff._placeholder())
+    assert [cmd[2:] for cmd in launches] == [
+        [str(left / "pkg/edited.py"), str(right / "pkg/edited.py")],
+        [str(left / "resized.py"), str(right / "resized.py")],
+        [str(left / "gone.py"), empty],
+        [empty, str(right / "new.py")],
+    ]
+    assert Path(empty).read_bytes() == b""
@@ -0,0 +1,80 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from hatch_pycharm._pycharm import discovery, platform_paths
+
+
+def make_install(home: Path, build: str) -> Path:
+    exe, build_file = platform_paths.install_layout(home)
+    exe.parent.mkdir(parents=True)
+    exe.write_text("")
+    build_file.parent.mkdir(parents=True, exist_ok=True)
+    build_file.write_text(build)
+    return exe
+
+
+@pytest.fixture()
+def fake_machine(tmp_path, monkeypatch):
+    apps = tmp_path / "apps"
+    config_root = tmp_path / "config"
+    config_root.mkdir()
+    monkeypatch.setenv("HATCH_PYCHARM_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(discovery, "install_search_patterns", lambda: [(apps, ("PyCharm-[PC]", "ch-*", "*"))])
+    monkeypatch.setattr(discovery, "config_search_root", lambda: config_root)
+    for name in ("PyCharm2023.1", "PyCharmCE2023.2", "IntelliJIdea2023.2"):
+        (config_root / name).mkdir()
+    return apps, config_root
+
+
+def test_parse_build_number():
+    assert discovery.parse_build_number("PY-232.8660.197\n") == (232, 8660, 197)
+    assert discovery.parse_build_number("PC-231.9011") == (231, 9011, 0)
+    assert discovery.parse_build_number("PY-SNAPSHOT") is None
+
+
+def test_config_dir_build_matches_branch():
+    assert discovery.config_dir_build("PyCharm2023.2") == (232, 0, 0)
+    assert discovery.config_dir_build("PyCharmCE2022.3") == (223, 0, 0)
+    assert discovery.config_dir_build("WebStorm2023.2") is None
+
+
+def test_ranks_newest_first(fake_machine):
+    apps, config_root = fake_machine
+    old = make_install(apps / "PyCharm-P" / "ch-0" / "231.9011.38", "PY-231.9011.38")
+    new = make_install(apps / "PyCharm-C" / "ch-0" / "232.8660.197", "PC-232.8660.197")
+
+    found = discovery.discover()
+
+    assert found.installs == [((232, 8660, 197), new), ((231, 9011, 38), old)]
+    assert found.config_dirs == [
+        ((232, 0, 0), config_root / "PyCharmCE2023.2"),
+        ((231, 0, 0), config_root / "PyCharm2023.1"),
+    ]
+
+
+def test_warm_index_skips_the_scan(fake_machine, monkeypatch):
+    apps, _ = fake_machine
+    make_install(apps / "PyCharm-P" / "ch-0" / "232.8660.197", "PY-232.8660.197")
+    cold = discovery.discover()
+
+    def no_scan():
+        pytest.fail("The index was fresh, nothing should have been scanned")
+
+    monkeypatch.setattr(discovery, "scan", no_scan)
+    assert discovery.discover() == cold
+
+
+def test_new_build_invalidates_index(fake_machine):
+    apps, _ = fake_machine
+    channel = apps / "PyCharm-P" / "ch-0"
+    make_install(channel / "231.9011.38", "PY-231.9011.38")
+    assert len(discovery.discover().installs) == 1
+
+    new = make_install(channel / "232.8660.197", "PY-232.8660.197")
+    # Some filesystems have coarse mtimes, make sure the channel directory visibly changed
+    stat = channel.stat()
+    os.utime(channel, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert discovery.discover().installs[0] == ((232, 8660, 197), new)
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+from hatch_pycharm._pycharm import env_state, interpreter
+
+
+def test_unchanged_env_is_current(fake_pycharm, tmp_path):
+    env = tmp_path / "env"
+    current = env_state.fingerprint(Path(sys.executable), "deps-1")
+    assert not env_state.is_current(env, current)
+
+    env_state.record(env, current)
+    assert env_state.is_current(env, env_state.fingerprint(Path(sys.executable), "deps-1"))
+    assert not env_state.is_current(env, env_state.fingerprint(Path(sys.executable), "deps-2"))
+
+    env_state.forget(env)
+    assert not env_state.is_current(env, current)
+
+
+def test_changed_sys_path_is_not_current(fake_pycharm, tmp_path, monkeypatch):
+    env = tmp_path / "env"
+    env_state.record(env, env_state.fingerprint(Path(sys.executable), "deps"))
+    site = tmp_path / "site"
+    site.mkdir()
+    monkeypatch.setenv("PYTHONPATH", str(site))
+    interpreter.probe(Path(sys.executable), refresh=True)
+    assert not env_state.is_current(env, env_state.fingerprint(Path(sys.executable), "deps"))
+
+
+def test_removed_sdk_or_model_is_not_current(fake_pycharm, tmp_path):
+    from hatch_pycharm._pycharm import settings, transaction
+    from hatch_pycharm._pycharm.project_model import idea_dir, write_project_model
+
+    env, project, exe = tmp_path / "env", tmp_path / "project", Path(sys.executable)
+    project.mkdir()
+    payload = (
+        f'<jdk version="2"><name value="env" /><homePath value="{exe}" />'
+        f'<additional ASSOCIATED_PROJECT_PATH="{project}" SDK_UUID="uuid" /></jdk>'
+    )
+    transaction.submit(settings.jdk_tools_xml, [transaction.Upsert(str(project), str(exe), payload, "uuid")])
+    write_project_model(project, "env")
+    current = env_state.fingerprint(exe, "deps", project)
+    assert current["registered"] and all(current["model"])
+    env_state.record(env, current)
+    assert env_state.is_current(env, env_state.fingerprint(exe, "deps", project))
+
+    (idea_dir(project) / "misc.xml").unlink()
+    assert not env_state.is_current(env, env_state.fingerprint(exe, "deps", project))
+    write_project_model(project, "env")
+    assert env_state.is_current(env, env_state.fingerprint(exe, "deps", project))
+
+    # Removed in the IDE, which rewrites the table without it
+    settings.jdk_tools_xml.write_text('<application><component name="ProjectJdkTable" /></application>')
+    assert not env_state.is_current(env, env_state.fingerprint(exe, "deps", project))
@@ -0,0 +1,81 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from hatch_pycharm._pycharm import formatting
+
+FORMATTER = """\
+#!{python}
+import os, sys
+args = sys.argv[2:]
+flags = {{"-mask", "-settings", "-charset"}}
+files = [a for i, a in enumerate(args) if not a.startswith("-") and args[i - 1] not in flags]
+with open(os.environ["PYCHARM_PROPERTIES"] + ".log", "a") as log:
+    log.write(f"{{len(files)}}\\n")
+dry = "-dry" in args
+for f in files:
+    verdict = "Needs reformatting" if dry and "bad" in f else "OK"
+    print(f"{{'Checking' if dry else 'Formatting'}} {{f}}...{{verdict}}")
+sys.exit(3 if dry and any("bad" in f for f in files) else 0)
+"""
+
+
+@pytest.fixture
+def formatter(tmp_path) -> Path:
+    exe = tmp_path / "pycharm.sh"
+    exe.write_text(FORMATTER.format(python=sys.executable))
+    exe.chmod(0o755)
+    return exe
+
+
+@pytest.fixture
+def tree(tmp_path) -> Path:
+    root = tmp_path / "tree"
+    for n in range(40):
+        (root / f"pkg{n % 4}").mkdir(parents=True, exist_ok=True)
+        (root / f"pkg{n % 4}" / f"mod{n}.py").write_text("")
+    (root / "pkg0" / "notes.txt").write_text("")
+    (root / "pkg1" / "bad.py").write_text("")
+    return root
+
+
+def test_shards_respect_the_argv_limit():
+    files = [Path(f"{n:0100}") for n in range(50)]
+    shards = formatting.shard(files, base_size=200, limit=200 + 5 * formatting.arg_size(str(files[0])))
+    assert [len(s) for s in shards] == [5] * 10
+    assert [f for s in shards for f in s] == files
+
+
+def test_small_trees_still_fill_the_pool():
+    shards = formatting.shard([Path(str(n)) for n in range(10)], base_size=0, shards=4)
+    assert [len(s) for s in shards] == [3, 3, 3, 1]
+
+
+def test_expand_honours_masks_and_recursion(tree):
+    assert len(list(formatting.expand_paths([tree], ["*.py"], recursive=True))) == 41
+    assert list(formatting.expand_paths([tree], ["*.py"])) == []
+    assert (tree / "pkg0" / "notes.txt") in formatting.expand_paths([tree / "pkg0"])
+
+
+def test_sharded_run_merges_into_one_report(formatter, tree, tmp_path):
+    slots = tmp_path / "slots"
+    report = formatting.format_files(formatter, tree, masks=["*.py"], recursive=True, workers=3, slots_dir=slots)
+    assert report.returncode == 0
+    assert len(report.shards) == 3
+    assert len(report.statuses()) == 41
+    assert set(report.statuses().values()) == {"OK"}
+
+    # Every slot got its own config and system directories, and between them formatted everything once
+    properties = sorted(slots.glob("*/idea.properties"))
+    assert len(properties) == 3
+    assert f"idea.system.path={(properties[0].parent / 'system').as_posix()}" in properties[0].read_text()
+    counts = [int(n) for p in properties if os.path.exists(f"{p}.log") for n in Path(f"{p}.log").read_text().split()]
+    assert sum(counts) == 41
+
+
+def test_dry_run_failures_surface(formatter, tree):
+    report = formatting.format_files(formatter, tree, masks=["*.py"], recursive=True, dry=True, workers=2)
+    assert report.returncode == 3
+    assert report.needs_reformatting == [str(tree / "pkg1" / "bad.py")]
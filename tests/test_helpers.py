@@ -0,0 +1,49 @@
+import pytest
+
+from hatch_pycharm._pycharm import helpers
+
+
+@pytest.fixture()
+def helpers_dir(fake_pycharm):
+    return fake_pycharm / "plugins" / "python" / "helpers"
+
+
+@pytest.fixture()
+def listings(monkeypatch) -> list:
+    calls = []
+    original = helpers.list_helper_roots
+
+    def list_helper_roots(helpers_dir):
+        calls.append(helpers_dir)
+        return original(helpers_dir)
+
+    monkeypatch.setattr(helpers, "list_helper_roots", list_helper_roots)
+    return calls
+
+
+def test_manifest_is_listed_once_per_build(helpers_dir, listings):
+    first = helpers.helper_manifest((232, 8660, 197), helpers_dir)
+    assert first.urls == [
+        "file://$APPLICATION_HOME_DIR$/plugins/python/helpers/python-skeletons",
+        "file://$APPLICATION_HOME_DIR$/plugins/python/helpers/typeshed/stdlib",
+        "file://$APPLICATION_HOME_DIR$/plugins/python/helpers/typeshed/stubs/six",
+        "file://$APPLICATION_HOME_DIR$/plugins/python/helpers/typeshed/stubs/requests",
+    ]
+    assert helpers.helper_manifest((232, 8660, 197), helpers_dir) == first
+    assert len(listings) == 1
+
+    helpers.helper_manifest((233, 11799, 259), helpers_dir)
+    assert len(listings) == 2
+
+
+def test_fragment_renders_every_url(helpers_dir):
+    manifest = helpers.helper_manifest(None, helpers_dir)
+    assert manifest.fragment.count("<root ") == len(manifest.urls)
+    assert manifest.fragment.startswith(" " * 12 + '<root url="file://$APPLICATION_HOME_DIR$/')
+
+
+def test_escape_matches_elementtree():
+    from xml.etree.ElementTree import Element, tostring
+
+    value = 'a&b<c>"d"\te\nf\r'
+    assert tostring(Element("x", v=value)).decode() == f'<x v="{helpers.escape_attrib(value)}" />'
@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from hatch_pycharm._pycharm import inspection_output
+from hatch_pycharm._pycharm.inspection_output import Finding, Summary, at_least, read_output
+
+EXPECTED = [
+    Finding("PyUnresolvedReferences", "src/a.py", 3, "WARNING", "Unresolved reference 'ö'"),
+    Finding("PyUnresolvedReferences", "src/b.py", 7, "ERROR", "Unresolved reference 'x'"),
+    Finding("SpellCheckingInspection", "src/a.py", 1, "TYPO", "Typo: In word 'hatchy'"),
+]
+
+
+def xml_problem(f: Finding) -> str:
+    return (
+        f"<problem><file>file://$PROJECT_DIR$/{f.file}</file><line>{f.line}</line><module>app</module>"
+        f'<problem_class id="{f.inspection}" severity="{f.severity}">x</problem_class>'
+        f"<description>{f.description}</description></problem>"
+    )
+
+
+def json_problem(f: Finding) -> dict:
+    return {
+        "problem_class": {"id": f.inspection, "severity": f.severity, "name": "x"},
+        "file": f"file://$PROJECT_DIR$/{f.file}",
+        "line": f.line,
+        "description": f.description,
+        "entry_point": {"TYPE": "file", "FQNAME": f.file},
+    }
+
+
+def write_reports(output: Path, suffix: str, render) -> None:
+    output.mkdir()
+    for name in ("PyUnresolvedReferences", "SpellCheckingInspection"):
+        render(output / f"{name}{suffix}", [f for f in EXPECTED if f.inspection == name])
+
+
+@pytest.fixture
+def xml_output(tmp_path) -> Path:
+    def render(path, found):
+        path.write_text("<problems>" + "".join(map(xml_problem, found)) + "</problems>", encoding="utf-8")
+
+    write_reports(tmp_path / "out", ".xml", render)
+    (tmp_path / "out" / ".descriptions.xml").write_text("<inspections/>")
+    return tmp_path / "out"
+
+
+@pytest.fixture
+def json_output(tmp_path) -> Path:
+    def render(path, found):
+        path.write_text(json.dumps({"version": "3", "problems": [json_problem(f) for f in found]}), encoding="utf-8")
+
+    write_reports(tmp_path / "out", ".json", render)
+    return tmp_path / "out"
+
+
+@pytest.fixture
+def plain_output(tmp_path) -> Path:
+    def render(path, found):
+        lines = [f"{f.file}:{f.line}:5: {f.severity}: {f.description}" for f in found]
+        path.write_text("Inspection results\n" + "\n".join(lines) + "\n", encoding="utf-8")
+
+    write_reports(tmp_path / "out", ".txt", render)
+    return tmp_path / "out"
+
+
+def test_xml(xml_output):
+    assert list(read_output(xml_output, "xml")) == EXPECTED
+
+
+def test_json(json_output):
+    assert list(read_output(json_output, "json")) == EXPECTED
+
+
+def test_plain(plain_output):
+    assert list(read_output(plain_output, "plain")) == EXPECTED
+
+
+def test_json_is_read_in_chunks(json_output, monkeypatch):
+    # Small enough that every problem, and the ö in the middle of one, gets split across reads
+    monkeypatch.setattr(inspection_output, "CHUNK", 7)
+    assert list(read_output(json_output, "json")) == EXPECTED
+
+
+def test_truncated_json(tmp_path):
+    report = tmp_path / "Broken.json"
+    report.write_text(json.dumps({"problems": [json_problem(EXPECTED[0])] * 2})[:-40])
+    with pytest.raises(ValueError, match="Truncated"):
+        list(inspection_output.read_json(report))
+
+
+def test_summary_and_threshold(xml_output):
+    summary = Summary.of(read_output(xml_output))
+    assert summary.total == 3
+    assert summary.count("WARNING") == 2
+    assert summary.count("ERROR") == 1
+    assert summary.top_inspections(1) == [("PyUnresolvedReferences", 2)]
+    assert summary.top_files(1) == [("src/a.py", 2)]
+    assert [f.line for f in at_least(read_output(xml_output), "weak_warning")] == [3, 7, 1]
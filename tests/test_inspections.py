@@ -0,0 +1,140 @@
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+from hatch_pycharm._pycharm import inspections
+
+BUILD = (232, 8660, 197)
+INSPECTOR = """\
+#!{python}
+import json, os, sys
+from pathlib import Path
+project, profile, output = map(Path, sys.argv[2:5])
+scope = Path(sys.argv[sys.argv.index("-d") + 1]) if "-d" in sys.argv else project
+with open(os.environ["INSPECT_LOG"], "a") as log:
+    log.write(json.dumps(scope.relative_to(project).as_posix()) + "\\n")
+problems = []
+for path in sorted(scope.rglob("*.py")):
+    for n, line in enumerate(path.read_text().splitlines(), 1):
+        if "bad" in line:
+            rel = path.relative_to(project).as_posix()
+            problems.append(
+                f"<problem><file>file://$PROJECT_DIR$/{{rel}}</file><line>{{n}}</line>"
+                f'<problem_class id="PyBad" severity="WARNING">Bad</problem_class>'
+                f"<description>{{line}}</description></problem>"
+            )
+if scope == project and os.environ.get("PROJECT_PROBLEM"):
+    problems.append('<problem><problem_class id="PyBad" severity="WARNING">Bad</problem_class>'
+                    '<description>project</description></problem>')
+(output / "PyBad.xml").write_text("<problems>" + "".join(problems) + "</problems>")
+(output / ".descriptions.xml").write_text("<inspections/>")
+"""
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("HATCH_PYCHARM_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("INSPECT_LOG", str(tmp_path / "inspect.log"))
+
+
+@pytest.fixture
+def inspector(tmp_path) -> Path:
+    exe = tmp_path / "pycharm.sh"
+    exe.write_text(INSPECTOR.format(python=sys.executable))
+    exe.chmod(0o755)
+    return exe
+
+
+@pytest.fixture
+def project(tmp_path) -> Path:
+    root = tmp_path / "project"
+    for pkg in ("a", "b", "c/d", "c/e"):
+        (root / "src" / pkg).mkdir(parents=True)
+        (root / "src" / pkg / "mod.py").write_text("fine\nbad\n")
+    (root / ".idea").mkdir()
+    (root / ".idea" / "misc.xml").write_text("<project/>")
+    return root
+
+
+@pytest.fixture
+def profile(tmp_path) -> Path:
+    path = tmp_path / "profile.xml"
+    path.write_text("<profile/>")
+    return path
+
+
+def runs(tmp_path) -> list[str]:
+    return [json.loads(line) for line in (tmp_path / "inspect.log").read_text().splitlines()]
+
+
+def inspect(project, profile, inspector, **kwargs):
+    return inspections.inspect_incremental(project, profile, pycharm=inspector, build=BUILD, **kwargs)
+
+
+def test_covering_dirs():
+    assert inspections.covering_dirs(["src/a/x.py", "src/a/y/z.py", "src/b/x.py"]) == ["src/a", "src/b"]
+    files = ["src/a/x.py", "src/b/x.py", "src/c/d/x.py", "src/c/e/x.py", "tests/x.py"]
+    assert inspections.covering_dirs(files, max_runs=4) == ["src/a", "src/b", "src/c", "tests"]
+    assert inspections.covering_dirs(files, max_runs=2) == ["src", "tests"]
+    assert inspections.covering_dirs(["setup.py"]) == ["."]
+
+
+def test_only_changes_are_inspected(project, profile, inspector, tmp_path):
+    cold = inspect(project, profile, inspector)
+    assert cold.scopes == ["."]
+    assert [f.file for f in cold.findings] == [f"src/{pkg}/mod.py" for pkg in ("a", "b", "c/d", "c/e")]
+
+    warm = inspect(project, profile, inspector)
+    assert warm == (cold.findings, [])
+
+    (project / "src" / "c" / "e" / "mod.py").write_text("bad\nfine\nbad\n")
+    # Touched but unchanged costs a hash, not a run
+    (project / "src" / "a" / "mod.py").touch()
+    changed = inspect(project, profile, inspector)
+    assert changed.scopes == ["src/c/e"]
+    assert [(f.file, f.line) for f in changed.findings][-3:] == [
+        ("src/c/d/mod.py", 2),
+        ("src/c/e/mod.py", 1),
+        ("src/c/e/mod.py", 3),
+    ]
+    assert runs(tmp_path) == [".", "src/c/e"]
+
+
+def test_deleted_files_drop_their_findings(project, profile, inspector):
+    inspect(project, profile, inspector)
+    (project / "src" / "b" / "mod.py").unlink()
+    result = inspect(project, profile, inspector)
+    assert result.scopes == ["src/b"]
+    assert "src/b/mod.py" not in {f.file for f in result.findings}
+
+
+def test_deleted_directories_are_not_a_scope(project, profile, inspector, tmp_path):
+    inspect(project, profile, inspector)
+    shutil.rmtree(project / "src" / "c" / "d")
+    result = inspect(project, profile, inspector)
+    assert result.scopes == ["src/c"]
+    assert "src/c/d/mod.py" not in {f.file for f in result.findings}
+    shutil.rmtree(project / "src")
+    assert inspect(project, profile, inspector) == ([], ["."])
+    assert runs(tmp_path) == [".", "src/c", "."]
+
+
+def test_project_level_findings_are_kept(project, profile, inspector, monkeypatch):
+    monkeypatch.setenv("PROJECT_PROBLEM", "1")
+    cold = inspect(project, profile, inspector)
+    assert cold.findings[0].file == "" and cold.findings[0].description == "project"
+    (project / "src" / "a" / "mod.py").write_text("fine\n")
+    warm = inspect(project, profile, inspector)
+    assert warm.scopes == ["src/a"]
+    assert [f.file for f in warm.findings] == ["", "src/b/mod.py", "src/c/d/mod.py", "src/c/e/mod.py"]
+
+
+def test_new_profile_or_build_starts_over(project, profile, inspector, tmp_path):
+    inspect(project, profile, inspector)
+    profile.write_text("<profile strict='true'/>")
+    assert inspect(project, profile, inspector).scopes == ["."]
+    assert inspections.inspect_incremental(project, profile, pycharm=inspector, build=(233, 0, 0)).scopes == ["."]
+    assert runs(tmp_path) == [".", ".", "."]
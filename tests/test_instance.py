@@ -0,0 +1,107 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from hatch_pycharm._pycharm import FileRef
+from hatch_pycharm._pycharm import instance as ide
+
+
+class StandInIDE(ThreadingHTTPServer):
+    def __init__(self, product="PyCharm"):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.product = product
+        self.opened: list[dict] = []
+        self.connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # noqa: N802
+        url = urlsplit(self.path)
+        if url.path == "/api/about":
+            body = json.dumps({"name": f"{self.server.product} 2023.2", "productName": self.server.product}).encode()
+        elif url.path == "/api/file":
+            self.server.opened.append({k: v[0] for k, v in parse_qs(url.query).items()})
+            body = b""
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def stand_in(monkeypatch):
+    server = StandInIDE()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("HATCH_PYCHARM_PORT", str(server.server_address[1]))
+    yield server
+    for instance in ide._instances.values():
+        instance.close()
+    ide._instances.clear()
+    server.shutdown()
+    server.server_close()
+
+
+def test_batch_shares_one_connection(stand_in, tmp_path):
+    files = [FileRef(tmp_path / "a.py", 3, 7), tmp_path / "b.py", FileRef(tmp_path / "c.py", 10)]
+
+    assert ide.open_in_running_instance(*files) == []
+    assert ide.open_in_running_instance(tmp_path / "d.py") == []
+
+    assert stand_in.opened == [
+        {"file": str(tmp_path / "a.py"), "line": "3", "column": "7"},
+        {"file": str(tmp_path / "b.py")},
+        {"file": str(tmp_path / "c.py"), "line": "10"},
+        {"file": str(tmp_path / "d.py")},
+    ]
+    assert stand_in.connections == 1
+
+
+def test_projects_are_left_for_the_launcher(stand_in, tmp_path):
+    assert ide.open_in_running_instance(tmp_path) == [FileRef(tmp_path)]
+    assert ide.open_in_running_instance(tmp_path / "a.py", tmp_path) == [FileRef(tmp_path)]
+    assert stand_in.opened == [{"file": str(tmp_path / "a.py")}]
+
+
+def test_refused_file_and_the_rest_are_left(stand_in, tmp_path, monkeypatch):
+    get = ide.RunningInstance.get
+
+    def refuse_b(self, path):
+        return (404, b"") if "b.py" in path else get(self, path)
+
+    monkeypatch.setattr(ide.RunningInstance, "get", refuse_b)
+    files = [tmp_path / "a.py", tmp_path / "b.py", tmp_path / "c.py"]
+    assert ide.open_in_running_instance(*files) == [FileRef(tmp_path / "b.py"), FileRef(tmp_path / "c.py")]
+    assert stand_in.opened == [{"file": str(tmp_path / "a.py")}]
+
+
+def test_other_products_are_ignored(stand_in):
+    stand_in.product = "IntelliJ IDEA"
+    assert ide.find_instance() is None
+    assert ide.open_in_running_instance(Path("a.py")) == [FileRef(Path("a.py"))]
+    assert stand_in.opened == []
+
+
+def test_nothing_listening(monkeypatch):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    monkeypatch.setenv("HATCH_PYCHARM_PORT", str(port))
+    assert ide.open_in_running_instance(Path("a.py")) == [FileRef(Path("a.py"))]
@@ -0,0 +1,101 @@
+import os
+import sys
+import sysconfig
+from pathlib import Path
+
+import pytest
+
+from hatch_pycharm._pycharm import interpreter
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("HATCH_PYCHARM_CACHE_DIR", str(tmp_path / "cache"))
+
+
+@pytest.fixture()
+def probes(monkeypatch) -> list[Path]:
+    calls = []
+    original = interpreter.run_probe
+
+    def run_probe(exe):
+        calls.append(exe)
+        return original(exe)
+
+    monkeypatch.setattr(interpreter, "run_probe", run_probe)
+    return calls
+
+
+def test_one_probe_has_everything(probes):
+    info = interpreter.probe(Path(sys.executable))
+    assert info.version == sys.version_info[:3]
+    assert info.config_vars.VERSION == sysconfig.get_config_var("VERSION")
+    assert set(sys.path[1:]) <= set(info.sys_path)
+    assert len(probes) == 1
+
+
+def test_warm_probe_runs_nothing(probes):
+    cold = interpreter.probe(Path(sys.executable))
+    assert interpreter.probe(Path(sys.executable)) == cold
+    assert len(probes) == 1
+
+
+def test_changed_sys_path_dir_reprobes(probes, tmp_path, monkeypatch):
+    site = tmp_path / "site"
+    site.mkdir()
+    monkeypatch.setenv("PYTHONPATH", str(site))
+    interpreter.probe(Path(sys.executable))
+
+    stat = site.stat()
+    os.utime(site, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    interpreter.probe(Path(sys.executable))
+    assert len(probes) == 2
+
+
+def test_another_path_to_the_same_binary_is_probed_apart(probes, tmp_path):
+    link = tmp_path / "python"
+    link.symlink_to(sys.executable)
+    interpreter.probe(Path(sys.executable))
+    # Same binary, but a different path is a different environment
+    assert interpreter.probe(link).executable == str(link)
+    assert len(probes) == 2
+
+
+@pytest.fixture()
+def path_dirs(tmp_path, monkeypatch) -> tuple[Path, Path]:
+    first, second = tmp_path / "bin1", tmp_path / "bin2"
+    for directory, versions in ((first, ("3.11", "3.9")), (second, ("3.11", "3.12"))):
+        directory.mkdir()
+        for version in versions:
+            exe = directory / f"python{version}"
+            exe.write_text("")
+            exe.chmod(0o755)
+    (first / "python3.10-config").write_text("")
+    monkeypatch.setenv("PATH", os.pathsep.join(map(str, (first, second))))
+    return first, second
+
+
+def test_find_on_path(path_dirs):
+    first, second = path_dirs
+    assert interpreter.find_on_path() == {
+        "3.9": first / "python3.9",
+        "3.11": first / "python3.11",
+        "3.12": second / "python3.12",
+    }
+
+
+def test_find_on_path_is_cached_until_a_dir_changes(path_dirs, monkeypatch):
+    scans = []
+    original = interpreter.scan_path
+    monkeypatch.setattr(interpreter, "scan_path", lambda dirs: scans.append(dirs) or original(dirs))
+    interpreter.find_on_path()
+    interpreter.find_on_path()
+    assert len(scans) == 1
+
+    exe = path_dirs[1] / "python3.13"
+    exe.write_text("")
+    exe.chmod(0o755)
+    stat = path_dirs[1].stat()
+    os.utime(path_dirs[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert "3.13" in interpreter.find_on_path()
+    assert len(scans) == 2
@@ -0,0 +1,121 @@
+import os
+from pathlib import Path
+from xml.etree.ElementTree import Element, SubElement, fromstring
+
+import pytest
+
+from hatch_pycharm._pycharm import jdk_index, jdk_table
+from hatch_pycharm._pycharm.jdk_index import JdkIndex
+
+WIN_PROJECT = "$USER_HOME$/PycharmProjects/hatch-pycharm"
+WIN_EXE = r"C:\Users\ANYONE\PycharmProjects\hatch-pycharm\.hatch\hatch-pycharm\Scripts\python.exe"
+MAC_EXE = "/opt/homebrew/bin/python3.10"
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("HATCH_PYCHARM_CACHE_DIR", str(tmp_path / "cache"))
+
+
+@pytest.fixture()
+def no_scan(monkeypatch):
+    def scan(*args):
+        pytest.fail("The index was fresh, the table should not have been scanned")
+
+    monkeypatch.setattr(jdk_table, "scan", scan)
+
+
+def make_jdk(name: str, project: str, exe: str) -> Element:
+    jdk = Element("jdk", version="2")
+    SubElement(jdk, "name", value=name)
+    SubElement(jdk, "homePath", value=exe)
+    SubElement(jdk, "additional", ASSOCIATED_PROJECT_PATH=project, SDK_UUID=f"uuid-{name}")
+    return jdk
+
+
+def names(table: Path) -> list[str]:
+    return [jdk.find("name").get("value") for jdk in fromstring(table.read_bytes()).iter("jdk")]
+
+
+def test_lookup(jdk_table_file):
+    index = JdkIndex.load(jdk_table_file)
+    assert len(index.entries) == 3
+    assert index.find(WIN_PROJECT, WIN_EXE).find("homePath").get("value") == WIN_EXE
+    assert index.find(Path.home() / "PycharmProjects" / "hatch-pycharm", WIN_EXE) is not None
+    assert index.find(WIN_PROJECT, MAC_EXE) is None
+    assert index.lookup(uuid="4fb7ff48-a5da-4749-b9d6-78a2216db89d").start > index.lookup(WIN_PROJECT, WIN_EXE).start
+
+
+@pytest.fixture()
+def warm(jdk_table_file):
+    JdkIndex.load(jdk_table_file)
+    return jdk_table_file
+
+
+def test_warm_load_does_not_scan(warm, no_scan):
+    assert JdkIndex.load(warm).find(WIN_PROJECT, WIN_EXE) is not None
+
+
+def test_upserts_keep_offsets_valid(warm, no_scan):
+    index = JdkIndex.load(warm)
+    assert index.upsert(WIN_PROJECT, WIN_EXE, lambda old: make_jdk("win", WIN_PROJECT, WIN_EXE))
+    assert not index.upsert("/somewhere/else", MAC_EXE, lambda old: make_jdk("new", "/somewhere/else", MAC_EXE))
+
+    reloaded = JdkIndex.load(warm)
+    assert [index.read(entry).find("name").get("value") for entry in reloaded.entries] == names(warm)
+    assert names(warm)[1:] == ["win", names(warm)[2], "new"]
+    assert reloaded.find("/somewhere/else", MAC_EXE) is not None
+
+
+def test_foreign_edit_rebuilds(warm):
+    warm.write_text(warm.read_text().replace("Python 3.10", "Python 3.10 renamed and longer"))
+    index = JdkIndex.load(warm)
+    assert index.read(index.lookup("$USER_HOME$/git/test-project", MAC_EXE)).find("name").get("value") == (
+        "Python 3.10 renamed and longer"
+    )
+
+
+def test_same_size_edit_is_caught_by_digest(warm):
+    index = JdkIndex.load(warm)
+    stat = warm.stat()
+    warm.write_text(warm.read_text().replace("Python 3.10.10", "Python 3.10.11"))
+    # Pretend the edit landed within the same mtime tick
+    os.utime(warm, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert index.find("$USER_HOME$/git/test-project", MAC_EXE).find("version").get("value") == "Python 3.10.11"
+
+
+def test_missing_table(tmp_path):
+    table = tmp_path / "jdk.table.xml"
+    index = JdkIndex.load(table)
+    assert index.entries == []
+    assert not index.upsert("/p", "/p/python", lambda old: make_jdk("new", "/p", "/p/python"))
+    assert names(table) == ["new"]
+    assert jdk_index.JdkIndex.load(table).find("/p", "/p/python") is not None
+
+
+def test_batch_is_one_rewrite(warm, no_scan, monkeypatch):
+    index = JdkIndex.load(warm)
+    before = names(warm)
+    rewrites = []
+    splice_many = jdk_table.splice_many
+    monkeypatch.setattr(jdk_table, "splice_many", lambda *args: rewrites.append(splice_many(*args)))
+    replaced = index.upsert_many(
+        [
+            ("$USER_HOME$/git/test-project", MAC_EXE, lambda old: make_jdk("mac, renamed at length", "x", MAC_EXE)),
+            ("/a", "/a/python", lambda old: make_jdk("a", "/a", "/a/python")),
+            (WIN_PROJECT, WIN_EXE, lambda old: make_jdk("w", WIN_PROJECT, WIN_EXE)),
+            ("/b", "/b/python", lambda old: make_jdk("b", "/b", "/b/python")),
+            # The last upsert for an SDK wins
+            ("/a", "/a/python", lambda old: make_jdk("a again", "/a", "/a/python")),
+        ]
+    )
+    assert replaced == [True, False, True, False, False]
+    assert len(rewrites) == 1
+    assert names(warm) == ["mac, renamed at length", "w", before[2], "a again", "b"]
+
+    reloaded = JdkIndex.load(warm)
+    assert [reloaded.read(entry).find("name").get("value") for entry in reloaded.entries] == names(warm)
+    assert reloaded.find("/b", "/b/python") is not None
+    # And the index still appends in the right place afterwards
+    assert not reloaded.upsert("/c", "/c/python", lambda old: make_jdk("c", "/c", "/c/python"))
+    assert names(warm)[-1] == "c"
@@ -0,0 +1,83 @@
+from xml.etree.ElementTree import Element, SubElement, fromstring
+
+import pytest
+
+from hatch_pycharm._pycharm import jdk_table
+
+
+@pytest.fixture()
+def table(jdk_table_file):
+    return jdk_table_file
+
+
+def named(name):
+    return lambda jdk: jdk.find("name").get("value") == name
+
+
+def make_jdk(name: str) -> Element:
+    jdk = Element("jdk", version="2")
+    SubElement(jdk, "name", value=name)
+    return jdk
+
+
+def test_find(table):
+    found = jdk_table.find_jdk(table, named("Python 3.10"))
+    assert found.find("homePath").get("value") == "/opt/homebrew/bin/python3.10"
+    assert len(found.findall(".//root[@url]")) == 128
+    assert jdk_table.find_jdk(table, named("nope")) is None
+
+
+def test_replace_leaves_other_bytes_alone(table):
+    before = table.read_bytes()
+    old_first, old_rest = before.split(b"</jdk>", 1)
+    seen = []
+
+    def build(old):
+        seen.append(old.find("name").get("value"))
+        return make_jdk("replaced")
+
+    assert jdk_table.upsert_jdk(table, named("Python 3.10"), build)
+
+    after = table.read_bytes()
+    assert seen == ["Python 3.10"]
+    assert after.startswith(b'<application>\n  <component name="ProjectJdkTable">\n    <jdk version="2">\n      <name')
+    assert after.endswith(old_rest)
+    assert [j.find("name").get("value") for j in fromstring(after).iter("jdk")][0] == "replaced"
+
+
+def test_insert_before_component_end(table):
+    before = table.read_bytes()
+    assert not jdk_table.upsert_jdk(table, named("nope"), lambda old: make_jdk("new"))
+
+    after = table.read_bytes()
+    head = before[: before.rindex(b"</component>")]
+    assert after.startswith(head)
+    assert after[len(head) :] == (
+        b'  <jdk version="2">\n      <name value="new" />\n    </jdk>\n  </component>\n</application>'
+    )
+    assert len(fromstring(after).findall(".//jdk")) == 4
+
+
+def test_missing_table_is_created(tmp_path):
+    table = tmp_path / "options" / "jdk.table.xml"
+    jdk_table.upsert_jdk(table, named("nope"), lambda old: make_jdk("new"))
+    assert jdk_table.find_jdk(table, named("new")) is not None
+
+
+def test_empty_component(tmp_path):
+    table = tmp_path / "jdk.table.xml"
+    table.write_text('<application>\n  <component name="ProjectJdkTable" />\n</application>')
+    jdk_table.upsert_jdk(table, named("nope"), lambda old: make_jdk("new"))
+    assert jdk_table.find_jdk(table, named("new")) is not None
+
+
+def test_failed_build_keeps_table(table):
+    before = table.read_bytes()
+
+    def build(old):
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        jdk_table.upsert_jdk(table, named("Python 3.10"), build)
+    assert table.read_bytes() == before
+    assert list(table.parent.iterdir()) == [table]
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import pytest
+
+from hatch_pycharm._pycharm import macros
+from hatch_pycharm._pycharm.macros import APPLICATION_HOME_DIR, PROJECT_DIR, USER_HOME, Macros
+
+
+@pytest.fixture
+def engine() -> Macros:
+    return Macros(
+        {
+            USER_HOME: "/home/dev",
+            APPLICATION_HOME_DIR: "/home/dev/.local/share/JetBrains/Toolbox/apps/PyCharm-P",
+            PROJECT_DIR: "/home/dev/git/app",
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    ("path", "collapsed"),
+    [
+        ("/home/dev/AppData/python", "$USER_HOME$/AppData/python"),
+        ("/home/dev/.local/share/JetBrains/Toolbox/apps/PyCharm-P/plugins", "$APPLICATION_HOME_DIR$/plugins"),
+        ("/home/dev/git/app/.venv/bin/python", "$PROJECT_DIR$/.venv/bin/python"),
+        ("/home/dev/git/app", "$PROJECT_DIR$"),
+        # A shared prefix is not a parent directory
+        ("/home/dev/git/application", "$USER_HOME$/git/application"),
+        ("/home/developer", "/home/developer"),
+        ("/opt/python", "/opt/python"),
+    ],
+)
+def test_longest_prefix_wins(engine, path, collapsed):
+    assert engine.collapse(Path(path)) == collapsed
+    assert engine.expand(collapsed) == path
+
+
+def test_expands_inside_urls(engine):
+    assert engine.expand("file://$USER_HOME$/lib") == "file:///home/dev/lib"
+    assert engine.expand("file://$MODULE_DIR$/lib") == "file://$MODULE_DIR$/lib"
+
+
+def test_key_does_not_touch_the_filesystem(engine, monkeypatch):
+    def fail(*args):
+        pytest.fail("The filesystem was consulted")
+
+    monkeypatch.setattr(Path, "resolve", fail)
+    monkeypatch.setattr(Path, "stat", fail)
+    assert engine.key("$PROJECT_DIR$/./.venv/../.venv/bin/python") == str(Path("/home/dev/git/app/.venv/bin/python"))
+
+
+def test_engine_is_shared_and_follows_settings(fake_pycharm):
+    assert macros.macros() is macros.macros()
+    helpers = fake_pycharm / "plugins" / "python" / "helpers"
+    assert macros.collapse_macros(helpers) == "$APPLICATION_HOME_DIR$/plugins/python/helpers"
+    assert macros.expand_macros("$APPLICATION_HOME_DIR$/plugins/python/helpers") == helpers
+    assert macros.collapse_macros(Path.home() / "x") == "$USER_HOME$/x"
+    project = fake_pycharm.parent / "project"
+    assert macros.collapse_macros(project / "src", project_dir=project) == "$PROJECT_DIR$/src"
@@ -1,60 +1,51 @@
 import subprocess
 from pathlib import Path
-from unittest.mock import MagicMock, ANY
+from unittest.mock import MagicMock
 
 import pytest
 from click.testing import CliRunner
 
 
-class TestException(BaseException):
-    pass
-
-
 @pytest.fixture()
-def mock_run(monkeypatch) -> MagicMock:
-    from unittest.mock import create_autospec
-
-    original_subprocess_run = subprocess.run
+def mock_launch(monkeypatch, tmp_path) -> MagicMock:
     # noinspection PyProtectedMember
     import hatch_pycharm._pycharm.platform_paths as paths
 
+    # Registering the SDK must not touch the real settings, and no IDE is running to answer
+    monkeypatch.setenv("HATCH_PYCHARM_CONFIG_DIR", str(tmp_path / "config" / "PyCharm2023.2"))
+    monkeypatch.setenv("HATCH_PYCHARM_PORT", "1")
+    original_popen = subprocess.Popen
     platform_name = paths.platform_exe_name()
+    launches = MagicMock()
 
-    def mock_func(*args, **kwargs):
-        if args and args[0] and args[0][0].endswith(platform_name):
-            msg = f"subprocess.run was called with '{paths.platform_exe_name()}'"
-            raise TestException(msg)
-        else:
-            return original_subprocess_run(*args, **kwargs)
-
-    from subprocess import run
+    def mock_popen(*args, **kwargs):
+        if args and args[0] and str(args[0][0]).endswith(platform_name):
+            return launches(*args, **kwargs)
+        return original_popen(*args, **kwargs)
 
-    mock_subprocess_run = create_autospec(run, side_effect=mock_func)
-    monkeypatch.setattr(subprocess, "run", mock_subprocess_run)
-    yield mock_subprocess_run
+    monkeypatch.setattr(subprocess, "Popen", mock_popen)
+    yield launches
 
 
-def test_subprocess_run_is_called(new_project, mock_run):
+def test_ide_is_launched_detached(new_project, mock_launch):
     """
-    .. function:: test_subprocess_run_is_called(new_project) -> None
+    .. function:: test_ide_is_launched_detached(new_project) -> None
 
-        This function tests if the `subprocess.run()` method is called correctly. This will detect when our oh so
-         fragile "interface" with hatch is broken.
+        This function tests that creating the environment launches PyCharm on the project, without waiting for it.
+         This will detect when our oh so fragile "interface" with hatch is broken.
 
         :param new_project: The new project to be tested, a fixture
         :type new_project: Any
-
-        :raises TestException: If the `subprocess.run()` method is not called correctly.
-
-
     """
     from hatch.cli import hatch
 
     runner = CliRunner()
-    with pytest.raises(TestException):
-        # noinspection PyTypeChecker
-        runner.invoke(hatch, ["run", "echo", "a"], catch_exceptions=False)
-    mock_run.assert_called_once()
-    exe_location, detected_location = map(Path, mock_run.call_args[0][0])
+    # noinspection PyTypeChecker
+    result = runner.invoke(hatch, ["run", "echo", "a"], catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+    # The background work is collected when the command closes, so the launch has happened by now
+    mock_launch.assert_called_once()
+    exe_location, detected_location = map(Path, mock_launch.call_args[0][0])
     assert detected_location == new_project
     assert exe_location.is_file()
+    assert mock_launch.call_args.kwargs["stdout"] == subprocess.DEVNULL
@@ -0,0 +1,140 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from hatch_pycharm._pycharm import mergetool
+from hatch_pycharm._pycharm.mergetool import BASE, OURS, THEIRS, MergeResult
+
+# Takes theirs, except for files named keep_*, which are left with their markers as if the window was just closed
+MERGER = """\
+#!{python}
+import json, os, shutil, sys
+with open(os.environ["MERGE_LOG"], "a") as log:
+    log.write(json.dumps(sys.argv[1:]) + "\\n")
+_, local, remote, base, output = sys.argv[1:]
+if not os.path.basename(output).startswith("keep_"):
+    shutil.copyfile(remote, output)
+"""
+
+
+def git(repo: Path, *args: str) -> str:
+    return subprocess.run(["git", "-C", str(repo), *args], stdout=subprocess.PIPE, check=True, text=True).stdout
+
+
+def commit(repo: Path, files: dict[str, str | None], message: str) -> None:
+    for name, content in files.items():
+        path = repo / name
+        if content is None:
+            git(repo, "rm", "-q", name)
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        git(repo, "add", name)
+    git(repo, "commit", "-q", "-m", message)
+
+
+@pytest.fixture
+def repo(tmp_path) -> Path:
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    git(repo, "config", "user.email", "dev@example.com")
+    git(repo, "config", "user.name", "dev")
+    commit(repo, {"a.py": "a = 0\n", "pkg/keep_b.py": "b = 0\n", "gone.py": "g = 0\n", "clean.py": "c\n"}, "base")
+    git(repo, "checkout", "-q", "-b", "theirs")
+    commit(repo, {"a.py": "a = 2\n", "pkg/keep_b.py": "b = 2\n", "gone.py": None, "added.py": "theirs\n"}, "theirs")
+    git(repo, "checkout", "-q", "main")
+    commit(repo, {"a.py": "a = 1\n", "pkg/keep_b.py": "b = 1\n", "gone.py": "g = 1\n", "added.py": "ours\n"}, "ours")
+    assert subprocess.run(["git", "-C", str(repo), "merge", "-q", "theirs"], capture_output=True).returncode
+    return repo
+
+
+@pytest.fixture
+def merger(tmp_path, monkeypatch) -> Path:
+    monkeypatch.setenv("MERGE_LOG", str(tmp_path / "merge.log"))
+    exe = tmp_path / "pycharm.sh"
+    exe.write_text(MERGER.format(python=sys.executable))
+    exe.chmod(0o755)
+    return exe
+
+
+def merges(tmp_path) -> list[list[str]]:
+    log = tmp_path / "merge.log"
+    return [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+
+
+def test_conflicts(repo):
+    found = {conflict.path: conflict for conflict in mergetool.conflicts(repo)}
+    assert sorted(found) == ["a.py", "added.py", "gone.py", "pkg/keep_b.py"]
+    assert sorted(found["a.py"].stages) == [BASE, OURS, THEIRS]
+    assert sorted(found["added.py"].stages) == [OURS, THEIRS] and found["added.py"].mergeable
+    assert not found["gone.py"].mergeable
+
+
+def test_materialize_writes_every_stage_in_one_pass(repo, tmp_path, monkeypatch):
+    calls = []
+    git_ = mergetool._git
+
+    def recording(repo, *args, **kwargs):
+        calls.append(args[0])
+        return git_(repo, *args, **kwargs)
+
+    monkeypatch.setattr(mergetool, "_git", recording)
+    found = [conflict for conflict in mergetool.conflicts(repo) if conflict.mergeable]
+    files = mergetool.materialize(repo, found, tmp_path / "stages")
+
+    assert calls == ["ls-files", "cat-file"]
+    assert files["a.py"][OURS].name == "a_LOCAL.py"
+    assert [files["a.py"][n].read_text() for n in (BASE, OURS, THEIRS)] == ["a = 0\n", "a = 1\n", "a = 2\n"]
+    # Added on both sides, merged against an empty base
+    assert files["added.py"][BASE].read_text() == ""
+
+
+def test_one_ide_for_all_conflicts(repo, tmp_path, merger, monkeypatch):
+    launches = []
+    answers = iter([None, None, object()])
+    monkeypatch.setattr(mergetool, "find_instance", lambda: next(answers))
+    monkeypatch.setattr(mergetool, "launch_detached", launches.append)
+    monkeypatch.setattr(mergetool, "POLL_INTERVAL", 0)
+
+    results = mergetool.resolve_conflicts(repo, merger)
+    assert results == [
+        MergeResult("a.py", "resolved"),
+        MergeResult("added.py", "resolved"),
+        MergeResult("gone.py", "skipped"),
+        MergeResult("pkg/keep_b.py", "unresolved"),
+    ]
+    assert len(launches) == 1
+    assert [Path(args[-1]).name for args in merges(tmp_path)] == ["a.py", "added.py", "keep_b.py"]
+    # Resolved files are staged as they finish, the rest stays unmerged for git
+    assert sorted({conflict.path for conflict in mergetool.conflicts(repo)}) == ["gone.py", "pkg/keep_b.py"]
+    assert (repo / "a.py").read_text() == "a = 2\n"
+
+
+def test_running_ide_is_reused(repo, tmp_path, merger, monkeypatch):
+    monkeypatch.setattr(mergetool, "find_instance", lambda: object())
+    monkeypatch.setattr(mergetool, "launch_detached", lambda cmd: pytest.fail("launched an IDE"))
+    mergetool.resolve_conflicts(repo, merger)
+    assert len(merges(tmp_path)) == 3
+
+
+def test_main_resolves_the_whole_worktree(repo, tmp_path, merger, monkeypatch, capsys):
+    monkeypatch.setattr(mergetool, "find_instance", lambda: object())
+    # Run from a subdirectory, like a git alias run from anywhere in the worktree
+    assert mergetool.main([str(repo / "pkg"), "--pycharm", str(merger)]) == 1
+    assert capsys.readouterr().out.split() == [
+        *("resolved", "a.py", "resolved", "added.py"),
+        *("skipped", "gone.py", "unresolved", "pkg/keep_b.py"),
+    ]
+    assert len(merges(tmp_path)) == 3
+
+
+def test_marker_detection(tmp_path):
+    path = tmp_path / "file"
+    path.write_bytes(b"a\n<<<<<<< HEAD\nb\n=======\nc\n>>>>>>> theirs\n")
+    assert mergetool.has_conflict_markers(path)
+    path.write_bytes(b"a\n# <<<<<<< in a comment\n")
+    assert not mergetool.has_conflict_markers(path)
@@ -0,0 +1,136 @@
+from pathlib import Path
+
+import pytest
+
+from hatch_pycharm.plugin import PycharmCollector
+
+
+@pytest.fixture()
+def pythons(tmp_path, monkeypatch) -> Path:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for version in ("3.12", "3.10"):
+        exe = bin_dir / f"python{version}"
+        exe.write_text("")
+        exe.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir))
+    return bin_dir
+
+
+def test_collector_adds_a_matrix_of_found_pythons(fake_pycharm, pythons, tmp_path):
+    collector = PycharmCollector(tmp_path, {"name": "ide", "dependencies": ["pytest"]})
+    assert collector.get_initial_config() == {
+        "ide": {"type": "pycharm", "dependencies": ["pytest"], "matrix": [{"python": ["3.10", "3.12"]}]}
+    }
+
+
+def test_collector_without_pycharm_adds_nothing(pythons, tmp_path, monkeypatch):
+    monkeypatch.setenv("HATCH_PYCHARM_EXE", str(tmp_path / "missing" / "pycharm.sh"))
+    monkeypatch.setenv("HATCH_PYCHARM_CACHE_DIR", str(tmp_path / "cache"))
+    from hatch_pycharm._pycharm import settings
+
+    settings.reset()
+    try:
+        assert PycharmCollector(tmp_path, {}).get_initial_config() == {}
+    finally:
+        settings.reset()
+
+
+def test_warm_collection_skips_the_scan(fake_pycharm, pythons, tmp_path, monkeypatch):
+    from hatch_pycharm._pycharm import interpreter
+
+    PycharmCollector(tmp_path, {}).get_initial_config()
+    monkeypatch.setattr(interpreter, "scan_path", lambda dirs: pytest.fail("scanned PATH again"))
+    assert PycharmCollector(tmp_path, {}).get_initial_config()["pycharm"]["matrix"] == [{"python": ["3.10", "3.12"]}]
+
+
+def test_template_queues_projects_for_one_open(tmp_path, monkeypatch):
+    import click
+
+    from hatch_pycharm import plugin
+
+    opened = []
+    monkeypatch.setattr(plugin, "open_pycharm", lambda *locations: opened.append(locations))
+    monkeypatch.chdir(tmp_path)
+    template = plugin.PycharmTemplate({}, tmp_path, None)
+    ctx = click.Context(click.Command("new"))
+    with ctx:
+        for name, location in (("one", None), ("two", str(tmp_path / "elsewhere"))):
+            ctx.params = {"name": name, "location": location, "initialize": False}
+            template.finalize_files({"project_name_normalized": name}, [])
+        assert opened == []
+    assert opened == [(tmp_path / "one", tmp_path / "elsewhere")]
+
+
+def test_launcher_gets_only_what_the_running_ide_left(fake_pycharm, tmp_path, monkeypatch):
+    from hatch_pycharm import plugin
+    from hatch_pycharm._pycharm import FileRef
+
+    launched = []
+    monkeypatch.setattr(plugin, "open_in_running_instance", lambda *locations: [FileRef(tmp_path)])
+    monkeypatch.setattr(plugin, "launch_detached", lambda cmd: launched.append(list(cmd)[1:]))
+    plugin.open_pycharm(tmp_path / "a.py", tmp_path)
+    assert launched == [[str(tmp_path)]]
+
+    monkeypatch.setattr(plugin, "open_in_running_instance", lambda *locations: [])
+    plugin.open_pycharm(tmp_path / "a.py")
+    assert len(launched) == 1
+
+
+def test_report_warns_for_every_failed_integration(tmp_path):
+    from concurrent.futures import Future
+    from types import SimpleNamespace
+
+    from hatch_pycharm.plugin import PycharmEnvironment
+
+    shown = []
+    app = SimpleNamespace(display_warning=lambda msg: shown.append(("warning", msg)))
+    app.display_success = lambda msg: shown.append(("success", msg))
+    env = SimpleNamespace(root=tmp_path, app=app, _integrations=[Future(), Future(), Future()])
+    for task, outcome in zip(env._integrations, (OSError("first"), True, OSError("last"))):
+        task.set_exception(outcome) if isinstance(outcome, Exception) else task.set_result(outcome)
+    PycharmEnvironment.report(env)
+    assert [(kind, msg.rsplit(" ", 1)[-1]) for kind, msg in shown] == [
+        ("warning", "first"),
+        ("warning", "last"),
+        ("success", "PyCharm"),
+    ]
+
+
+def test_integration_gets_plain_values_read_on_the_calling_thread(tmp_path, monkeypatch):
+    import threading
+    from types import SimpleNamespace
+
+    from hatch_pycharm import plugin
+
+    reads = []
+
+    class Metadata:
+        @property
+        def name(self):
+            reads.append(threading.current_thread())
+            return "app"
+
+    plans = []
+    monkeypatch.setattr(plugin, "integrate", plans.append)
+    monkeypatch.setattr(plugin, "at_command_end", lambda callback: None)
+    env = SimpleNamespace(
+        name="default",
+        root=tmp_path,
+        metadata=Metadata(),
+        python_exe=tmp_path / "env" / "bin" / "python",
+        virtual_env_path=tmp_path / "env",
+        dependency_hash=lambda: "deps",
+        pycharm_plugins=["IdeaVIM"],
+        pycharm_source_roots=None,
+        report=None,
+        _integrations=[],
+    )
+    plugin.PycharmEnvironment.schedule_integration(env)
+    env._integrations[0].result()
+    assert reads == [threading.current_thread()]
+    assert plans == [
+        plugin.Integration(
+            tmp_path, "app", tmp_path / "env" / "bin" / "python", tmp_path / "env", "deps", ["IdeaVIM"], None
+        )
+    ]
@@ -0,0 +1,199 @@
+import io
+import json
+import logging
+import sys
+import zipfile
+from pathlib import Path
+from xml.etree.ElementTree import parse
+
+import pytest
+
+from hatch_pycharm._pycharm import plugins, settings
+from hatch_pycharm._pycharm.plugins import ArchiveStore, PluginSpec
+
+# Installs from the repository entry for an id when there is one, the marketplace's latest ("9") otherwise. Versioned
+# marketplace downloads of the ids in UNAVAILABLE fail silently, like a version that doesn't exist
+INSTALLER = """\
+#!{python}
+import json, os, shutil, sys, zipfile
+from pathlib import Path
+from urllib.parse import urlparse, unquote
+from xml.etree.ElementTree import parse
+with open(os.environ["INSTALL_LOG"], "a") as log:
+    log.write(json.dumps(sys.argv[1:]) + "\\n")
+plugins_dir = Path(os.environ["PLUGINS_DIR"])
+ids = [arg for arg in sys.argv[2:] if "://" not in arg]
+repositories = [arg for arg in sys.argv[2:] if "://" in arg]
+entries = {{}}
+for repository in repositories:
+    for entry in parse(unquote(urlparse(repository).path)).getroot():
+        entries[entry.get("id")] = entry
+for plugin_id in ids:
+    entry = entries.get(plugin_id)
+    target = plugins_dir / f"{{plugin_id}}-installed.jar"
+    if entry is not None and entry.get("url").startswith("file://"):
+        shutil.copyfile(unquote(urlparse(entry.get("url")).path), target)
+        continue
+    if entry is not None and plugin_id in os.environ.get("UNAVAILABLE", "").split(","):
+        continue
+    version = entry.get("version") if entry is not None else "9"
+    descriptor = f"<idea-plugin><id>{{plugin_id}}</id><version>{{version}}</version></idea-plugin>"
+    with zipfile.ZipFile(target, "w") as jar:
+        jar.writestr("META-INF/plugin.xml", descriptor)
+"""
+
+
+def descriptor(plugin_id: str, version: str) -> bytes:
+    return f"<idea-plugin><id>{plugin_id}</id><version>{version}</version></idea-plugin>".encode()
+
+
+def make_jar(path: Path, plugin_id: str, version: str) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(path, "w") as jar:
+        jar.writestr(plugins.DESCRIPTOR, descriptor(plugin_id, version))
+    return path
+
+
+def make_distribution(path: Path, plugin_id: str, version: str) -> Path:
+    """A marketplace zip, the descriptor is in a jar under `<name>/lib`"""
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, "w") as jar:
+        jar.writestr(plugins.DESCRIPTOR, descriptor(plugin_id, version))
+    with zipfile.ZipFile(path, "w") as dist:
+        dist.writestr(f"{plugin_id}/lib/{plugin_id}.jar", inner.getvalue())
+    return path
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("HATCH_PYCHARM_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("INSTALL_LOG", str(tmp_path / "install.log"))
+
+
+@pytest.fixture
+def plugins_dir(tmp_path) -> Path:
+    root = tmp_path / "plugins"
+    make_jar(root / "ideavim" / "lib" / "ideavim.jar", "IdeaVIM", "2.7.0")
+    make_jar(root / "toml.jar", "org.toml.lang", "1.0")
+    (root / "not-a-plugin").mkdir()
+    return root
+
+
+@pytest.fixture
+def installer(tmp_path, plugins_dir, monkeypatch) -> Path:
+    monkeypatch.setenv("PLUGINS_DIR", str(plugins_dir))
+    exe = tmp_path / "pycharm.sh"
+    exe.write_text(INSTALLER.format(python=sys.executable))
+    exe.chmod(0o755)
+    return exe
+
+
+def installs(tmp_path) -> list[list[str]]:
+    log = tmp_path / "install.log"
+    return [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+
+
+def test_spec_parse():
+    assert PluginSpec.parse("IdeaVIM") == PluginSpec("IdeaVIM")
+    assert PluginSpec.parse("IdeaVIM@2.7.0") == PluginSpec("IdeaVIM", "2.7.0")
+    assert str(PluginSpec("IdeaVIM", "2.7.0")) == "IdeaVIM@2.7.0"
+    with pytest.raises(ValueError):
+        PluginSpec.parse("@1.0")
+
+
+def test_installed_plugins_index(plugins_dir, monkeypatch):
+    installed = plugins.installed_plugins(plugins_dir)
+    assert {key: value.version for key, value in installed.items()} == {"IdeaVIM": "2.7.0", "org.toml.lang": "1.0"}
+
+    # Served from the index while the directory is unchanged
+    monkeypatch.setattr(plugins, "read_descriptor", lambda path: pytest.fail(f"{path} was read again"))
+    assert plugins.installed_plugins(plugins_dir) == installed
+
+    monkeypatch.undo()
+    make_jar(plugins_dir / "rainbow.jar", "rainbow", "3")
+    assert "rainbow" in plugins.installed_plugins(plugins_dir)
+
+
+def test_missing_plugins(plugins_dir):
+    installed = plugins.installed_plugins(plugins_dir)
+    declared = map(PluginSpec.parse, ["IdeaVIM", "org.toml.lang@2.0", "rainbow", "rainbow"])
+    assert plugins.missing_plugins(declared, installed) == [PluginSpec("org.toml.lang", "2.0"), PluginSpec("rainbow")]
+
+
+def test_store_is_content_addressed(tmp_path):
+    store = ArchiveStore(tmp_path / "store")
+    first = store.add(make_distribution(tmp_path / "rainbow-3.zip", "rainbow", "3"))
+    again = store.add(make_distribution(tmp_path / "copy.zip", "rainbow", "3"))
+    assert first == again
+    assert Path(first.path).parent.parent == store.root
+
+    assert store.find(PluginSpec("rainbow", "3")) == first
+    assert store.find(PluginSpec("rainbow")) == first
+    assert store.find(PluginSpec("rainbow", "4")) is None
+
+    # An archive that changed behind the store's back is not handed out
+    Path(first.path).write_bytes(b"tampered")
+    assert store.find(PluginSpec("rainbow")) is None
+
+
+def test_repository_lists_local_files(tmp_path):
+    store = ArchiveStore(tmp_path / "store")
+    stored = store.add(make_jar(tmp_path / "toml.jar", "org.toml.lang", "2.0"))
+    repository = plugins.write_repository([stored], tmp_path / "updatePlugins.xml")
+    (entry,) = parse(repository).getroot()
+    assert entry.attrib == {"id": "org.toml.lang", "url": Path(stored.path).as_uri(), "version": "2.0"}
+
+
+def test_ensure_plugins_batches_the_missing(tmp_path, plugins_dir, installer):
+    store = ArchiveStore(tmp_path / "store")
+    store.add(make_jar(tmp_path / "toml.jar", "org.toml.lang", "2.0"))
+    declared = ["IdeaVIM", "org.toml.lang@2.0", "rainbow"]
+
+    installed = plugins.ensure_plugins(declared, installer, plugins_dir, store)
+    assert installed == [PluginSpec("org.toml.lang", "2.0"), PluginSpec("rainbow")]
+    (argv,) = installs(tmp_path)
+    command, *ids, repository = argv
+    assert command == "installPlugins"
+    assert ids == ["org.toml.lang", "rainbow"]
+    assert repository.startswith("file://") and repository.endswith(".xml")
+    assert plugins.installed_plugins(plugins_dir)["org.toml.lang"].version == "2.0"
+
+
+def test_pins_install_the_pinned_version(tmp_path, plugins_dir, installer):
+    store = ArchiveStore(tmp_path / "store")
+    assert plugins.ensure_plugins(["rainbow@3", "other"], installer, plugins_dir, store) == [
+        PluginSpec("rainbow", "3"),
+        PluginSpec("other"),
+    ]
+    ((_, *_, repository),) = installs(tmp_path)
+    (entry,) = parse(repository.removeprefix("file://")).getroot()
+    assert entry.get("url") == f"{plugins.MARKETPLACE_DOWNLOAD}?pluginId=rainbow&version=3"
+    assert plugins.installed_plugins(plugins_dir)["rainbow"].version == "3"
+    # Met, so nothing to do the next time
+    assert plugins.ensure_plugins(["rainbow@3", "other"], installer, plugins_dir, store) == []
+    assert len(installs(tmp_path)) == 1
+
+
+def test_unmet_pin_is_tried_once(tmp_path, plugins_dir, installer, monkeypatch, caplog):
+    # The build comes from the launcher that was passed in, never from a PyCharm discovered on this machine
+    monkeypatch.setitem(settings._resolvers, "pycharm_exe", lambda: pytest.fail("looked up the default PyCharm"))
+    settings.reset()
+    monkeypatch.setenv("UNAVAILABLE", "rainbow")
+    store = ArchiveStore(tmp_path / "store")
+    assert plugins.ensure_plugins(["rainbow@0.0.1"], installer, plugins_dir, store) == []
+    assert "rainbow@0.0.1" in caplog.text
+    caplog.clear()
+    assert plugins.ensure_plugins(["rainbow@0.0.1"], installer, plugins_dir, store) == []
+    assert len(installs(tmp_path)) == 1
+    assert not [record for record in caplog.records if record.levelno >= logging.WARNING]
+
+    # Offered from the store now, which is worth another try
+    store.add(make_jar(tmp_path / "rainbow.jar", "rainbow", "0.0.1"))
+    assert plugins.ensure_plugins(["rainbow@0.0.1"], installer, plugins_dir, store) == [PluginSpec("rainbow", "0.0.1")]
+    assert len(installs(tmp_path)) == 2
+
+
+def test_ensure_plugins_without_anything_missing(tmp_path, plugins_dir, installer):
+    assert plugins.ensure_plugins(["IdeaVIM@2.7.0", "org.toml.lang"], installer, plugins_dir) == []
+    assert plugins.ensure_plugins([], installer, plugins_dir) == []
+    assert installs(tmp_path) == []
@@ -0,0 +1,101 @@
+import pytest
+
+from hatch_pycharm._pycharm import project_model
+from hatch_pycharm._pycharm.project_model import idea_dir, write_project_model
+
+MODULE = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<module type="PYTHON_MODULE" version="4">
+  <!-- kept as it is -->
+  <component name="NewModuleRootManager">
+    <content url="file://$MODULE_DIR$">
+      <sourceFolder url="file://$MODULE_DIR$/tests" isTestSource="false" />
+      <excludeFolder url="file://$MODULE_DIR$/docs/_build" />
+    </content>
+    <orderEntry type="jdk" jdkName="Python 3.10 (mine)" jdkType="Python SDK" />
+    <orderEntry type="sourceFolder" forTests="false" />
+  </component>
+</module>
+"""
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("HATCH_PYCHARM_CACHE_DIR", str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def project(tmp_path):
+    project = tmp_path / "project"
+    (project / "src").mkdir(parents=True)
+    (project / "tests").mkdir()
+    return project
+
+
+def folders(iml) -> dict[str, str]:
+    content = project_model._read(iml).find("component/content")
+    return {folder.get("url"): folder.tag + folder.get("isTestSource", "") for folder in content if folder.get("url")}
+
+
+def test_new_project(project):
+    assert write_project_model(project, "Python 3.11 (project)", project / ".hatch" / "env")
+    iml = idea_dir(project) / "project.iml"
+    assert folders(iml) == {
+        "file://$MODULE_DIR$/src": "sourceFolderfalse",
+        "file://$MODULE_DIR$/tests": "sourceFoldertrue",
+        **{f"file://$MODULE_DIR$/{name}": "excludeFolder" for name in project_model.EXCLUDED},
+        "file://$MODULE_DIR$/.hatch/env": "excludeFolder",
+    }
+    modules = (idea_dir(project) / "modules.xml").read_text()
+    assert 'filepath="$PROJECT_DIR$/.idea/project.iml"' in modules
+    misc = project_model._read(idea_dir(project) / "misc.xml").find("component[@name='ProjectRootManager']")
+    assert misc.get("project-jdk-name") == "Python 3.11 (project)"
+    assert misc.get("project-jdk-type") == "Python SDK"
+
+
+def test_merge_keeps_what_the_user_set_up(project):
+    idea_dir(project).mkdir()
+    iml = idea_dir(project) / "project.iml"
+    iml.write_text(MODULE)
+    write_project_model(project, "Python 3.11 (project)")
+    merged = iml.read_text()
+    assert "<!-- kept as it is -->" in merged
+    assert 'jdkName="Python 3.10 (mine)"' in merged and "inheritedJdk" not in merged
+    found = folders(iml)
+    # tests stays the source root the user made it
+    assert found["file://$MODULE_DIR$/tests"] == "sourceFolderfalse"
+    assert found["file://$MODULE_DIR$/docs/_build"] == "excludeFolder"
+    assert found["file://$MODULE_DIR$/src"] == "sourceFolderfalse"
+
+
+def test_existing_module_location_is_used(project):
+    idea_dir(project).mkdir()
+    (project / "project.iml").write_text(MODULE)
+    (idea_dir(project) / "modules.xml").write_text(
+        '<project version="4"><component name="ProjectModuleManager"><modules>'
+        '<module fileurl="file://$PROJECT_DIR$/project.iml" filepath="$PROJECT_DIR$/project.iml" />'
+        "</modules></component></project>"
+    )
+    write_project_model(project, "Python 3.11 (project)")
+    assert not (idea_dir(project) / "project.iml").exists()
+    assert "file://$MODULE_DIR$/dist" in folders(project / "project.iml")
+
+
+def test_env_outside_the_project_is_not_excluded(project, tmp_path):
+    write_project_model(project, "Python 3.11 (project)", tmp_path / "envs" / "project")
+    assert not any("envs" in url for url in folders(idea_dir(project) / "project.iml"))
+
+
+def test_unchanged_model_is_not_rewritten(project):
+    assert write_project_model(project, "Python 3.11 (project)", project / ".venv")
+    mtimes = {path: path.stat().st_mtime_ns for path in idea_dir(project).iterdir()}
+    assert not write_project_model(project, "Python 3.11 (project)", project / ".venv")
+    assert {path: path.stat().st_mtime_ns for path in idea_dir(project).iterdir()} == mtimes
+    assert write_project_model(project, "Python 3.12 (project)", project / ".venv")
+
+
+def test_unparsable_file_is_reported(project):
+    idea_dir(project).mkdir()
+    (idea_dir(project) / "misc.xml").write_text("<project")
+    with pytest.raises(ValueError, match="misc.xml"):
+        write_project_model(project, "Python 3.11 (project)")
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from hatch_pycharm._pycharm.runner import CommandResult, Runner, run_command, run_commands
+
+
+def python(code: str) -> list[str]:
+    return [sys.executable, "-c", code]
+
+
+def test_run_command_collects_output():
+    result = run_command(python("import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"))
+    assert result == CommandResult(result.args, 3, "out\n", "err\n")
+
+
+def test_check_raises_like_subprocess():
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        run_command(python("import sys; sys.exit(2)"), check=True)
+    assert e.value.returncode == 2
+
+
+def test_output_is_streamed_as_it_is_printed():
+    seen = []
+    code = """\
+import sys, time
+for i in range(3):
+    print(i, flush=True)
+    time.sleep(0.05)
+print('x', file=sys.stderr)
+"""
+    run_command(python(code), on_output=lambda stream, line: seen.append((stream, line, time.monotonic())))
+    lines = [(stream, line) for stream, line, _ in seen]
+    assert lines == [("stdout", "0"), ("stdout", "1"), ("stdout", "2"), ("stderr", "x")]
+    # Each line arrived as it was printed, not all at once when the child exited
+    assert seen[2][2] - seen[0][2] >= 0.05
+
+
+def test_timeout_kills_the_child():
+    started = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired) as e:
+        run_command(python("import time; print('started', flush=True); time.sleep(30)"), timeout=0.5)
+    assert time.monotonic() - started < 10
+    assert e.value.output == "started\n"
+
+
+def test_limit_bounds_concurrency():
+    code = "import time; print(time.monotonic()); time.sleep(0.3); print(time.monotonic())"
+    results = run_commands([python(code)] * 4, limit=2)
+    spans = [tuple(map(float, result.stdout.split())) for result in results]
+    most = max(sum(start < s_end and s_start < end for s_start, s_end in spans) for start, end in spans)
+    assert most == 2
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="signal 0 only probes for a process on POSIX")
+def test_cancelling_kills_the_child(tmp_path):
+    pid_file = tmp_path / "pid"
+    code = f"import os, time; open({str(pid_file)!r}, 'w').write(str(os.getpid())); time.sleep(30)"
+
+    async def main():
+        task = asyncio.create_task(Runner().run(python(code)))
+        while not pid_file.exists() or not pid_file.read_text():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    pid = int(pid_file.read_text())
+    # Reaped, so gone entirely rather than a zombie
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
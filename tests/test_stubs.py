@@ -0,0 +1,87 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from hatch_pycharm._pycharm import stubs
+from hatch_pycharm._pycharm.config_vars import PythonConfigVars
+from hatch_pycharm._pycharm.interpreter import InterpreterInfo
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("HATCH_PYCHARM_CACHE_DIR", str(tmp_path / "cache"))
+
+
+def interpreter(env: str, base: str = "/usr", version=(3, 11, 7), soabi: str = "cpython-311-x86_64-linux-gnu"):
+    config_vars = PythonConfigVars(SOABI=soabi, EXT_SUFFIX=f".{soabi}.so", Py_DEBUG=0)
+    return InterpreterInfo(f"{env}/bin/python", version, [], env, base, config_vars)
+
+
+@pytest.fixture
+def generated(tmp_path) -> Path:
+    """Skeletons PyCharm already generated for one env"""
+    stubs_dir = tmp_path / "python_stubs" / "111"
+    (stubs_dir / "numpy").mkdir(parents=True)
+    (stubs_dir / "_socket.py").write_text("# from /usr/lib/python3.11/lib-dynload/_socket.so")
+    (stubs_dir / "numpy" / "core.py").write_text("# numpy")
+    stubs.record(stubs_dir, interpreter("/envs/a"))
+    return stubs_dir
+
+
+def test_seeds_from_equivalent_interpreter(generated, tmp_path):
+    target = tmp_path / "python_stubs" / "222"
+    assert stubs.seed(target, interpreter("/envs/b")) == generated
+    assert (target / "_socket.py").read_text() == (generated / "_socket.py").read_text()
+    assert (target / "numpy" / "core.py").exists()
+    # A copy, not the same file, each env's skeletons are regenerated on their own
+    assert (target / "_socket.py").stat().st_ino != (generated / "_socket.py").stat().st_ino
+    assert [p.name for p in target.parent.iterdir() if p.name.startswith(".")] == []
+
+
+@pytest.mark.parametrize(
+    "other",
+    [
+        interpreter("/envs/b", base="/opt/python"),
+        interpreter("/envs/b", version=(3, 11, 8)),
+        interpreter("/envs/b", soabi="cpython-311d-x86_64-linux-gnu"),
+    ],
+)
+def test_different_interpreters_are_not_equivalent(generated, tmp_path, other):
+    assert stubs.seed(tmp_path / "python_stubs" / "222", other) is None
+
+
+def test_existing_stubs_are_left_alone(generated, tmp_path):
+    target = tmp_path / "python_stubs" / "222"
+    target.mkdir()
+    (target / "mine.py").write_text("")
+    assert stubs.seed(target, interpreter("/envs/b")) is None
+    assert [p.name for p in target.iterdir()] == ["mine.py"]
+
+    empty = tmp_path / "python_stubs" / "333"
+    empty.mkdir()
+    assert stubs.seed(empty, interpreter("/envs/c")) == generated
+
+
+def test_falls_back_to_copying(generated, tmp_path, monkeypatch):
+    fcntl = pytest.importorskip("fcntl")
+
+    def no_reflinks(*args):
+        raise OSError(95, "Operation not supported")
+
+    monkeypatch.setattr(fcntl, "ioctl", no_reflinks)
+    target = tmp_path / "python_stubs" / "222"
+    assert stubs.seed(target, interpreter("/envs/b")) == generated
+    assert (target / "numpy" / "core.py").read_text() == "# numpy"
+
+
+def test_registering_seeds_the_stubs(fake_pycharm, tmp_path, monkeypatch):
+    from hatch_pycharm._pycharm.venv_xml import PyCharmVenv
+
+    monkeypatch.setattr(stubs, "seed", lambda *args: seeded.append(args))
+    seeded = []
+    venv = PyCharmVenv("Python (my-app)", Path(sys.executable), tmp_path)
+    venv.register(tmp_path / "jdk.table.xml")
+    assert seeded == [(venv.stubs_dir, venv.info)]
+    assert stubs.find_equivalent(tmp_path / "elsewhere", venv.info) is None
+    assert stubs._recorded() == {str(venv.stubs_dir): stubs.abi_key(venv.info)}
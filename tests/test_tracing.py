@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from hatch_pycharm._pycharm import make_format_files_command, tracing
+
+
+@pytest.fixture()
+def trace():
+    tracing.enable()
+    yield tracing
+    tracing.disable()
+
+
+def spans(events: list[dict]) -> list[dict]:
+    return [e for e in events if e["ph"] == "X"]
+
+
+def test_disabled_hands_out_the_shared_no_op():
+    assert not tracing.is_enabled()
+    assert tracing.span("a") is tracing.span("b")
+    with tracing.span("a") as s:
+        s.set(x=1)
+    assert tracing.export()["traceEvents"] == []
+
+
+def test_command_spans_record_argv(trace):
+    cmd = make_format_files_command(Path("pycharm.sh"), Path("a.py"), masks=["*.py"])
+    (event,) = spans(trace.export()["traceEvents"])
+    assert event["name"] == "make_format_files_command"
+    assert event["args"] == {"argc": len(cmd), "argv_bytes": tracing.argv_size(cmd)}
+    assert event["dur"] >= 0
+
+
+def test_errors_are_recorded_and_raised(trace):
+    @tracing.traced()
+    def boom():
+        raise KeyError
+
+    with pytest.raises(KeyError):
+        boom()
+    (event,) = spans(trace.export()["traceEvents"])
+    assert event["name"].endswith("boom")
+    assert event["args"] == {"error": "KeyError"}
+
+
+def test_env_var_writes_a_chrome_trace_at_exit(tmp_path):
+    script = "from pathlib import Path; from hatch_pycharm._pycharm import make_open_file_command as m; m(Path('x'))"
+    env = {**os.environ, tracing.ENV_VAR: str(tmp_path / "trace-{pid}.json")}
+    subprocess.run([sys.executable, "-c", script], env=env, check=True)
+    (written,) = tmp_path.glob("trace-*.json")
+    data = json.loads(written.read_text())
+    assert [e["name"] for e in spans(data["traceEvents"])] == ["make_open_file_command"]
+    assert any(e["ph"] == "M" and e["name"] == "thread_name" for e in data["traceEvents"])
@@ -0,0 +1,102 @@
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from xml.etree.ElementTree import fromstring
+
+import pytest
+
+from hatch_pycharm._pycharm import jdk_table, transaction
+from hatch_pycharm._pycharm.transaction import Upsert
+
+WRITER = """\
+import sys
+from pathlib import Path
+from hatch_pycharm._pycharm.transaction import Upsert, submit
+table, first, count = Path(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+for i in range(first, first + count):
+    project = f"/project-{i}"
+    payload = (
+        f'<jdk version="2"><name value="{i}" /><homePath value="{project}/python" />'
+        f'<additional ASSOCIATED_PROJECT_PATH="{project}" SDK_UUID="uuid-{i}" /></jdk>'
+    )
+    submit(table, [Upsert(project, f"{project}/python", payload, f"uuid-{i}")])
+"""
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("HATCH_PYCHARM_CACHE_DIR", str(tmp_path / "cache"))
+
+
+def upsert(i: int, name: str = None, uuid: str = None) -> Upsert:
+    project = f"/project-{i}"
+    uuid = uuid or f"uuid-{i}"
+    payload = (
+        f'<jdk version="2"><name value="{name or i}" /><homePath value="{project}/python" />'
+        f'<additional ASSOCIATED_PROJECT_PATH="{project}" SDK_UUID="{uuid}" /></jdk>'
+    )
+    return Upsert(project, f"{project}/python", payload, uuid)
+
+
+def sdks(table: Path) -> dict[str, str]:
+    return {
+        jdk.find("name").get("value"): jdk.find("additional").get("SDK_UUID")
+        for jdk in fromstring(table.read_bytes()).iter("jdk")
+    }
+
+
+def test_replacing_keeps_the_known_uuid(tmp_path):
+    table = tmp_path / "jdk.table.xml"
+    assert transaction.submit(table, [upsert(1)]) == [transaction.Receipt(False, "uuid-1")]
+    assert transaction.submit(table, [upsert(1, "renamed", "fresh-uuid")]) == [transaction.Receipt(True, "uuid-1")]
+    assert sdks(table) == {"renamed": "uuid-1"}
+    assert [p.name for p in transaction.spool_dir(table).iterdir()] == [".lock"]
+
+
+def test_queued_writers_share_one_rewrite(tmp_path, monkeypatch):
+    table = tmp_path / "jdk.table.xml"
+    transaction.submit(table, [upsert(0)])
+    # Other writers queued up while someone held the lock
+    transaction._spool(table, [upsert(1), upsert(2)])
+    rewrites = []
+    splice_many = jdk_table.splice_many
+    monkeypatch.setattr(jdk_table, "splice_many", lambda *args: rewrites.append(splice_many(*args)))
+
+    receipts = transaction.submit(table, [upsert(3), upsert(4)])
+    assert [r.uuid for r in receipts] == ["uuid-3", "uuid-4"]
+    assert len(rewrites) == 1
+    assert sorted(sdks(table)) == ["0", "1", "2", "3", "4"]
+    # The queued writers find their receipts waiting for them
+    assert sorted(p.suffix for p in transaction.spool_dir(table).iterdir() if p.name != ".lock") == [".done"] * 2
+
+
+def test_failed_apply_leaves_no_tickets(tmp_path, monkeypatch):
+    table = tmp_path / "jdk.table.xml"
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(transaction, "apply_spooled", fail)
+    with pytest.raises(OSError):
+        transaction.submit(table, [upsert(1)])
+    assert list(transaction.spool_dir(table).glob("*.json")) == []
+
+
+def test_concurrent_threads_lose_nothing(tmp_path):
+    table = tmp_path / "jdk.table.xml"
+    transaction.submit(table, [upsert(0)])
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: transaction.submit(table, [upsert(i)]), range(1, 33)))
+    assert sorted(map(int, sdks(table))) == list(range(33))
+
+
+def test_concurrent_processes_lose_nothing(tmp_path):
+    table = tmp_path / "jdk.table.xml"
+    transaction.submit(table, [upsert(0)])
+    root = Path(__file__).parent.parent
+    writers = [
+        subprocess.Popen([sys.executable, "-c", WRITER, str(table), str(1 + 10 * n), "10"], cwd=root) for n in range(4)
+    ]
+    assert [writer.wait() for writer in writers] == [0] * 4
+    assert sorted(map(int, sdks(table))) == list(range(41))
@@ -26,3 +26,46 @@ def test_from_json_str(config_vars):
 
     for k, v in sysconfig.get_config_vars().items():
         assert getattr(config_vars, k) == v
+
+
+def test_stubs_dir_names_match_pycharm():
+    from hatch_pycharm._pycharm.venv_xml import java_string_hash
+
+    # Both taken from example_xml
+    assert java_string_hash("/opt/homebrew/bin/python3.10") == -373310687
+    win = r"C:\Users\veigar\PycharmProjects\hatch-pycharm\.hatch\hatch-pycharm\Scripts\python.exe"
+    assert java_string_hash(win.replace("\\", "/")) == 374006827
+
+
+def test_register_replaces_our_entry(fake_pycharm, tmp_path):
+    import sys
+    from pathlib import Path
+
+    from hatch_pycharm._pycharm.jdk_table import find_jdk
+    from hatch_pycharm._pycharm.venv_xml import PyCharmVenv
+
+    table = tmp_path / "jdk.table.xml"
+    venv = PyCharmVenv("Python (my-app)", Path(sys.executable), tmp_path)
+    assert not venv.register(table)
+    uuid = venv.sdk_uuid
+
+    again = PyCharmVenv("Python (my-app) renamed", Path(sys.executable), tmp_path, sdk_uuid="something-else")
+    assert again.register(table)
+    assert again.sdk_uuid == uuid
+
+    found = find_jdk(table, again.matches)
+    assert found.find("name").get("value") == "Python (my-app) renamed"
+    assert len(list(find_jdk(table, lambda jdk: True).iter("jdk"))) == 1
+    urls = [root.get("url") for root in found.iterfind(".//root[@url]")]
+    assert "file://$APPLICATION_HOME_DIR$/plugins/python/helpers/typeshed/stubs/six" in urls
+
+
+def test_rendered_sdk_matches_built_sdk(fake_pycharm, tmp_path):
+    import sys
+    from pathlib import Path
+
+    from hatch_pycharm._pycharm.jdk_table import serialize
+    from hatch_pycharm._pycharm.venv_xml import PyCharmVenv
+
+    venv = PyCharmVenv('Python 3 & "friends" (my-app)', Path(sys.executable), tmp_path)
+    assert venv.render_jdk() == serialize(venv._build_jdk_element())